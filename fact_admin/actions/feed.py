@@ -0,0 +1,290 @@
+import copy
+import json
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import F, Max
+
+from monitoring import metrics
+from registration.models import Delegate, RegistrationEvent, Workshop
+
+# fill levels reported when a workshop crosses them, percent
+LEVELS = [90, 100]
+
+
+def level(registered, capacity):
+    """
+    Highest of LEVELS reached, 0 below all of them.
+    """
+    if not capacity:
+        return 0
+    return max([mark for mark in LEVELS if registered * 100 >= mark * capacity], default=0)
+
+
+class Aggregator:
+    """
+    Polls the database once per interval for the whole process and fans the
+    changes out to every subscribed admin, so the load does not grow with
+    the number of dashboards open. Runs while someone is subscribed. The
+    lock only guards the subscribers and the state, the database is queried
+    without it.
+    Events:
+        snapshot: Full state, first event of every stream
+        delegates: {"delegates"} when the number of delegates changes
+        seats: {"workshops": {id: registered}} for workshops that changed
+        capacity: A workshop reached (or dropped below) a fill level
+        email_backlog: {"backlog"} when it changes
+    """
+
+    def __init__(self, interval=None):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.thread = None
+        self.stopped = threading.Event()
+        self.state = None
+
+    def subscribe(self):
+        """
+        A queue of events for one stream, starting with a snapshot.
+        """
+        subscriber = queue.Queue(maxsize=getattr(settings, "ADMIN_FEED_QUEUE", 100))
+
+        with self.lock:
+            state = self.state
+        if state is None:
+            state = self.load()
+
+        with self.lock:
+            if self.state is None:
+                self.state = state
+
+            subscriber.put(("snapshot", self.snapshot()))
+            self.subscribers.add(subscriber)
+
+            if self.thread is None:
+                self.start()
+
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def streams(self):
+        with self.lock:
+            return len(self.subscribers)
+
+    def start(self):
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, name="admin-feed", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        interval = self.interval or getattr(settings, "ADMIN_FEED_INTERVAL", 1)
+
+        try:
+            while not self.stopped.wait(interval):
+                with self.lock:
+                    if not self.subscribers:
+                        # nobody watching, poll again from scratch next time
+                        self.thread = None
+                        self.state = None
+                        return
+
+                    # polled on a copy, new subscribers get snapshots of the
+                    # current state meanwhile
+                    state = copy.deepcopy(self.state)
+
+                changes = self.poll(state)
+
+                with self.lock:
+                    self.state = state
+
+                self.publish(changes)
+        finally:
+            with self.lock:
+                if self.thread is threading.current_thread():
+                    self.thread = None
+                    self.state = None
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+
+    def load(self):
+        workshops = {
+            workshop.pk: {
+                "title": workshop.title,
+                "registered": workshop.registered or 0,
+                "capacity": workshop.location.capacity if workshop.location else 0,
+            }
+            for workshop in Workshop.objects.select_related("location").annotate(
+                registered=F("workshopseats__registered")
+            )
+        }
+        for workshop in workshops.values():
+            workshop["level"] = level(workshop["registered"], workshop["capacity"])
+
+        return {
+            "event_id": RegistrationEvent.objects.aggregate(last=Max("id"))["last"] or 0,
+            "delegates": Delegate.objects.count(),
+            "workshops": workshops,
+            "backlog": metrics.email_backlog(),
+            "backlog_at": time.monotonic(),
+        }
+
+    def snapshot(self):
+        # a copy, streams serialize it while the next poll updates the state
+        return copy.deepcopy(
+            {
+                "delegates": self.state["delegates"],
+                "workshops": self.state["workshops"],
+                "email_backlog": self.state["backlog"],
+            }
+        )
+
+    def poll(self, state=None, now=None):
+        """
+        One interval: registration events since the last poll, the seats of
+        the workshops they touched, the delegate count and, every
+        ADMIN_FEED_BACKLOG_INTERVAL seconds, the email backlog.
+        Args:
+            state: Updated in place, defaults to the aggregator's
+            now: time.monotonic(), for tests
+        Returns:
+            list: (event, data) changes since the last poll
+        """
+        state = state if state is not None else self.state
+        events = list(
+            RegistrationEvent.objects.filter(id__gt=state["event_id"]).values_list(
+                "id", "workshop_id", "from_workshop_id"
+            )
+        )
+        changes = []
+
+        if events:
+            state["event_id"] = max(event[0] for event in events)
+            touched = {
+                workshop
+                for event in events
+                for workshop in event[1:]
+                if workshop is not None
+            }
+
+            seats = {}
+            for workshop in Workshop.objects.filter(pk__in=touched).select_related(
+                "location"
+            ).annotate(registered=F("workshopseats__registered")):
+                current = state["workshops"].setdefault(
+                    workshop.pk,
+                    {
+                        "title": workshop.title,
+                        "registered": 0,
+                        "capacity": workshop.location.capacity if workshop.location else 0,
+                        "level": 0,
+                    },
+                )
+                registered = workshop.registered or 0
+                if registered == current["registered"]:
+                    continue
+
+                current["registered"] = registered
+                seats[workshop.pk] = registered
+
+                new_level = level(registered, current["capacity"])
+                if new_level != current["level"]:
+                    current["level"] = new_level
+                    changes.append(
+                        (
+                            "capacity",
+                            {
+                                "workshop": workshop.pk,
+                                "title": current["title"],
+                                "level": new_level,
+                                "registered": registered,
+                                "capacity": current["capacity"],
+                            },
+                        )
+                    )
+
+            if seats:
+                changes.insert(0, ("seats", {"workshops": seats}))
+
+        delegates = Delegate.objects.count()
+        if delegates != state["delegates"]:
+            state["delegates"] = delegates
+            changes.append(("delegates", {"delegates": delegates}))
+
+        # reads the metrics file of every worker, which they only rewrite
+        # every few seconds anyway
+        now = time.monotonic() if now is None else now
+        if now - state["backlog_at"] >= getattr(settings, "ADMIN_FEED_BACKLOG_INTERVAL", 15):
+            state["backlog_at"] = now
+            backlog = metrics.email_backlog()
+            if backlog != state["backlog"]:
+                state["backlog"] = backlog
+                changes.append(("email_backlog", {"backlog": backlog}))
+
+        return changes
+
+    def publish(self, changes):
+        if not changes:
+            return
+
+        with self.lock:
+            subscribers = list(self.subscribers)
+
+        for subscriber in subscribers:
+            try:
+                for change in changes:
+                    subscriber.put_nowait(change)
+            except queue.Full:
+                # a client that stopped reading starts over from a snapshot
+                # instead of holding the events of the others
+                while not subscriber.empty():
+                    try:
+                        subscriber.get_nowait()
+                    except queue.Empty:
+                        break
+                with self.lock:
+                    subscriber.put_nowait(("snapshot", self.snapshot()))
+
+
+def stream(aggregator, heartbeat=None, max_age=None):
+    """
+    Server-sent events for one admin, ends when the client goes away or
+    after max_age seconds. EventSource reconnects on its own, so a stream
+    gives its server thread back regularly and starts over from a snapshot.
+    """
+    heartbeat = heartbeat or getattr(settings, "ADMIN_FEED_HEARTBEAT", 15)
+    max_age = max_age or getattr(settings, "ADMIN_FEED_MAX_AGE", 120)
+    ends = time.monotonic() + max_age
+    subscriber = aggregator.subscribe()
+
+    try:
+        # tells EventSource how long to wait before reconnecting
+        yield "retry: 3000\n\n"
+
+        while True:
+            left = ends - time.monotonic()
+            if left <= 0:
+                return
+
+            try:
+                event, data = subscriber.get(timeout=min(heartbeat, left))
+            except queue.Empty:
+                # comment line, keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                continue
+
+            yield f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+    finally:
+        aggregator.unsubscribe(subscriber)
+
+
+aggregator = Aggregator()
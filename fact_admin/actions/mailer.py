@@ -0,0 +1,241 @@
+import os
+import queue
+import threading
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection as db_connection
+from django.utils import timezone
+
+from fact_admin.models import MailJob, MailJobMessage
+from registration.models import AccountSetUp, Facilitator
+
+
+def facilitator_link_email(department_name, username, login_url):
+    """
+    Subject and body of a facilitator's account set up email.
+    """
+    subject = f"FACT 2025 Facilitator Account - {department_name}"
+    body = (
+        f"Dear {department_name},\n\n"
+        "As a part of the FACT registration system, each facilitator can access a dashboard showing up to date information on your workshop location and number of delegates registered for your workshop(s). These accounts are meant to supplement your experience as a facilitator and will be deactivated once FACT 2025 has concluded.\n\n"
+        "You will also be able to register for workshops through this account. In your facilitator dashboard, there is an area to register each individual facilitator (one for each individual facilitator name that you provided on the confirmation form) for workshops. Registration is not required for facilitators, but if you have time, we highly recommend checking out the other workshops! We ask that you use the facilitator portal, not the standard/delegate registration page to register for workshops in order to help keep our registration numbers as accurate as possible.\n\n"
+        f"To access your account visit: {login_url}\n\n"
+        f"Your username is: {username}\n\nWe do not support username changes at this time. Upon visiting the provided link, you will be prompted to provide an email and password to finish setting up your account. The provided link will expire on Friday, November 14th at 11:59pm.\n\n"
+        "We recommend that only one member of your organization/department handles and has access to this account to reduce the risk of compromising passwords.\n\n"
+        "After you have set up your account, you can visit https://fact.psauiuc.org/my-fact/login to login (make sure to select “Facilitator” before attempting to login!) to view your workshop information.\n\n"
+        "If you encounter any issues with accessing your account, please contact FACT IT at fact.it@psauiuc.org."
+    )
+    return subject, body
+
+
+def facilitator_link_messages(emails):
+    """
+    Unsaved messages for every facilitator, in two queries.
+    Args:
+        emails: {department name: comma separated addresses} from the sheet
+    Returns:
+        list: MailJobMessages, skipped ones carry the reason in error
+    """
+    facilitators = list(Facilitator.objects.select_related("user").order_by("pk"))
+
+    # the first set up token of each account, like AccountSetUp.first()
+    set_ups = {}
+    for set_up in AccountSetUp.objects.filter(
+        username__in=[facilitator.user.username for facilitator in facilitators]
+    ).order_by("pk"):
+        set_ups.setdefault(set_up.username, set_up)
+
+    messages = []
+    for facilitator in facilitators:
+        name = str(facilitator.department_name).strip()
+        addresses = emails.get(name)
+        set_up = set_ups.get(facilitator.user.username)
+
+        if not addresses:
+            error = f"No matching email for facilitator: {facilitator.department_name}"
+        elif not set_up:
+            error = f"No account setup found for facilitator: {facilitator.department_name}"
+        else:
+            error = ""
+
+        if error:
+            messages.append(
+                MailJobMessage(name=name, status=MailJobMessage.SKIPPED, error=error)
+            )
+            continue
+
+        subject, body = facilitator_link_email(
+            facilitator.department_name,
+            set_up.username,
+            f"{os.getenv('ACCOUNT_SET_UP_URL')}/{set_up.token}",
+        )
+        messages.append(
+            MailJobMessage(
+                name=name,
+                to=[address.strip() for address in addresses.split(",") if address.strip()],
+                subject=subject,
+                body=body,
+            )
+        )
+
+    return messages
+
+
+def create_job(kind, messages):
+    job = MailJob.objects.create(kind=kind)
+    for message in messages:
+        message.job = job
+    MailJobMessage.objects.bulk_create(messages)
+    return job
+
+
+def deliver(pending, results, from_email):
+    """
+    Worker: send messages from pending over one SMTP connection kept open
+    between them, putting (message, error) on results. Doesn't touch the
+    database, run_job saves the results.
+    """
+    try:
+        connection = get_connection()
+    except Exception as e:
+        # every message this worker takes fails, run_job still gets a result
+        connection, connection_error = None, str(e)
+
+    try:
+        while True:
+            try:
+                message = pending.get_nowait()
+            except queue.Empty:
+                return
+
+            if connection is None:
+                results.put((message, connection_error))
+                continue
+
+            try:
+                # reopens after a failure closed it, no-op while open
+                connection.open()
+                sent = connection.send_messages(
+                    [
+                        EmailMessage(
+                            message.subject,
+                            message.body,
+                            from_email,
+                            message.to,
+                            connection=connection,
+                        )
+                    ]
+                )
+                results.put((message, None if sent else "Not sent"))
+            except Exception as e:
+                results.put((message, str(e)))
+                # the connection may be broken, start the next send on a new one
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+    finally:
+        if connection is not None:
+            connection.close()
+
+
+def run_job(job, connections=None):
+    """
+    Send the pending messages of a job over a pool of persistent SMTP
+    connections, saving each result as it comes in and clearing the body.
+    Args:
+        job: MailJob
+        connections: Worker threads, each with its own connection
+            (default BULK_MAIL_CONNECTIONS)
+    """
+    connections = connections or settings.BULK_MAIL_CONNECTIONS
+    messages = list(job.messages.filter(status=MailJobMessage.PENDING))
+    from_email = os.getenv("EMAIL_HOST_USER")
+
+    pending = queue.SimpleQueue()
+    for message in messages:
+        pending.put(message)
+    results = queue.SimpleQueue()
+
+    workers = [
+        threading.Thread(
+            target=deliver, args=(pending, results, from_email), name="mail-job", daemon=True
+        )
+        for _ in range(min(connections, len(messages)))
+    ]
+    for worker in workers:
+        worker.start()
+
+    for _ in messages:
+        message, error = results.get()
+        if error:
+            message.status, message.error = MailJobMessage.FAILED, error
+        else:
+            message.status, message.sent_at = MailJobMessage.SENT, timezone.now()
+        # bodies hold live account set up links, only kept until sent
+        message.body = ""
+        message.save(update_fields=["status", "error", "sent_at", "body"])
+
+    for worker in workers:
+        worker.join()
+
+    job.status = MailJob.DONE
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "finished_at"])
+
+
+def start(job):
+    """
+    Run a job in a background thread of this process, or right away when
+    BULK_MAIL_BACKGROUND is off (tests). A job interrupted by a restart
+    stays running with its unsent messages pending.
+    """
+    if not settings.BULK_MAIL_BACKGROUND:
+        run_job(job)
+        return
+
+    def run():
+        try:
+            run_job(job)
+        finally:
+            db_connection.close()
+
+    threading.Thread(target=run, name=f"mail-job-{job.pk}", daemon=True).start()
+
+
+def job_status(job):
+    """
+    Counts per status and every message's result.
+    """
+    messages = list(job.messages.order_by("pk"))
+    counts = {
+        status: 0
+        for status in [
+            MailJobMessage.PENDING,
+            MailJobMessage.SENT,
+            MailJobMessage.FAILED,
+            MailJobMessage.SKIPPED,
+        ]
+    }
+    for message in messages:
+        counts[message.status] += 1
+
+    return {
+        "job": job.pk,
+        "kind": job.kind,
+        "status": job.status,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+        **counts,
+        "messages": [
+            {
+                "name": message.name,
+                "to": message.to,
+                "status": message.status,
+                "error": message.error,
+                "sent_at": message.sent_at,
+            }
+            for message in messages
+        ],
+    }
@@ -0,0 +1,118 @@
+from django.db.models import Count, F, FloatField, Sum
+from django.db.models.functions import Cast, Coalesce, Trunc
+from django.utils import timezone
+
+from registration.models import Delegate, Workshop
+
+BUCKETS = ["minute", "hour", "day"]
+
+
+def timeline(bucket, days):
+    """
+    Delegate sign ups of the last days counted per bucket by the database.
+    Returns:
+        list: {"time", "count"} per bucket with sign ups, oldest first
+    """
+    rows = (
+        Delegate.objects.filter(
+            date_created__gt=timezone.now() - timezone.timedelta(days=days)
+        )
+        .annotate(time=Trunc("date_created", bucket))
+        .values("time")
+        .annotate(count=Count("id"))
+        .order_by("time")
+    )
+
+    return [{"time": row["time"], "count": row["count"]} for row in rows]
+
+
+def session_fill():
+    """
+    Delegate seats taken and seats available per session, from the seat
+    counters kept by the registration log.
+    """
+    rows = (
+        Workshop.objects.values("session")
+        .annotate(
+            registered=Coalesce(Sum("workshopseats__registered"), 0),
+            capacity=Coalesce(Sum("location__capacity"), 0),
+        )
+        .order_by("session")
+    )
+
+    return [
+        {
+            "session": row["session"],
+            "registered": row["registered"],
+            "capacity": row["capacity"],
+            "fill": round(row["registered"] / row["capacity"], 3) if row["capacity"] else None,
+        }
+        for row in rows
+    ]
+
+
+def school_counts():
+    """
+    Delegates per school, largest first. Delegates with a school that is
+    not in the list are counted under None.
+    """
+    rows = (
+        Delegate.objects.values("school_id", "school__name")
+        .annotate(delegates=Count("id"))
+        .order_by("-delegates", "school__name")
+    )
+
+    return [{"school": row["school__name"], "delegates": row["delegates"]} for row in rows]
+
+
+def fullest_workshops(top):
+    """
+    The top workshops by share of seats taken by delegates.
+    """
+    rows = (
+        Workshop.objects.filter(location__capacity__gt=0)
+        .annotate(
+            registered=Coalesce(F("workshopseats__registered"), 0),
+            fill=Cast(Coalesce(F("workshopseats__registered"), 0), FloatField())
+            / F("location__capacity"),
+        )
+        .order_by("-fill", "id")
+        .values("id", "title", "session", "registered", "location__capacity", "fill")[:top]
+    )
+
+    return [
+        {
+            "id": row["id"],
+            "title": row["title"],
+            "session": row["session"],
+            "registered": row["registered"],
+            "capacity": row["location__capacity"],
+            "fill": round(row["fill"], 3),
+        }
+        for row in rows
+    ]
+
+
+def build_summary(bucket="hour", days=5, top=10):
+    """
+    Event stats for the admin dashboard, in four grouped queries.
+    Args:
+        bucket: Timeline bucket, minute, hour or day
+        days: Days of sign ups in the timeline
+        top: Number of fullest workshops
+    Returns:
+        dict: Summary
+    """
+    sessions = session_fill()
+    schools = school_counts()
+
+    return {
+        # every registered delegate has a workshop in each session
+        "delegates": max([session["registered"] for session in sessions], default=0),
+        "schools": len([school for school in schools if school["school"] is not None]),
+        "bucket": bucket,
+        "timeline": timeline(bucket, days),
+        "sessions": sessions,
+        "school_counts": schools,
+        "fullest_workshops": fullest_workshops(top),
+    }
@@ -1,13 +1,28 @@
+import io
 import json
-from django.test import TestCase, Client
+from unittest import mock
+
+import pandas as pd
+from django.core import mail
+from django.core.management import call_command
+
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import Group, User
 
-from fact_admin.models import RegistrationFlag
+from fact_admin.actions import feed, mailer, views
+from fact_admin.actions import summary as summary_engine
+from fact_admin.models import MailJob, MailJobMessage, RegistrationFlag
+from registration import events, forecast
+from registration.cache import response_cache
+from registration.models import AccountSetUp, Delegate, Facilitator, Registration, Workshop
+from registration.seed import seed_event
+from registration.testing import AsyncViewMixin, excel_upload, seed_small_event
 
 
 class RegistrationFlagsGET(TestCase):
     def setUp(self):
+        response_cache().clear()
         self.client = Client()
 
         self.expected_data = [
@@ -39,8 +54,18 @@ class RegistrationFlagsGET(TestCase):
         self.assertEqual(actual, self.expected_data)
 
 
+class RegistrationFlagsAsync(AsyncViewMixin, TestCase):
+    def setUp(self):
+        response_cache().clear()
+        seed_small_event()
+
+    async def test_registration_flags(self):
+        await self.assertSameResponse(views.registration_flags, views.registration_flags_async)
+
+
 class RegistrationFlagLabelGET(TestCase):
     def setUp(self):
+        response_cache().clear()
         self.client = Client()
 
         RegistrationFlag.objects.create(label="first-flag", value=False)
@@ -74,6 +99,7 @@ class RegistrationFlagLabelGET(TestCase):
 
 class RegistrationFlagLabelPUT(TestCase):
     def setUp(self):
+        response_cache().clear()
         self.client = Client()
 
         # users
@@ -160,6 +186,7 @@ class RegistrationFlagLabelPUT(TestCase):
 
 class SummaryGET(TestCase):
     def setUp(self):
+        response_cache().clear()
         self.client = Client()
 
         # users
@@ -202,6 +229,324 @@ class SummaryGET(TestCase):
         # TODO test actual data getting
 
 
+class SummaryData(TestCase):
+    def setUp(self):
+        response_cache().clear()
+        seed_event(seed=3, schools=4, workshops_per_session=3, capacity=10, delegates=20)
+
+        admin = User.objects.create(username="summary-admin")
+        admin.groups.add(Group.objects.create(name="FACTAdmin"))
+
+        self.client = Client()
+        self.client.force_login(admin)
+        self.url = reverse("fact_admin:summary")
+
+    def test_summary_is_four_queries(self):
+        with self.assertNumQueries(4):
+            summary_engine.build_summary()
+
+    def test_counts(self):
+        response = self.client.get(self.url, {"bucket": "day", "top": 2})
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+
+        self.assertEqual(
+            data["delegates"], Registration.objects.values("delegate").distinct().count()
+        )
+        self.assertEqual(data["schools"], Delegate.objects.values("school").distinct().count())
+        self.assertEqual(sum(row["count"] for row in data["timeline"]), 20)
+        self.assertEqual(data["bucket"], "day")
+
+        for row in data["sessions"]:
+            self.assertEqual(
+                row["registered"],
+                Registration.objects.filter(workshop__session=row["session"]).count(),
+            )
+        self.assertEqual(sum(row["delegates"] for row in data["school_counts"]), 20)
+
+        fills = [row["fill"] for row in data["fullest_workshops"]]
+        self.assertEqual(len(fills), 2)
+        self.assertEqual(fills, sorted(fills, reverse=True))
+
+    def test_rejects_unknown_bucket(self):
+        response = self.client.get(self.url, {"bucket": "week"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cached_between_refreshes(self):
+        first = self.client.get(self.url)
+        second = self.client.get(self.url)
+
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first.query_stats["queries"] - second.query_stats["queries"], 4)
+
+
+class ForecastGET(TestCase):
+    def setUp(self):
+        response_cache().clear()
+        seed_event(seed=3, schools=4, workshops_per_session=3, capacity=10, delegates=20)
+
+        self.admin = User.objects.create(username="forecast-admin")
+        self.admin.groups.add(Group.objects.create(name="FACTAdmin"))
+
+        self.client = Client()
+        self.url = reverse("fact_admin:forecast")
+
+    def test_rejects_non_admin(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+
+    def test_gets_forecast(self):
+        self.client.force_login(self.admin)
+
+        response = self.client.get(self.url, {"hours": 12, "half_life": 3})
+        self.assertEqual(response.status_code, 200)
+
+        rows = json.loads(response.content)
+        self.assertEqual(len(rows), Workshop.objects.count())
+        self.assertEqual(
+            set(rows[0]),
+            {
+                "id",
+                "title",
+                "session",
+                "taken",
+                "capacity",
+                "rate_per_hour",
+                "demand",
+                "overflow",
+                "full_at",
+            },
+        )
+
+    def test_rejects_bad_params(self):
+        self.client.force_login(self.admin)
+
+        self.assertEqual(self.client.get(self.url, {"hours": "soon"}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"half_life": 0}).status_code, 400)
+
+
+class CapacityForecast(TestCase):
+    def test_projects_recent_rate(self):
+        # 10 sign ups an hour for two days, recent registrations all for the
+        # first of two workshops in the session
+        arrivals = [hour + 0.05 * i for hour in range(48) for i in range(10)]
+        events_at = [47 + 0.1 * i for i in range(10)]
+
+        result = forecast.project(
+            arrivals,
+            events_at,
+            [0] * 10,
+            [1] * 10,
+            sessions=[1, 1],
+            taken=[20, 5],
+            capacity=[40, 5],
+            now=48,
+            until=58,
+        )
+
+        self.assertAlmostEqual(sum(result["rate"]), 10, delta=0.5)
+        self.assertGreater(result["rate"][0], 9 * result["rate"][1])
+        self.assertAlmostEqual(result["demand"][0], 20 + 10 * result["rate"][0])
+        self.assertAlmostEqual(result["hours_to_full"][0], 20 / result["rate"][0])
+        # already full
+        self.assertEqual(result["hours_to_full"][1], 0)
+
+    def test_no_activity_never_fills(self):
+        result = forecast.project(
+            [], [], [], [], sessions=[1], taken=[3], capacity=[10], now=48, until=58
+        )
+
+        self.assertEqual(list(result["demand"]), [3])
+        self.assertEqual(list(result["hours_to_full"]), [float("inf")])
+
+    def test_forecast_is_three_queries(self):
+        seed_small_event()
+
+        with self.assertNumQueries(3):
+            rows = forecast.forecast()
+
+        self.assertEqual(len(rows), Workshop.objects.count())
+        for row in rows:
+            self.assertGreaterEqual(row["demand"], row["taken"])
+
+    def test_workshop_without_location(self):
+        seed_small_event()
+        workshop = Workshop.objects.create(title="Unplaced", description="d", session=1)
+
+        rows = forecast.forecast()
+
+        row = next(row for row in rows if row["id"] == workshop.pk)
+        self.assertIsNone(row["capacity"])
+        self.assertIsNone(row["overflow"])
+        self.assertIsNone(row["full_at"])
+        # still forecast, for the location matcher
+        self.assertGreaterEqual(row["demand"], row["taken"])
+        # not listed as the first to fill
+        self.assertIsNotNone(rows[0]["capacity"])
+
+        out = io.StringIO()
+        call_command("forecastcapacity", stdout=out)
+        self.assertIn("Unplaced", out.getvalue())
+
+    def test_backtest(self):
+        result = forecast.backtest(runs=5)
+        self.assertLess(result["demand_relative_error"], 0.5)
+
+    def test_command(self):
+        seed_small_event()
+        out = io.StringIO()
+
+        call_command("forecastcapacity", "--json", "--top", "2", stdout=out)
+
+        self.assertEqual(len(json.loads(out.getvalue())), 2)
+
+
+@mock.patch.object(feed.Aggregator, "start")
+class SummaryLive(TestCase):
+    """
+    The aggregator is polled by hand here instead of from its thread.
+    """
+
+    def setUp(self):
+        seed_event(seed=4, schools=2, workshops_per_session=2, capacity=10, delegates=0)
+
+        self.admin = User.objects.create(username="live-admin")
+        self.admin.groups.add(Group.objects.create(name="FACTAdmin"))
+
+        self.delegate = Delegate.objects.create(user=User.objects.create(username="live"))
+        self.aggregator = feed.Aggregator()
+
+    def events(self, subscriber):
+        events = []
+        while not subscriber.empty():
+            events.append(subscriber.get_nowait())
+        return events
+
+    def test_starts_with_a_snapshot(self, start):
+        subscriber = self.aggregator.subscribe()
+
+        event, data = subscriber.get_nowait()
+        self.assertEqual(event, "snapshot")
+        self.assertEqual(data["delegates"], 1)
+        self.assertEqual(len(data["workshops"]), Workshop.objects.count())
+        start.assert_called_once()
+
+    def test_pushes_changes_to_every_subscriber(self, start):
+        first = self.aggregator.subscribe()
+        second = self.aggregator.subscribe()
+        self.events(first)
+        self.events(second)
+
+        workshop = Workshop.objects.select_related("location").filter(session=1).first()
+        workshop.location.capacity = 1
+        workshop.location.save()
+        self.aggregator.state = None
+        self.aggregator.subscribe()
+
+        events.set_registrations(self.delegate, [workshop])
+
+        # one poll however many admins watch
+        with self.assertNumQueries(3):
+            changes = self.aggregator.poll()
+        self.aggregator.publish(changes)
+
+        for subscriber in [first, second]:
+            self.assertEqual(
+                self.events(subscriber),
+                [
+                    ("seats", {"workshops": {workshop.pk: 1}}),
+                    (
+                        "capacity",
+                        {
+                            "workshop": workshop.pk,
+                            "title": workshop.title,
+                            "level": 100,
+                            "registered": 1,
+                            "capacity": 1,
+                        },
+                    ),
+                ],
+            )
+
+        # nothing new, nothing sent
+        self.aggregator.publish(self.aggregator.poll())
+        self.assertTrue(first.empty())
+
+    @override_settings(ADMIN_FEED_QUEUE=2)
+    def test_stalled_client_gets_a_snapshot(self, start):
+        subscriber = self.aggregator.subscribe()
+
+        self.aggregator.publish([("delegates", {"delegates": n}) for n in range(3)])
+
+        self.assertEqual([event for event, data in self.events(subscriber)], ["snapshot"])
+
+    def test_stream(self, start):
+        client = Client()
+        self.assertEqual(client.get(reverse("fact_admin:summary_live")).status_code, 403)
+
+        client.force_login(self.admin)
+        with mock.patch.object(feed, "aggregator", self.aggregator):
+            response = client.get(reverse("fact_admin:summary_live"))
+            chunks = iter(response.streaming_content)
+
+            self.assertEqual(response["Content-Type"], "text/event-stream")
+            self.assertEqual(next(chunks), b"retry: 3000\n\n")
+            self.assertTrue(next(chunks).startswith(b"event: snapshot\ndata: {"))
+
+            response.close()
+
+        self.assertFalse(self.aggregator.subscribers)
+
+    def test_stream_ends_after_max_age(self, start):
+        chunks = list(feed.stream(self.aggregator, heartbeat=0.01, max_age=0.05))
+
+        self.assertEqual(chunks[0], "retry: 3000\n\n")
+        self.assertTrue(chunks[1].startswith("event: snapshot"))
+        self.assertFalse(self.aggregator.subscribers)
+
+    @override_settings(ADMIN_FEED_MAX_STREAMS=1)
+    def test_streams_are_capped(self, start):
+        client = Client()
+        client.force_login(self.admin)
+        self.aggregator.subscribe()
+
+        with mock.patch.object(feed, "aggregator", self.aggregator):
+            response = client.get(reverse("fact_admin:summary_live"))
+
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response)
+
+    @override_settings(ADMIN_FEED_BACKLOG_INTERVAL=15)
+    def test_backlog_read_every_backlog_interval(self, start):
+        self.aggregator.subscribe()
+        read_at = self.aggregator.state["backlog_at"]
+
+        with mock.patch.object(feed.metrics, "email_backlog", return_value=3) as backlog:
+            self.assertEqual(self.aggregator.poll(now=read_at + 1), [])
+            backlog.assert_not_called()
+
+            changes = self.aggregator.poll(now=read_at + 15)
+
+        backlog.assert_called_once()
+        self.assertEqual(changes, [("email_backlog", {"backlog": 3})])
+
+    def test_polls_without_the_lock(self, start):
+        self.aggregator.subscribe()
+
+        def poll(state):
+            # another admin can subscribe while the database is queried
+            self.assertTrue(self.aggregator.lock.acquire(blocking=False))
+            self.aggregator.lock.release()
+            return []
+
+        with mock.patch.object(self.aggregator, "poll", side_effect=poll) as polled, \
+                mock.patch.object(self.aggregator.stopped, "wait", side_effect=[False, True]), \
+                mock.patch.object(feed.connection, "close"):
+            self.aggregator.run()
+
+        polled.assert_called_once()
+
+
 class DelegateSheetGET(TestCase):
     def setUp(self):
         self.client = Client()
@@ -280,3 +625,119 @@ class LocationSheetGET(TestCase):
     # TODO write test
     def test_gets_sheet(self):
         pass
+
+
+class SendFacilitatorLinks(TestCase):
+    def setUp(self):
+        admin = User.objects.create(username="links-admin")
+        admin.groups.add(Group.objects.create(name="FACTAdmin"))
+        self.client = Client()
+        self.client.force_login(admin)
+
+        for department in ["Chemistry", "Physics", "Biology", "History"]:
+            user = User.objects.create(username=department.lower())
+            Facilitator.objects.create(user=user, department_name=department)
+            # History never got a set up token
+            if department != "History":
+                AccountSetUp.objects.create(
+                    username=user.username, token=f"{user.username}-token", expiration="2030-01-01T00:00Z"
+                )
+
+        self.url = reverse("fact_admin:send_facilitator_links")
+
+    def sheet(self):
+        df = pd.DataFrame(
+            {
+                "Facilitator Name": [" Chemistry", "Chemistry", "Physics", "History"],
+                "Facilitator Email": [
+                    "Chem@example.com, lab@example.com",
+                    "second@example.com",
+                    "physics@example.com ",
+                    "history@example.com",
+                ],
+            }
+        )
+        return excel_upload(df)
+
+    def test_sends_in_a_job(self):
+        response = self.client.post(self.url, {"emails": self.sheet()})
+        self.assertEqual(response.status_code, 202)
+        data = response.json()
+        self.assertEqual(len(data["failed"]), 2)
+
+        status = self.client.get(
+            reverse("fact_admin:send_facilitator_links_job", args=[data["job"]])
+        ).json()
+        self.assertEqual(status["status"], MailJob.DONE)
+        self.assertEqual(
+            (status["sent"], status["failed"], status["skipped"], status["pending"]),
+            (2, 0, 2, 0),
+        )
+
+        # the first row of a facilitator wins
+        chemistry = next(message for message in mail.outbox if "Chemistry" in message.subject)
+        self.assertEqual(chemistry.to, ["chem@example.com", "lab@example.com"])
+        self.assertIn("/chemistry-token", chemistry.body)
+
+        # the set up links are only in the emails
+        self.assertFalse(MailJobMessage.objects.exclude(body="").exists())
+
+    def test_messages_in_two_queries(self):
+        with self.assertNumQueries(2):
+            messages = mailer.facilitator_link_messages({"Physics": "physics@example.com"})
+
+        self.assertEqual(
+            {message.name: message.status for message in messages},
+            {
+                "Chemistry": MailJobMessage.SKIPPED,
+                "Physics": MailJobMessage.PENDING,
+                "Biology": MailJobMessage.SKIPPED,
+                "History": MailJobMessage.SKIPPED,
+            },
+        )
+
+    def test_failures_are_per_message(self):
+        job = mailer.create_job(
+            "test",
+            [
+                MailJobMessage(name=name, to=[f"{name}@example.com"], subject=name, body="body")
+                for name in ["a", "bad", "c"]
+            ],
+        )
+        connection = mock.Mock()
+        connection.send_messages.side_effect = lambda messages: (
+            1 if messages[0].subject != "bad" else (_ for _ in ()).throw(OSError("refused"))
+        )
+
+        with mock.patch.object(mailer, "get_connection", return_value=connection):
+            mailer.run_job(job, connections=2)
+
+        results = dict(job.messages.values_list("name", "status"))
+        self.assertEqual(
+            results,
+            {"a": MailJobMessage.SENT, "bad": MailJobMessage.FAILED, "c": MailJobMessage.SENT},
+        )
+        self.assertEqual(job.messages.get(name="bad").error, "refused")
+
+    def test_connections_are_reused(self):
+        job = mailer.create_job(
+            "test",
+            [
+                MailJobMessage(name=str(i), to=["a@example.com"], subject="s", body="b")
+                for i in range(10)
+            ],
+        )
+        connection = mock.Mock()
+        connection.send_messages.return_value = 1
+
+        with mock.patch.object(mailer, "get_connection", return_value=connection) as get:
+            mailer.run_job(job, connections=3)
+
+        # one connection per worker, not per message
+        self.assertEqual(get.call_count, 3)
+        self.assertEqual(connection.send_messages.call_count, 10)
+        self.assertEqual(job.messages.filter(status=MailJobMessage.SENT).count(), 10)
+
+    def test_unknown_job(self):
+        response = self.client.get(reverse("fact_admin:send_facilitator_links_job", args=[999]))
+        self.assertEqual(response.status_code, 404)
@@ -1,16 +1,20 @@
 import json
-from django.http import FileResponse, HttpResponse, JsonResponse
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.core import serializers as django_serializers
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
-from django.core.mail import send_mail
-import os
 
-import pandas as pd
+from fact_admin.actions import feed, mailer
+from fact_admin.actions import summary as summary_engine
+from fact_admin.models import MailJob, MailJobMessage, RegistrationFlag
+from fact_registration_backend.lazy import lazy_import
+from registration import cache as response_cache
+from registration.models import Delegate, Location, Registration, School, Workshop, Facilitator
 
-from fact_admin.models import RegistrationFlag
-from registration.models import Delegate, Location, Registration, School, Workshop, Facilitator, AccountSetUp
+pd = lazy_import("pandas")
 
 # set workshop locations
 # get summary (sheet)
@@ -24,12 +28,34 @@ def registration_flags(request):
     GET: List all registration flags
     """
     if request.method == "GET":
-        data = django_serializers.serialize("json", RegistrationFlag.objects.all())
+        data = response_cache.cached(
+            "registration_flags",
+            "registration_flags",
+            lambda: django_serializers.serialize("json", RegistrationFlag.objects.all()),
+        )
         return HttpResponse(data, content_type="application/json")
     else:
         return JsonResponse({"message": "method not allowed"}, status=405)
 
 
+async def registration_flags_async(request):
+    """
+    registration_flags for ASGI, using the async ORM and the response cache.
+    """
+    if request.method != "GET":
+        return JsonResponse({"message": "method not allowed"}, status=405)
+
+    async def build():
+        return django_serializers.serialize(
+            "json", [flag async for flag in RegistrationFlag.objects.all()]
+        )
+
+    return HttpResponse(
+        await response_cache.acached("registration_flags", "registration_flags", build),
+        content_type="application/json",
+    )
+
+
 def registration_flag_id(request, label):
     """
     GET: Get flag by label
@@ -76,8 +102,13 @@ def registration_flag_id(request, label):
 
 def summary(request):
     """
-    GET: Event stats (admin only)
-    Returns: delegate count, school count, recent registrations (past 5 days)
+    GET: Event stats (admin only), cached for a few seconds
+    Query params:
+        - bucket: Timeline bucket, minute, hour (default) or day
+        - days: Days of sign ups in the timeline (default 5)
+        - top: Number of fullest workshops (default 10)
+    Returns: registered delegates, schools, sign ups per bucket, fill per
+    session, delegates per school and the fullest workshops
     """
     if not request.user.groups.filter(name="FACTAdmin").exists():
         return JsonResponse(
@@ -85,27 +116,118 @@ def summary(request):
         )
 
     if request.method == "GET":
-        # delegates = Delegate.objects.all().count()
-        delegates = Registration.objects.values("delegate").distinct().count()
-        schools = (
-            Delegate.objects.values("school")
-            .distinct()
-            .count()
-            # + Delegate.objects.values("other_school").distinct().count()
+        bucket = request.GET.get("bucket", "hour")
+
+        if bucket not in summary_engine.BUCKETS:
+            return JsonResponse(
+                {"message": "bucket must be minute, hour or day"}, status=400
+            )
+
+        try:
+            days = int(request.GET.get("days", 5))
+            top = int(request.GET.get("top", 10))
+        except ValueError:
+            return JsonResponse({"message": "days and top must be numbers"}, status=400)
+
+        if days < 1 or top < 1:
+            return JsonResponse({"message": "days and top must be positive"}, status=400)
+
+        data = response_cache.cached(
+            "summary",
+            f"summary:{bucket}:{days}:{top}",
+            lambda: json.dumps(
+                summary_engine.build_summary(bucket, days, top), cls=DjangoJSONEncoder
+            ),
         )
 
-        registrations = Delegate.objects.filter(
-            date_created__gt=timezone.now() - timezone.timedelta(days=5)
-        ).values_list("date_created", flat=True)
+        return HttpResponse(data, content_type="application/json")
+    else:
+        return JsonResponse({"message": "method not allowed"}, status=405)
+
 
+def capacity_forecast(request):
+    """
+    GET: When each workshop will fill and the seats it will need (admin only),
+    projected from the recent sign up and registration rates, cached briefly
+    Query params:
+        - hours: Hours until registration closes (default 24)
+        - half_life: Hours after which activity counts half (default 6)
+    Returns: per workshop seats taken, capacity, seats per hour, forecast
+    demand, overflow and full_at (null when it won't fill), soonest first
+    """
+    if not request.user.groups.filter(name="FACTAdmin").exists():
         return JsonResponse(
-            {
-                "delegates": delegates,
-                "schools": schools,
-                "registrations": list(registrations),
-            },
-            safe=False,
+            {"message": "Must be admin to make this request"}, status=403
         )
+
+    if request.method == "GET":
+        try:
+            hours = float(request.GET.get("hours", 24))
+            half_life = float(request.GET.get("half_life", 6))
+        except ValueError:
+            return JsonResponse(
+                {"message": "hours and half_life must be numbers"}, status=400
+            )
+
+        if hours < 0 or half_life <= 0:
+            return JsonResponse(
+                {"message": "hours and half_life must be positive"}, status=400
+            )
+
+        def build():
+            # imported here so numpy is not loaded at boot
+            from registration import forecast as forecast_engine
+
+            now = timezone.now()
+            return json.dumps(
+                forecast_engine.forecast(
+                    now=now,
+                    until=now + timezone.timedelta(hours=hours),
+                    half_life=half_life,
+                ),
+                cls=DjangoJSONEncoder,
+            )
+
+        data = response_cache.cached(
+            "forecast", f"forecast:{hours}:{half_life}", build
+        )
+
+        return HttpResponse(data, content_type="application/json")
+    else:
+        return JsonResponse({"message": "method not allowed"}, status=405)
+
+
+def summary_live(request):
+    """
+    GET: Server-sent events with live event stats (admin only)
+    Starts with a snapshot (delegates, seats per workshop, email backlog),
+    then sends what changed: delegates, seats, capacity (a workshop reached
+    90% or 100%) and email_backlog. One aggregator per process polls the
+    database for every connected admin.
+    Each open stream holds a server thread, so a process serves at most
+    ADMIN_FEED_MAX_STREAMS of them (503 past that) for ADMIN_FEED_MAX_AGE
+    seconds each, then the browser reconnects.
+    """
+    if not request.user.groups.filter(name="FACTAdmin").exists():
+        return JsonResponse(
+            {"message": "Must be admin to make this request"}, status=403
+        )
+
+    if request.method == "GET":
+        if feed.aggregator.streams() >= getattr(settings, "ADMIN_FEED_MAX_STREAMS", 4):
+            response = JsonResponse(
+                {"message": "Too many live dashboards open, try again later"}, status=503
+            )
+            response["Retry-After"] = "30"
+            return response
+
+        response = StreamingHttpResponse(
+            feed.stream(feed.aggregator), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        # nginx would buffer the stream otherwise
+        response["X-Accel-Buffering"] = "no"
+        return response
     else:
         return JsonResponse({"message": "method not allowed"}, status=405)
 
@@ -169,7 +291,7 @@ def delegate_sheet(request):
 
         # Drop unwanted columns
         df.drop(
-            ["id", "user_id", "other_school", "school_id", "date_created"],
+            ["id", "user_id", "other_school", "school_id", "date_created", "date_modified"],
             axis=1,
             inplace=True,
         )
@@ -254,11 +376,13 @@ def location_sheet(request):
 @csrf_exempt
 def send_facilitator_links(request):
     """
-    POST: Print (instead of send) individual login links to facilitators (admin only)
+    POST: Email every facilitator their account set up link (admin only)
     Requires uploaded Excel file with:
         - 'Facilitator Name' (matches Facilitator.department_name)
         - 'Facilitator Email'
-    Prints each facilitator's personalized email to console for verification.
+    The emails are sent in the background, poll the returned job with
+    send_facilitator_links_job. Returns 202 with the job id and the
+    facilitators skipped (no email in the sheet or no set up token)
     """
     if not request.user.groups.filter(name="FACTAdmin").exists():
         return JsonResponse(
@@ -289,68 +413,53 @@ def send_facilitator_links(request):
         df["Facilitator Email"] = df["Facilitator Email"].str.strip().str.lower()
         df["Facilitator Name"] = df["Facilitator Name"].str.strip()
 
-        facilitators = Facilitator.objects.all()
-        if facilitators.count() == 0:
+        if not Facilitator.objects.exists():
             return JsonResponse(
                 {"message": "No facilitators found"}, status=404
             )
 
-        sent_count = 0
-        failed = []
-
-        # Collect facilitator info with their account setup tokens
-        for facilitator in facilitators:
-            name_key = str(facilitator.department_name).strip()
-            match = df.loc[df["Facilitator Name"] == name_key]
-
-            if match.empty:
-                failed.append(f"No matching email for facilitator: {facilitator.department_name}")
-                continue
-
-            account_setup = AccountSetUp.objects.filter(username=facilitator.user.username).first()
-            if not account_setup:
-                failed.append(f"No account setup found for facilitator: {facilitator.department_name}")
-                continue
-
-            facilitator_email = match.iloc[0]["Facilitator Email"]
-    
-            # Login link using the stored token
-            login_url = f"{os.getenv('ACCOUNT_SET_UP_URL')}/{account_setup.token}"
-
-            from_email = os.getenv("EMAIL_HOST_USER")
-            to_email = [email.strip() for email in facilitator_email.split(",")]
-            
-            subject = (f"FACT 2025 Facilitator Account - {facilitator.department_name}")
-            body = (
-                f"Dear {facilitator.department_name},\n\n"
-                "As a part of the FACT registration system, each facilitator can access a dashboard showing up to date information on your workshop location and number of delegates registered for your workshop(s). These accounts are meant to supplement your experience as a facilitator and will be deactivated once FACT 2025 has concluded.\n\n"
-                "You will also be able to register for workshops through this account. In your facilitator dashboard, there is an area to register each individual facilitator (one for each individual facilitator name that you provided on the confirmation form) for workshops. Registration is not required for facilitators, but if you have time, we highly recommend checking out the other workshops! We ask that you use the facilitator portal, not the standard/delegate registration page to register for workshops in order to help keep our registration numbers as accurate as possible.\n\n"
-                f"To access your account visit: {login_url}\n\n"
-                f"Your username is: {account_setup.username}\n\nWe do not support username changes at this time. Upon visiting the provided link, you will be prompted to provide an email and password to finish setting up your account. The provided link will expire on Friday, November 14th at 11:59pm.\n\n"
-                "We recommend that only one member of your organization/department handles and has access to this account to reduce the risk of compromising passwords.\n\n"
-                "After you have set up your account, you can visit https://fact.psauiuc.org/my-fact/login to login (make sure to select “Facilitator” before attempting to login!) to view your workshop information.\n\n"
-                "If you encounter any issues with accessing your account, please contact FACT IT at fact.it@psauiuc.org."
-            )
+        # first row of each facilitator, looked up by name
+        emails = {}
+        for name, email in zip(df["Facilitator Name"], df["Facilitator Email"]):
+            if isinstance(email, str):
+                emails.setdefault(name, email)
 
-            # Print email details to console instead of sending for testing
-            # print("=========================================")
-            # print(f"To: {facilitator_email}")
-            # print(f"Subject: {subject}")
-            # print(f"Body:\n{body}")
-            # print("=========================================\n")
-            
-            try:
-                send_mail(subject, body, from_email, to_email)
-                sent_count += 1
-            except Exception as e:
-                failed.append(f"Failed to send email to {facilitator_email}: {str(e)}")
+        messages = mailer.facilitator_link_messages(emails)
+        job = mailer.create_job("facilitator_links", messages)
+        mailer.start(job)
 
+        skipped = [
+            message.error for message in messages if message.status == MailJobMessage.SKIPPED
+        ]
         return JsonResponse(
             {
-                "message": f"Successfully sent {sent_count} facilitator emails.",
-                "failed": failed,
+                "message": f"Sending {len(messages) - len(skipped)} facilitator emails.",
+                "job": job.pk,
+                "failed": skipped,
             },
-            status=200
+            status=202
         )
     else:
-        return JsonResponse({"message": "method not allowed"}, status=405)
\ No newline at end of file
+        return JsonResponse({"message": "method not allowed"}, status=405)
+
+
+def send_facilitator_links_job(request, id):
+    """
+    GET: Progress of a send_facilitator_links job (admin only)
+    Returns status (running or done), the number of messages pending, sent,
+    failed and skipped, and every message with its recipients and error
+    Returns 404 for an unknown job
+    """
+    if not request.user.groups.filter(name="FACTAdmin").exists():
+        return JsonResponse(
+            {"message": "Must be admin to make this request"}, status=403
+        )
+
+    if request.method == "GET":
+        job = MailJob.objects.filter(pk=id).first()
+        if job is None:
+            return JsonResponse({"message": "Job not found"}, status=404)
+
+        return JsonResponse(mailer.job_status(job), status=200)
+    else:
+        return JsonResponse({"message": "method not allowed"}, status=405)
@@ -1,8 +1,10 @@
 from django.contrib import admin
 
-from fact_admin.models import AgendaItem, Notification, RegistrationFlag
+from fact_admin.models import AgendaItem, MailJob, MailJobMessage, Notification, RegistrationFlag
 
 # Register your models here.
 admin.site.register(AgendaItem)
 admin.site.register(Notification)
 admin.site.register(RegistrationFlag)
+admin.site.register(MailJob)
+admin.site.register(MailJobMessage)
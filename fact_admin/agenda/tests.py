@@ -2,7 +2,8 @@ import json
 import os
 import random
 import pandas as pd
-from datetime import datetime
+import pytz
+from datetime import datetime, time
 
 from django.test import Client, TestCase
 from django.urls import reverse
@@ -11,11 +12,21 @@ from django.contrib.auth.models import User, Group
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.utils.timezone import make_aware
 
+from fact_admin.agenda import views
 from fact_admin.models import AgendaItem
+from registration.cache import response_cache
+from registration.testing import (
+    AsyncViewMixin,
+    BulkUploadMixin,
+    csv_upload,
+    excel_upload,
+    seed_small_event,
+)
 
 
 class AgendaItemsGET(TestCase):
     def setUp(self):
+        response_cache().clear()
         self.client = Client()
 
         self.expected_items = []
@@ -149,9 +160,28 @@ class AgendaItemsIDDELETE(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(AgendaItem.objects.all().count(), 0)
 
+    def test_delete_invalidates_cached_items(self):
+        response_cache().clear()
+        item = AgendaItem.objects.create(
+            title="item title",
+            start_time="2024-10-18T00:02:17.590Z",
+            end_time="2024-10-18T00:02:54.930Z",
+        )
+        url = reverse("fact_admin:agenda_items")
+        self.assertEqual(len(self.client.get(url).json()), 1)
+
+        self.client.login(username=self.username, password=self.password)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(
+                reverse("fact_admin:agenda_items_id", kwargs={"id": item.pk})
+            )
+
+        self.assertEqual(self.client.get(url).json(), [])
+
 
 class AgendaItemsPOST(TestCase):
     def setUp(self):
+        response_cache().clear()
         self.client = Client()
 
         # users
@@ -563,3 +593,144 @@ class AgendaItemsPOSTBulk(TestCase):
     #                 address="nan" if pd.isna(row["address"]) else row["address"],
     #             ).exists()
     #         )
+
+
+class AgendaItemsBulkModes(BulkUploadMixin, TestCase):
+    def test_10k_rows(self):
+        rows = 10000
+        df = pd.DataFrame(
+            {
+                "title": [f"item {i}" for i in range(rows)],
+                "date": [datetime(2024, 11, 16)] * rows,
+                "start_time": [time(9 + i % 8, 0) for i in range(rows)],
+                "end_time": [time(9 + i % 8, 45) for i in range(rows)],
+                "building": ["building"] * rows,
+                "room_num": [None if i % 5 else f"{i}" for i in range(rows)],
+                "session_num": [i % 4 or None for i in range(rows)],
+                "address": ["123 street"] * rows,
+            }
+        )
+
+        self.assertBatchedUpload(
+            reverse("fact_admin:agenda_items_bulk"), "agenda", df, AgendaItem
+        )
+
+        item = AgendaItem.objects.get(title="item 5")
+        self.assertEqual(item.room_num, "5")
+        self.assertIsNone(AgendaItem.objects.get(title="item 4").session_num)
+
+    def test_merge_matches_title_and_start(self):
+        df = pd.DataFrame(
+            {
+                "title": ["opening", "closing"],
+                "date": [datetime(2024, 11, 16)] * 2,
+                "start_time": [time(9, 0), time(17, 0)],
+                "end_time": [time(10, 0), time(18, 0)],
+                "building": ["union", "union"],
+                "room_num": ["101", None],
+                "session_num": [None, None],
+                "address": [None, None],
+            }
+        )
+        url = reverse("fact_admin:agenda_items_bulk")
+        self.client.post(url, {"agenda": excel_upload(df)})
+        opening = AgendaItem.objects.get(title="opening")
+
+        df.at[0, "building"] = "quad"
+        df = df.drop(1)
+        response = self.client.post(url + "?mode=merge", {"agenda": excel_upload(df)})
+
+        self.assertEqual(response.status_code, 200)
+        summary = response.json()
+        self.assertEqual(
+            (summary["created"], summary["updated"], summary["deleted"]), (0, 1, 1)
+        )
+        self.assertEqual(AgendaItem.objects.get(pk=opening.pk).building, "quad")
+
+    def test_dry_run(self):
+        df = pd.DataFrame(
+            {
+                "title": ["opening", None],
+                "date": [datetime(2024, 11, 16)] * 2,
+                "start_time": [time(11, 0), time(9, 0)],
+                "end_time": [time(10, 0), time(10, 0)],
+                "building": ["union", "union"],
+                "room_num": [None, None],
+                "session_num": [None, None],
+                "address": [None, None],
+            }
+        )
+
+        response = self.client.post(
+            reverse("fact_admin:agenda_items_bulk") + "?dry_run=1",
+            {"agenda": excel_upload(df)},
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [(error["row"], error["column"]) for error in response.json()["errors"]],
+            [(2, "start_time"), (3, "title")],
+        )
+        self.assertEqual(AgendaItem.objects.count(), 0)
+
+    def test_unreadable_cells_are_row_errors(self):
+        df = pd.DataFrame(
+            {
+                "title": ["opening", "lunch", "closing"],
+                "date": [datetime(2024, 11, 16), "someday", datetime(2024, 11, 16)],
+                "start_time": [time(9, 0), "noon-ish", time(17, 0)],
+                "end_time": [time(10, 0), time(13, 0), 18],
+                "building": ["union"] * 3,
+                "room_num": [None] * 3,
+                "session_num": [None] * 3,
+                "address": [None] * 3,
+            }
+        )
+        url = reverse("fact_admin:agenda_items_bulk")
+        expected = [(3, "date"), (3, "start_time"), (4, "end_time")]
+
+        for query in ("?dry_run=1", "?ingest=frame", "?ingest=stream"):
+            with self.subTest(query=query):
+                response = self.client.post(url + query, {"agenda": excel_upload(df)})
+
+                self.assertEqual(response.status_code, 400)
+                errors = response.json()["errors"]
+                self.assertEqual(
+                    sorted((error["row"], error["column"]) for error in errors),
+                    expected,
+                )
+                self.assertEqual(AgendaItem.objects.count(), 0)
+
+    def test_csv_dates_and_times(self):
+        df = pd.DataFrame(
+            {
+                "title": ["opening"],
+                "date": ["2024-11-16"],
+                "start_time": ["9:00"],
+                "end_time": ["10:00"],
+                "building": ["union"],
+                "room_num": [None],
+                "session_num": [None],
+                "address": [None],
+            }
+        )
+
+        response = self.client.post(
+            reverse("fact_admin:agenda_items_bulk"), {"agenda": csv_upload(df)}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        start = AgendaItem.objects.get().start_time
+        self.assertEqual(
+            start.astimezone(pytz.timezone("America/Chicago")).replace(tzinfo=None),
+            datetime(2024, 11, 16, 9, 0),
+        )
+
+
+class AgendaItemsAsync(AsyncViewMixin, TestCase):
+    def setUp(self):
+        response_cache().clear()
+        seed_small_event()
+
+    async def test_agenda_items(self):
+        await self.assertSameResponse(views.agenda_items, views.agenda_items_async)
@@ -2,14 +2,193 @@ import datetime
 import json
 import pytz
 
+from asgiref.sync import sync_to_async
 from django.http import HttpResponse, JsonResponse
-import pandas as pd
 from fact_admin.models import AgendaItem
+from fact_registration_backend.lazy import lazy_import
+from registration import cache as response_cache
+from registration.bulk import merge as bulk_merge
+from registration.bulk import pipeline as bulk
 from django.core import serializers as django_serializers
 from django.utils.dateparse import parse_datetime
-from django.utils import timezone
+from django.db import transaction
 from django.views.decorators.csrf import csrf_exempt
 
+pd = lazy_import("pandas")
+
+AGENDA_COLUMNS = [
+    "title",
+    "date",
+    "start_time",
+    "end_time",
+    "building",
+    "room_num",
+    "session_num",
+    "address",
+]
+
+# fields updated when merging an upload into existing agenda items
+AGENDA_MERGE_FIELDS = ["end_time", "building", "room_num", "session_num", "address"]
+
+
+def as_time(value):
+    """
+    Excel cells may hold a time, a full timestamp or text, keep only the time.
+    Returns None for anything else (e.g. a number or unreadable text).
+    """
+    if isinstance(value, str):
+        try:
+            value = pd.Timestamp(value)
+        except ValueError:
+            return None
+
+    if isinstance(value, (pd.Timestamp, datetime.datetime)):
+        return value.time()
+    if isinstance(value, datetime.time):
+        return value
+    return None
+
+
+def as_date(value):
+    """
+    Excel cells may hold a date, a full timestamp or text (CSV uploads),
+    keep only the date. Returns None for anything else.
+    """
+    if isinstance(value, str):
+        try:
+            value = pd.Timestamp(value)
+        except ValueError:
+            return None
+
+    if isinstance(value, (pd.Timestamp, datetime.datetime)):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return None
+
+
+def combine_date_time(dates, times):
+    """
+    Combine the date and time columns of the agenda sheet into
+    timezone aware datetimes (America/Chicago).
+    """
+    local_timezone = pytz.timezone("America/Chicago")
+
+    return [
+        local_timezone.localize(
+            datetime.datetime.combine(as_date(date), as_time(time))
+        )
+        for date, time in zip(dates, times)
+    ]
+
+
+def unreadable_errors(agenda_df, column, values, message):
+    """
+    Report filled cells of a column that could not be read (values is
+    None for them), empty cells are left to missing_value_errors.
+    """
+    unreadable = agenda_df[column].notnull() & values.isnull()
+
+    return bulk.mask_errors(agenda_df, unreadable.values, column, message)
+
+
+def agenda_item_key(agenda_item):
+    # compare instants, sheet times are in Chicago time and stored times in UTC
+    return (agenda_item.title, agenda_item.start_time.timestamp())
+
+
+def merge_agenda_items(agenda_items):
+    """
+    Upsert agenda items on (title, start time). Items missing from the
+    sheet are deleted.
+    Returns:
+        dict: Diff summary
+    """
+    diff = bulk_merge.compute_diff(
+        AgendaItem.objects.all(), agenda_items, agenda_item_key, AGENDA_MERGE_FIELDS
+    )
+
+    with transaction.atomic():
+        return bulk_merge.apply_diff(AgendaItem, diff, AGENDA_MERGE_FIELDS)
+
+
+def validate_agenda_sheet(agenda_df, merge=False):
+    """
+    Validate every row of an uploaded agenda sheet.
+    Args:
+        agenda_df: Dataframe with AGENDA_COLUMNS
+        merge: Rows must also have a unique title and start time
+    Returns:
+        list: Per-row errors (empty if the sheet is valid)
+    """
+    errors = bulk.missing_value_errors(
+        agenda_df,
+        ["title", "date", "start_time", "end_time"],
+        "Title, date, start time, and end time can not be empty",
+    )
+
+    # read the cells one by one so a bad cell is reported on its row instead
+    # of failing the whole sheet
+    dates = agenda_df["date"].map(as_date, na_action="ignore")
+    start_times = agenda_df["start_time"].map(as_time, na_action="ignore")
+    end_times = agenda_df["end_time"].map(as_time, na_action="ignore")
+
+    errors += unreadable_errors(agenda_df, "date", dates, "Date must be a date")
+    errors += unreadable_errors(
+        agenda_df, "start_time", start_times, "Start time must be a time"
+    )
+    errors += unreadable_errors(
+        agenda_df, "end_time", end_times, "End time must be a time"
+    )
+
+    complete = start_times.notnull() & end_times.notnull()
+    start_times = start_times[complete]
+    end_times = end_times[complete]
+
+    errors += bulk.mask_errors(
+        start_times,
+        (start_times > end_times).values,
+        "start_time",
+        "Start times can not be after end times",
+    )
+
+    if merge:
+        errors += bulk.duplicate_row_errors(
+            agenda_df, ["title", "date", "start_time"], "Duplicate title and start time"
+        )
+
+    return sorted(errors, key=lambda error: error["row"])
+
+
+def build_agenda_items(agenda_df):
+    """
+    Unsaved agenda items for every row of a validated agenda sheet.
+    """
+    agenda_df = agenda_df.assign(
+        start_time=combine_date_time(agenda_df["date"], agenda_df["start_time"]),
+        end_time=combine_date_time(agenda_df["date"], agenda_df["end_time"]),
+        building=bulk.text_or_none(agenda_df["building"]),
+        room_num=bulk.text_or_none(agenda_df["room_num"]),
+        address=bulk.text_or_none(agenda_df["address"]),
+        # note this just ignores malformed session data
+        session_num=bulk.blank_to_none(
+            agenda_df["session_num"].where(agenda_df["session_num"].isin([1, 2, 3]))
+        ),
+    )
+
+    return [
+        AgendaItem(
+            title=row.title,
+            building=row.building,
+            room_num=row.room_num,
+            start_time=row.start_time,
+            end_time=row.end_time,
+            session_num=row.session_num,
+            address=row.address,
+        )
+        for row in agenda_df.itertuples()
+    ]
+
 
 def agenda_items(request):
     """
@@ -19,8 +198,12 @@ def agenda_items(request):
     Returns 400 for invalid times, 403 for non-admin
     """
     if request.method == "GET":
-        data = django_serializers.serialize(
-            "json", AgendaItem.objects.all().order_by("start_time")
+        data = response_cache.cached(
+            "agenda_items",
+            "agenda_items",
+            lambda: django_serializers.serialize(
+                "json", AgendaItem.objects.all().order_by("start_time")
+            ),
         )
         return HttpResponse(data, content_type="application/json")
     elif request.method == "POST":
@@ -82,6 +265,25 @@ def agenda_items(request):
         return JsonResponse({"message": "method not allowed"}, status=405)
 
 
+async def agenda_items_async(request):
+    """
+    agenda_items for ASGI: GET uses the async ORM and the response cache,
+    POST runs the sync view in a thread.
+    """
+    if request.method != "GET":
+        return await sync_to_async(agenda_items)(request)
+
+    async def build():
+        return django_serializers.serialize(
+            "json", [item async for item in AgendaItem.objects.order_by("start_time")]
+        )
+
+    return HttpResponse(
+        await response_cache.acached("agenda_items", "agenda_items", build),
+        content_type="application/json",
+    )
+
+
 def agenda_items_id(request, id):
     """
     DELETE: Remove agenda item (admin only)
@@ -112,8 +314,12 @@ def agenda_items_bulk(request):
     """
     POST: Bulk upload agenda items from Excel (admin only)
     Required columns: title, date, start_time, end_time, building, room_num, session_num, address
+    Optional query params:
+        - mode=merge: Upsert on title + start time instead of requiring no items
+        - dry_run=1: Validate the file and report every error without saving
+        - ingest=stream|frame: Insert in batches as the file is read, or read the whole file first
     Returns 400 for invalid data, 409 if items exist, 403 for non-admin
-    Note: Existing items must be deleted first
+    Note: Existing items must be deleted first unless merging
     """
     if request.method == "POST":
         # make sure user is allowed
@@ -122,8 +328,10 @@ def agenda_items_bulk(request):
                 {"message": "Must be admin to make this request"}, status=403
             )
 
+        merge = bulk_merge.is_merge(request)
+
         # must have no agenda items
-        if AgendaItem.objects.all().count() > 0:
+        if not merge and AgendaItem.objects.exists():
             return JsonResponse(
                 {"message": "Delete existing agenda items before attempting to upload"},
                 status=409,
@@ -132,94 +340,51 @@ def agenda_items_bulk(request):
         if "agenda" not in request.FILES:
             return JsonResponse({"message": "Must include file"}, status=400)
 
-        file = request.FILES["agenda"]
-        agenda_df = None
-
-        try:
-            agenda_df = pd.read_excel(file)
-        except:
-            return JsonResponse({"message": "Error reading file"}, status=400)
-
-        agenda_df = agenda_df.drop_duplicates()
-        # when loading in df, pandas will add ".#" to duplicate columns
-        agenda_df.columns = [x.lower().split(".")[0] for x in agenda_df.columns]
-
-        # validate data
-        columns_set = set(agenda_df.columns)
-
-        if len(columns_set) != len(agenda_df.columns):
-            return JsonResponse({"message": "Duplicate column names"}, status=400)
-
-        expected_columns = [
-            "title",
-            "date",
-            "start_time",
-            "end_time",
-            "building",
-            "room_num",
-            "session_num",
-            "address",
-        ]
-
-        for i in range(len(expected_columns)):
-            if expected_columns[i] not in columns_set:
-                return JsonResponse(
-                    {"message": f"Missing column '{expected_columns[i]}'"}, status=400
-                )
-
-        # check data
-        for idx, row in agenda_df.iterrows():
-            if row["start_time"] > row["end_time"]:
-                return JsonResponse(
-                    {"message": "Start times can not be after end times"}, status=400
-                )
-
-            if (
-                pd.isna(agenda_df.at[idx, "title"])
-                or pd.isna(agenda_df.at[idx, "date"])
-                or pd.isna(agenda_df.at[idx, "start_time"])
-                or pd.isnull(agenda_df.at[idx, "title"])
-                or pd.isnull(agenda_df.at[idx, "date"])
-                or pd.isnull(agenda_df.at[idx, "start_time"])
-            ):
-                return JsonResponse(
-                    {"message": "Title, date, and start time can not be empty"},
-                    status=400,
-                )
-
-        timezone = pytz.timezone("America/Chicago")
-
-        for idx, row in agenda_df.iterrows():
-            start_time = row["start_time"]
-            if isinstance(row["start_time"], pd.Timestamp):
-                start_time = row["start_time"].time()
-
-            end_time = row["end_time"]
-            if isinstance(row["end_time"], pd.Timestamp):
-                end_time = row["end_time"].time()
-
-            start_datetime = timezone.localize(
-                datetime.datetime.combine(row["date"], start_time)
+        if (
+            not merge
+            and not bulk.is_dry_run(request)
+            and bulk.is_streaming(request, "agenda")
+        ):
+            _, error = bulk.stream_import(
+                request.FILES["agenda"],
+                AGENDA_COLUMNS,
+                validate_agenda_sheet,
+                build_agenda_items,
+                AgendaItem,
+                quote_columns=True,
             )
+            if error:
+                return JsonResponse(error, status=400)
 
-            end_datetime = timezone.localize(
-                datetime.datetime.combine(row["date"], end_time)
+            data = django_serializers.serialize(
+                "json", AgendaItem.objects.all().order_by("start_time")
             )
+            return HttpResponse(data, content_type="application/json")
+
+        agenda_df, error = bulk.load_sheet(
+            request.FILES["agenda"], AGENDA_COLUMNS, quote_columns=True
+        )
+        if error:
+            return JsonResponse(error, status=400)
+
+        errors = validate_agenda_sheet(agenda_df, merge=merge)
 
-            new_agenda_item = AgendaItem(
-                title=row["title"],
-                building=row["building"],
-                room_num=row["room_num"],
-                start_time=start_datetime,
-                end_time=end_datetime,
-                address=row["address"],
+        if bulk.is_dry_run(request):
+            body, status = bulk.dry_run_report(agenda_df, errors)
+            return JsonResponse(body, status=status)
+
+        if errors:
+            return JsonResponse(
+                bulk.error_report(errors[0]["message"], errors), status=400
             )
 
-            # note this just ignores malformed session data
-            if row["session_num"] and row["session_num"] in [1, 2, 3]:
-                new_agenda_item.session_num = int(row["session_num"])
+        agenda_items = build_agenda_items(agenda_df)
+
+        if merge:
+            summary = merge_agenda_items(agenda_items)
+            return JsonResponse({"message": "Merge complete", **summary})
 
-            new_agenda_item.save()
+        bulk.bulk_insert(AgendaItem, agenda_items)
 
         data = django_serializers.serialize(
             "json", AgendaItem.objects.all().order_by("start_time")
@@ -1,5 +1,6 @@
 import json
-from django.test import TestCase, Client
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth.models import User, Group
 from django.urls import reverse
 
@@ -67,6 +68,20 @@ class LoginPOST(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTrue(response.wsgi_request.user.is_authenticated)
 
+    @override_settings(
+        RATE_LIMITING=True, RATE_LIMITS={"login": {"ip": (10, 300), "account": (3, 300)}}
+    )
+    def test_rate_limited_per_account(self):
+        cache.clear()
+        data = json.dumps({"username": self.username, "password": "wrong"})
+
+        for _ in range(3):
+            response = self.client.post(self.url, data, content_type="application/json")
+            self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(self.url, data, content_type="application/json")
+        self.assertEqual(response.status_code, 429)
+
 
 class MeGET(TestCase):
     def setUp(self):
@@ -5,7 +5,10 @@ from django.core import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate, login
 
+from fact_registration_backend.ratelimit import rate_limit
 
+
+@rate_limit("login", field="username")
 def login_admin(request):
     """
     POST: Admin login
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.15 on 2026-10-19 15:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fact_admin', '0007_alter_agendaitem_building_alter_agendaitem_room_num'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MailJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(help_text='What is being sent, e.g. facilitator_links', max_length=50)),
+                ('status', models.CharField(default='running', help_text='running until every message has been tried, then done', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MailJobMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Who the email is for, e.g. the facilitator department', max_length=200)),
+                ('to', models.JSONField(default=list, help_text='Recipient addresses')),
+                ('subject', models.CharField(blank=True, max_length=200)),
+                ('body', models.TextField(blank=True)),
+                ('status', models.CharField(default='pending', max_length=20)),
+                ('error', models.TextField(blank=True, help_text='Why the email failed or was skipped')),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='fact_admin.mailjob')),
+            ],
+        ),
+    ]
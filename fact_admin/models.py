@@ -72,3 +72,53 @@ class RegistrationFlag(models.Model):
 
     def __str__(self):
         return f"{self.label} - {self.value}"
+
+
+class MailJob(models.Model):
+    """
+    A batch of emails sent in the background, see actions/mailer.py.
+    """
+    RUNNING = "running"
+    DONE = "done"
+
+    kind = models.CharField(
+        max_length=50,
+        help_text="What is being sent, e.g. facilitator_links"
+    )
+    status = models.CharField(
+        max_length=20,
+        default=RUNNING,
+        help_text="running until every message has been tried, then done"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.pk} - {self.status}"
+
+
+class MailJobMessage(models.Model):
+    """
+    One email of a MailJob and how sending it went.
+    """
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+    SKIPPED = "skipped"
+
+    job = models.ForeignKey(MailJob, on_delete=models.CASCADE, related_name="messages")
+    name = models.CharField(
+        max_length=200,
+        help_text="Who the email is for, e.g. the facilitator department"
+    )
+    to = models.JSONField(default=list, help_text="Recipient addresses")
+    subject = models.CharField(max_length=200, blank=True)
+    # cleared once the email has been tried, it can hold secrets like
+    # account set up links
+    body = models.TextField(blank=True)
+    status = models.CharField(max_length=20, default=PENDING)
+    error = models.TextField(
+        blank=True,
+        help_text="Why the email failed or was skipped"
+    )
+    sent_at = models.DateTimeField(null=True, blank=True)
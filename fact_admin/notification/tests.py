@@ -6,10 +6,14 @@ from django.utils.timezone import make_aware
 from django.contrib.auth.models import User, Group
 
 from fact_admin.models import Notification
+from fact_admin.notification import views
+from registration.cache import response_cache
+from registration.testing import AsyncViewMixin, seed_small_event
 
 
 class NotificationsGET(TestCase):
     def setUp(self):
+        response_cache().clear()
         self.client = Client()
 
         self.expected = []
@@ -45,6 +49,7 @@ class NotificationsGET(TestCase):
 
 class NotificationsPOST(TestCase):
     def setUp(self):
+        response_cache().clear()
         self.client = Client()
 
         # users
@@ -208,3 +213,16 @@ class NotificationsDELETE(TestCase):
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(Notification.objects.all().count(), 0)
+
+
+class NotificationsAsync(AsyncViewMixin, TestCase):
+    def setUp(self):
+        response_cache().clear()
+        seed_small_event()
+
+    async def test_notifications(self):
+        await self.assertSameResponse(views.notifications, views.notifications_async)
+
+    async def test_writes_use_the_sync_view(self):
+        response = await views.notifications_async(self.view_request("post"))
+        self.assertEqual(response.status_code, 403)
@@ -1,9 +1,11 @@
 import json
+from asgiref.sync import sync_to_async
 from django.http import HttpResponse, JsonResponse
 from django.utils import timezone
 from django.core import serializers
 
 from fact_admin.models import Notification
+from registration import cache as response_cache
 
 
 def notification_id(request, id):
@@ -41,12 +43,15 @@ def notifications(request):
     """
     if request.method == "GET":
         # get objects that are not expired
-        notifications = Notification.objects.filter(expiration__gt=timezone.now())
-
-        return HttpResponse(
-            serializers.serialize("json", notifications),
-            content_type="application/json",
+        data = response_cache.cached(
+            "notifications",
+            "notifications",
+            lambda: serializers.serialize(
+                "json", Notification.objects.filter(expiration__gt=timezone.now())
+            ),
         )
+
+        return HttpResponse(data, content_type="application/json")
     elif request.method == "POST":
         user = request.user
 
@@ -97,3 +102,28 @@ def notifications(request):
         )
     else:
         return JsonResponse({"message": "Method not allowed"}, status=405)
+
+
+async def notifications_async(request):
+    """
+    notifications for ASGI: GET uses the async ORM and the response cache,
+    POST runs the sync view in a thread.
+    """
+    if request.method != "GET":
+        return await sync_to_async(notifications)(request)
+
+    async def build():
+        return serializers.serialize(
+            "json",
+            [
+                notification
+                async for notification in Notification.objects.filter(
+                    expiration__gt=timezone.now()
+                )
+            ],
+        )
+
+    return HttpResponse(
+        await response_cache.acached("notifications", "notifications", build),
+        content_type="application/json",
+    )
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 
 from .login import views as login_views
@@ -5,6 +6,9 @@ from .notification import views as notification_views
 from .agenda import views as agenda_views
 from .actions import views as action_views
 
+# async read views when served over ASGI, see ASYNC_READ_VIEWS in settings
+ASYNC = settings.ASYNC_READ_VIEWS
+
 app_name = "fact_admin"
 urlpatterns = [
     path("login/", login_views.login_admin, name="login_admin"),
@@ -14,15 +18,27 @@ urlpatterns = [
         notification_views.notification_id,
         name="notifications_id",
     ),
-    path("notifications/", notification_views.notifications, name="notifications"),
+    path(
+        "notifications/",
+        notification_views.notifications_async if ASYNC else notification_views.notifications,
+        name="notifications",
+    ),
     path(
         "agenda-items/<int:id>/", agenda_views.agenda_items_id, name="agenda_items_id"
     ),
-    path("agenda-items/", agenda_views.agenda_items, name="agenda_items"),
+    path(
+        "agenda-items/",
+        agenda_views.agenda_items_async if ASYNC else agenda_views.agenda_items,
+        name="agenda_items",
+    ),
     path(
         "agenda-items/bulk/", agenda_views.agenda_items_bulk, name="agenda_items_bulk"
     ),
-    path("flags/", action_views.registration_flags, name="flags"),
+    path(
+        "flags/",
+        action_views.registration_flags_async if ASYNC else action_views.registration_flags,
+        name="flags",
+    ),
     path(
         "flags/<str:label>/",
         action_views.registration_flag_id,
@@ -31,5 +47,12 @@ urlpatterns = [
     path("sheets/delegates/", action_views.delegate_sheet, name="delegate_sheet"),
     path("sheets/locations/", action_views.location_sheet, name="location_sheet"),
     path("accounts/send-facilitator-links/", action_views.send_facilitator_links, name="send_facilitator_links"),
+    path(
+        "accounts/send-facilitator-links/<int:id>/",
+        action_views.send_facilitator_links_job,
+        name="send_facilitator_links_job",
+    ),
     path("summary/", action_views.summary, name="summary"),
+    path("summary/live/", action_views.summary_live, name="summary_live"),
+    path("forecast/", action_views.capacity_forecast, name="forecast"),
 ]
@@ -0,0 +1,5 @@
+import environ
+
+# .env is read once here, import env from this module instead of reading it again
+env = environ.Env()
+environ.Env.read_env()
@@ -0,0 +1,21 @@
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """
+    Import a module on first attribute access instead of now.
+    Used for pandas and openpyxl, which only a few admin upload and export
+    endpoints need, so web workers do not load them at boot.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+
+    return module
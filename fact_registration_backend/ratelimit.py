@@ -0,0 +1,122 @@
+import functools
+import hashlib
+import json
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+
+from monitoring import metrics
+
+
+def client_ip(request):
+    """
+    Address of the client, skipping the RATE_LIMIT_PROXY_COUNT proxies in
+    front of the app (each appends to X-Forwarded-For).
+    """
+    proxies = getattr(settings, "RATE_LIMIT_PROXY_COUNT", 0)
+    forwarded = [
+        address.strip()
+        for address in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",")
+        if address.strip()
+    ]
+
+    if proxies and len(forwarded) >= proxies:
+        return forwarded[-proxies]
+
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def hit(key, limit, period, now=None):
+    """
+    Count a request against a sliding window of period seconds.
+    The window is estimated from two fixed windows, the current one plus the
+    part of the previous one still inside the window, so it needs two cache
+    keys instead of a timestamp per request.
+    Args:
+        key: What is limited, e.g. "login:ip:127.0.0.1"
+        limit: Requests allowed in the window
+        period: Window length in seconds
+    Returns:
+        int: Seconds until a request would be allowed, 0 if it is allowed
+    """
+    now = time.time() if now is None else now
+    window = int(now // period)
+    elapsed = now - window * period
+
+    current_key = f"ratelimit:{key}:{window}"
+    previous = cache.get(f"ratelimit:{key}:{window - 1}", 0)
+    current = cache.get(current_key, 0)
+
+    weight = 1 - elapsed / period
+    if previous * weight + current >= limit:
+        # the previous window's share drops as the window slides on
+        if previous and current < limit:
+            wait = period * (1 - (limit - current) / previous) - elapsed
+        else:
+            wait = period - elapsed
+        return max(1, math.floor(wait) + 1)
+
+    # add() then incr() stays atomic across threads (and memcached/redis)
+    if not cache.add(current_key, 1, period * 2):
+        try:
+            cache.incr(current_key)
+        except ValueError:
+            cache.set(current_key, 1, period * 2)
+
+    return 0
+
+
+def account_key(value):
+    # hashed, so keys are valid for every cache backend
+    return hashlib.sha256(value.strip().lower().encode()).hexdigest()[:32]
+
+
+def rate_limit(scope, field="email"):
+    """
+    Throttle POSTs to a view per client IP and per account (the field of the
+    JSON body), with the limits in RATE_LIMITS[scope]. Throttled requests
+    get a 429 before the view runs, so they cost no queries, hashing or
+    email. Off unless RATE_LIMITING is set.
+    Args:
+        scope: Key of RATE_LIMITS, {"ip": (limit, seconds), "account": ...}
+        field: Body field that names the account
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not getattr(settings, "RATE_LIMITING", False) or request.method != "POST":
+                return view(request, *args, **kwargs)
+
+            limits = settings.RATE_LIMITS[scope]
+            keys = [("ip", client_ip(request))]
+
+            try:
+                account = json.loads(request.body).get(field)
+            except (ValueError, AttributeError):
+                account = None
+            if isinstance(account, str) and account.strip():
+                keys.append(("account", account_key(account)))
+
+            for kind, value in keys:
+                if kind not in limits:
+                    continue
+
+                limit, period = limits[kind]
+                wait = hit(f"{scope}:{kind}:{value}", limit, period)
+                if wait:
+                    metrics.record_rate_limited(scope, kind)
+                    response = JsonResponse(
+                        {"message": "Too many requests, try again later"}, status=429
+                    )
+                    response["Retry-After"] = str(wait)
+                    return response
+
+            return view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
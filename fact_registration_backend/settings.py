@@ -13,11 +13,11 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 import os
 from pathlib import Path
 import sys
+import tempfile
 import dj_database_url
 from django.core.management.utils import get_random_secret_key
-import environ
-env = environ.Env()
-environ.Env.read_env()
+
+from fact_registration_backend.environment import env
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -47,11 +47,13 @@ INSTALLED_APPS = [
     "fact_admin",
     "one_time_verification",
     "registration",
+    "monitoring",
     "corsheaders",
 ]
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
+    "monitoring.middleware.QueryInstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -59,6 +61,8 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "registration.passwords.HashingBusyMiddleware",
+    "monitoring.profiling.ProfilerMiddleware",
 ]
 
 ROOT_URLCONF = "fact_registration_backend.urls"
@@ -101,6 +105,94 @@ elif len(sys.argv) > 0 and sys.argv[1] != "collectstatic":
         "default": dj_database_url.parse(os.environ.get("DATABASE_URL")),
     }
 
+# the response cache is cleared whenever event data changes (see
+# registration/cache.py), give it a location of its own
+CACHES = {
+    "default": env.cache_url("CACHE_URL", default="locmemcache://"),
+    "responses": env.cache_url("RESPONSE_CACHE_URL", default="locmemcache://responses"),
+}
+
+# the default locmem cache is per process, and a write only clears the cache
+# of the process that handled it: without a shared RESPONSE_CACHE_URL admin
+# edits reach the other gunicorn workers once their entries expire
+SHARED_RESPONSE_CACHE = (
+    CACHES["responses"]["BACKEND"] != "django.core.cache.backends.locmem.LocMemCache"
+)
+
+# seconds a read endpoint's response is cached, the catalog includes seat
+# counts so it is only cached long enough to absorb polling
+RESPONSE_CACHE_TIMEOUTS = {
+    "workshops_all": int(os.getenv("RESPONSE_CACHE_CATALOG_TIMEOUT", "2")),
+    "workshop_id": int(os.getenv("RESPONSE_CACHE_CATALOG_TIMEOUT", "2")),
+    # edited by admins, only cached for long when every worker sees the clear
+    "schools": 300 if SHARED_RESPONSE_CACHE else 5,
+    "agenda_items": 300 if SHARED_RESPONSE_CACHE else 5,
+    "notifications": 30 if SHARED_RESPONSE_CACHE else 5,
+    "registration_flags": 5,
+    # admin dashboard, refreshed every second
+    "summary": int(os.getenv("RESPONSE_CACHE_SUMMARY_TIMEOUT", "5")),
+    # rates are smoothed over hours, a minute old forecast is as good
+    "forecast": 60,
+    # cleared when registrations for the facilitator's workshops change, in
+    # every process only with a shared RESPONSE_CACHE_URL (locmem is per
+    # process), so kept short enough for the other workers to catch up
+    "facilitator_dashboard": int(os.getenv("RESPONSE_CACHE_DASHBOARD_TIMEOUT", "30")),
+}
+
+# async versions of the read endpoints for ASGI servers, off by default:
+# under load uvicorn served the catalog slower than gunicorn's sync workers
+ASYNC_READ_VIEWS = os.getenv("ASYNC_READ_VIEWS", "False") == "True"
+
+# admin live feed (summary/live/), seconds between database polls, between
+# reads of the email backlog (every worker's metrics file) and between
+# keepalives of an idle stream
+ADMIN_FEED_INTERVAL = float(os.getenv("ADMIN_FEED_INTERVAL", "1"))
+ADMIN_FEED_BACKLOG_INTERVAL = float(os.getenv("ADMIN_FEED_BACKLOG_INTERVAL", "15"))
+ADMIN_FEED_HEARTBEAT = 15
+# every stream holds a server thread for ADMIN_FEED_MAX_AGE seconds (then the
+# browser reconnects), so at most this many per process. Under gunicorn that
+# is one of the --threads of the worker: keep it well under them, with
+# --workers 4 --threads 8 the default lets 16 admins watch and leaves each
+# worker 4 threads for requests
+ADMIN_FEED_MAX_STREAMS = int(os.getenv("ADMIN_FEED_MAX_STREAMS", "4"))
+ADMIN_FEED_MAX_AGE = int(os.getenv("ADMIN_FEED_MAX_AGE", "120"))
+
+# PBKDF2 runs in a process pool, see registration/passwords.py
+PASSWORD_HASHERS = [
+    "registration.passwords.PooledPBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+
+# hashing processes per web worker and the most hashes running or waiting
+# per web worker before sign ins get a 503.
+# 0 (the default) hashes in the request thread, which releases the GIL while
+# it hashes, with only the cap. Each pool process imports Django, so with
+# gunicorn the host runs --workers x PASSWORD_HASHING_WORKERS of them on top
+# of the web workers: only set it when the host has cores to spare for them.
+if "test" in sys.argv:
+    PASSWORD_HASHING_WORKERS = 0
+    PASSWORD_HASHING_MAX_PENDING = None
+else:
+    PASSWORD_HASHING_WORKERS = int(os.getenv("PASSWORD_HASHING_WORKERS", "0"))
+    PASSWORD_HASHING_MAX_PENDING = int(
+        os.getenv("PASSWORD_HASHING_MAX_PENDING", str(PASSWORD_HASHING_WORKERS * 4 or 4))
+    )
+PASSWORD_HASHING_RETRY_AFTER = int(os.getenv("PASSWORD_HASHING_RETRY_AFTER", "2"))
+
+# per client IP and per account limits of the email and login endpoints,
+# (requests, seconds) over a sliding window, see ratelimit.py
+RATE_LIMITING = os.getenv("RATE_LIMITING", "False" if "test" in sys.argv else "True") == "True"
+RATE_LIMITS = {
+    "verification": {"ip": (20, 3600), "account": (5, 900)},
+    "password_reset": {"ip": (20, 3600), "account": (3, 900)},
+    "login": {"ip": (60, 300), "account": (10, 300)},
+}
+# proxies in front of the app that append to X-Forwarded-For
+RATE_LIMIT_PROXY_COUNT = int(os.getenv("RATE_LIMIT_PROXY_COUNT", "0"))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -166,7 +258,7 @@ CORS_ALLOWED_ORIGINS = [
     "https://psauiuc.org",
     "https://fact.psauiuc.org"
 ]
-CORS_EXPOSE_HEADERS = ["Content-Type", "X-CSRFToken"]
+CORS_EXPOSE_HEADERS = ["Content-Type", "X-CSRFToken", "Server-Timing"]
 CORS_ALLOW_CREDENTIALS = True
 
 # email settings
@@ -175,8 +267,102 @@ if "test" in sys.argv:
     EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
     EMAIL_FILE_PATH = os.path.join(BASE_DIR, "test_emails")
 else:
+    # times every send for /metrics, see monitoring/mail.py
+    EMAIL_BACKEND = "monitoring.mail.InstrumentedEmailBackend"
+    # a dummy or console backend when rehearsing with the loadtest command
+    INSTRUMENTED_EMAIL_BACKEND = os.getenv(
+        "INSTRUMENTED_EMAIL_BACKEND", "django.core.mail.backends.smtp.EmailBackend"
+    )
     EMAIL_HOST = "smtp.gmail.com"
     EMAIL_PORT = "587"
     EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER")
     EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD")
     EMAIL_USE_TLS = True
+
+# bulk mail jobs (facilitator links), SMTP connections kept open while a
+# job is sent and whether jobs run in a thread or within the request
+BULK_MAIL_CONNECTIONS = int(os.getenv("BULK_MAIL_CONNECTIONS", "3"))
+BULK_MAIL_BACKGROUND = "test" not in sys.argv
+
+# bulk spreadsheet uploads
+BULK_IMPORT_BATCH_SIZE = int(os.getenv("BULK_IMPORT_BATCH_SIZE", "500"))
+
+# "stream" validates and inserts uploads batch by batch as the file is read,
+# "frame" reads the whole file first (can be overridden with ?ingest=)
+BULK_IMPORT_INGEST = {
+    "locations": os.getenv("BULK_IMPORT_INGEST_LOCATIONS", "stream"),
+    "schools": os.getenv("BULK_IMPORT_INGEST_SCHOOLS", "stream"),
+    "agenda": os.getenv("BULK_IMPORT_INGEST_AGENDA", "stream"),
+}
+
+# request instrumentation, see monitoring/middleware.py
+QUERY_BUDGETS_FILE = os.getenv(
+    "QUERY_BUDGETS_FILE", os.path.join(BASE_DIR, "monitoring", "query_budgets.json")
+)
+QUERY_SLOWEST_KEPT = int(os.getenv("QUERY_SLOWEST_KEPT", "5"))
+# requests over their query budget or slower than this are logged as
+# warnings, the rest only at DEBUG
+REQUEST_LOG_SLOW_MS = float(os.getenv("REQUEST_LOG_SLOW_MS", "1000"))
+
+# shared directory for /metrics across gunicorn workers (in-process only if unset),
+# empty it before starting the server
+METRICS_DIR = os.getenv("METRICS_DIR")
+# seconds between a worker's writes to METRICS_DIR, /metrics is at most this stale
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+# on demand cProfile for admins, see monitoring/profiling.py
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "False") == "True"
+PROFILER_TOKEN_MAX_AGE = int(os.getenv("PROFILER_TOKEN_MAX_AGE", "3600"))
+PROFILER_TOP = int(os.getenv("PROFILER_TOP", "40"))
+# URL names profiled for their first N requests per worker, e.g. registration:workshops_all=50
+PROFILER_SAMPLES = {
+    name: int(count)
+    for name, count in (
+        sample.split("=")
+        for sample in os.getenv("PROFILER_SAMPLES", "").split(",")
+        if sample
+    )
+}
+PROFILER_DIR = os.getenv(
+    "PROFILER_DIR", os.path.join(tempfile.gettempdir(), "fact_profiles")
+)
+
+# slow query log, see monitoring/slowqueries.py and the slowqueries command.
+# Every gunicorn worker appends to the same file and reopens it when it is
+# moved, rotate it outside the app (e.g. logrotate without copytruncate):
+# a worker rotating the file itself would overwrite the others' records
+SLOW_QUERY_LOG_ENABLED = os.getenv("SLOW_QUERY_LOG_ENABLED", "False") == "True"
+SLOW_QUERY_LOG_FILE = os.getenv(
+    "SLOW_QUERY_LOG_FILE", os.path.join(tempfile.gettempdir(), "fact_slow_queries.log")
+)
+# a statement is logged if it took this long in total over one request...
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+# ...or ran this many times from the same line (N+1)
+SLOW_QUERY_REPEATS = int(os.getenv("SLOW_QUERY_REPEATS", "10"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+        "slow_queries": {
+            "class": "logging.handlers.WatchedFileHandler",
+            "filename": SLOW_QUERY_LOG_FILE,
+            "delay": True,
+        },
+    },
+    "loggers": {
+        "monitoring.slowqueries": {
+            "handlers": ["slow_queries"],
+            "level": "INFO",
+            "propagate": False,
+        },
+        "monitoring": {
+            "handlers": ["console"],
+            # only over budget requests while running tests
+            "level": os.getenv(
+                "MONITORING_LOG_LEVEL", "WARNING" if "test" in sys.argv else "INFO"
+            ),
+        },
+    },
+}
@@ -34,6 +34,7 @@ urlpatterns = [
     path("fact-admin/", include("fact_admin.urls")),
     path("verifications/", include("one_time_verification.urls")),
     path("csrf/", get_csrf),
+    path("", include("monitoring.urls")),
 ]
 
 
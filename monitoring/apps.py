@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class MonitoringConfig(AppConfig):
+    """
+    Request instrumentation: query counts, DB time and per-endpoint
+    query budgets.
+    """
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'monitoring'
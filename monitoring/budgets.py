@@ -0,0 +1,28 @@
+import json
+from functools import lru_cache
+
+from django.conf import settings
+
+
+@lru_cache(maxsize=None)
+def load_budgets(path):
+    """
+    Read a query budget file mapping URL names to the maximum number of
+    queries a request may run, e.g. {"registration:workshops_all": 10}.
+    """
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def get_budget(view_name):
+    """
+    Query budget for a URL name from QUERY_BUDGETS_FILE (None if it has none).
+    """
+    path = getattr(settings, "QUERY_BUDGETS_FILE", None)
+    if not path or not view_name:
+        return None
+
+    return load_budgets(str(path)).get(view_name)
@@ -0,0 +1,343 @@
+import http.client
+import json
+import math
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from registration.popularity import zipf_weights
+
+# endpoints in report order
+ENDPOINTS = [
+    "csrf",
+    "create_delegate",
+    "otp_verify",
+    "workshops_all",
+    "delegates",
+    "delegate_me",
+    "workshop_id",
+    "schools",
+    "agenda_items",
+    "notifications",
+    "registration_flags",
+]
+
+
+class Session:
+    """
+    One browser: a keep-alive connection with its own cookies, sending the
+    CSRF token back the way the frontend does.
+    Cookies are kept by hand because the CSRF and session cookies are
+    Secure, which http.cookiejar would not send to a local http server.
+    """
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        self.base_url = base_url.rstrip("/")
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname
+        self.port = parts.port
+        self.timeout = timeout
+        self.connection = None
+        self.cookies = {}
+
+    def connect(self):
+        connection_class = (
+            http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        )
+        self.connection = connection_class(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method, path, body=None):
+        """
+        Returns:
+            tuple: (status code, response body)
+        """
+        headers = {}
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+        if "csrftoken" in self.cookies:
+            headers["X-CSRFToken"] = self.cookies["csrftoken"]
+            # CSRF checks the referer over https
+            headers["Referer"] = f"{self.base_url}/"
+        if body is not None:
+            body = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+
+        for attempt in range(2):
+            if self.connection is None:
+                self.connect()
+            try:
+                self.connection.request(method, path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                # server closed the keep-alive connection, retry once on a new one
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+
+        for header in response.headers.get_all("Set-Cookie") or []:
+            name, _, value = header.split(";")[0].partition("=")
+            self.cookies[name.strip()] = value.strip()
+
+        return response.status, data
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+
+def percentile(values, q):
+    """
+    Nearest rank percentile of a sorted list.
+    """
+    if not values:
+        return None
+
+    index = max(0, min(len(values), math.ceil(q / 100 * len(values))) - 1)
+    return values[index]
+
+
+class Results:
+    """
+    Latencies and status codes per endpoint, plus the seat count of every
+    workshop as the client sees it. A successful registration that takes a
+    workshop over its capacity is an oversell for the endpoint that made it.
+    """
+
+    def __init__(self, capacities):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.statuses = {}
+        self.oversells = Counter()
+        self.capacities = capacities
+        self.seats = Counter()
+
+    def record(self, endpoint, status, ms):
+        with self.lock:
+            self.latencies.setdefault(endpoint, []).append(ms)
+            self.statuses.setdefault(endpoint, Counter())[str(status)] += 1
+
+    def book(self, endpoint, added, removed=()):
+        with self.lock:
+            for workshop_id in removed:
+                self.seats[workshop_id] -= 1
+            for workshop_id in added:
+                self.seats[workshop_id] += 1
+                if self.seats[workshop_id] > self.capacities[workshop_id]:
+                    self.oversells[endpoint] += 1
+
+    def report(self, duration):
+        """
+        Returns:
+            dict: Per endpoint requests, throughput, latency percentiles (ms),
+                  status codes and oversells
+        """
+        report = {}
+        for endpoint in ENDPOINTS + sorted(set(self.latencies) - set(ENDPOINTS)):
+            latencies = sorted(self.latencies.get(endpoint, []))
+            if not latencies:
+                continue
+
+            report[endpoint] = {
+                "requests": len(latencies),
+                "per_second": round(len(latencies) / duration, 2) if duration else None,
+                "p50_ms": round(percentile(latencies, 50), 1),
+                "p90_ms": round(percentile(latencies, 90), 1),
+                "p99_ms": round(percentile(latencies, 99), 1),
+                "max_ms": round(latencies[-1], 1),
+                "statuses": dict(sorted(self.statuses[endpoint].items())),
+                "oversells": self.oversells.get(endpoint, 0),
+            }
+
+        return report
+
+
+class LoadTest:
+    """
+    Drive the registration day journey of scenario["delegates"] synthetic
+    delegates against a running server, scenario["concurrency"] at a time:
+    sign up, verify the emailed code, poll the workshop catalog, register
+    for a workshop in every session (popular workshops first, following a
+    Zipf curve, trying again when one is full) and sometimes switch one
+    workshop from the dashboard.
+    Args:
+        base_url: Server to test, e.g. http://127.0.0.1:8000
+        scenario: Parsed scenario file
+        workshops: [{"id", "session", "capacity"}] of the seeded event
+    """
+
+    def __init__(self, base_url, scenario, workshops):
+        self.base_url = base_url
+        self.scenario = scenario
+        self.results = Results({w["id"]: w["capacity"] for w in workshops})
+
+        # same popularity ranking for every delegate
+        rng = random.Random(scenario["seed"])
+        self.sessions = {}
+        for session in range(1, 4):
+            ids = [w["id"] for w in workshops if w["session"] == session]
+            rng.shuffle(ids)
+            self.sessions[session] = (
+                ids,
+                zipf_weights(len(ids), scenario.get("popularity_skew", 1.0)),
+            )
+
+    def run(self):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(self.scenario.get("concurrency", 10)) as pool:
+            list(pool.map(self.journey, range(self.scenario["delegates"])))
+
+        return self.results.report(time.perf_counter() - start)
+
+    def timed(self, session, endpoint, method, path, body=None):
+        start = time.perf_counter()
+        try:
+            status, data = session.request(method, path, body)
+        except (http.client.HTTPException, OSError):
+            status, data = "connection error", b""
+        self.results.record(endpoint, status, (time.perf_counter() - start) * 1000)
+
+        return status, data
+
+    def pick(self, rng, session):
+        ids, weights = self.sessions[session]
+        return rng.choices(ids, weights)[0]
+
+    def journey(self, index):
+        scenario = self.scenario
+        rng = random.Random(f"{scenario['seed']}-{index}")
+        session = Session(self.base_url)
+        email = delegate_email(index)
+
+        try:
+            self.timed(session, "csrf", "GET", "/csrf/")
+
+            status, _ = self.timed(
+                session,
+                "create_delegate",
+                "POST",
+                "/registration/delegates/create-account",
+                {
+                    "f_name": "Load",
+                    "l_name": f"Test {index}",
+                    "email": email,
+                    "password": scenario.get("password", "rehearsal-Passw0rd!"),
+                    "pronouns": rng.choice(["she/her", "he/him", "they/them"]),
+                    "year": rng.choice(["Freshman", "Sophomore", "Junior", "Senior"]),
+                },
+            )
+            if status != 200:
+                return
+
+            self.timed(
+                session,
+                "otp_verify",
+                "POST",
+                "/verifications/verify/",
+                {"email": email, "code": scenario.get("otp_code", "123456")},
+            )
+
+            for _ in range(scenario.get("workshops_all_polls", 1)):
+                self.timed(session, "workshops_all", "GET", "/registration/workshops/all/")
+
+            choice = None
+            for _ in range(scenario.get("register_attempts", 3)):
+                choice = [self.pick(rng, s) for s in range(1, 4)]
+                status, _ = self.timed(
+                    session,
+                    "delegates",
+                    "POST",
+                    "/registration/delegates/",
+                    {"email": email, **workshop_fields(choice)},
+                )
+                if status == 200:
+                    self.results.book("delegates", choice)
+                    break
+                if status != 409:
+                    return
+            else:
+                return
+
+            if rng.random() < scenario.get("change_workshops", 0):
+                i = rng.randrange(3)
+                changed = list(choice)
+                changed[i] = self.pick(rng, i + 1)
+                if changed[i] == choice[i]:
+                    return
+
+                status, _ = self.timed(
+                    session,
+                    "delegate_me",
+                    "PUT",
+                    "/registration/delegates/me/",
+                    workshop_fields(changed),
+                )
+                if status == 200:
+                    self.results.book("delegate_me", [changed[i]], [choice[i]])
+        finally:
+            session.close()
+
+
+class ReadStorm:
+    """
+    Poll the read endpoints as fast as possible: scenario["connections"]
+    clients each send scenario["requests"] GETs over one keep-alive
+    connection, picking from scenario["paths"] ({"endpoint", "path",
+    "weight"}, {workshop_id} is filled with a random workshop).
+    Compares the WSGI and ASGI servers, e.g. run it against
+        gunicorn fact_registration_backend.wsgi --workers 4 --threads 8
+    and
+        uvicorn fact_registration_backend.asgi:application --workers 4
+    """
+
+    def __init__(self, base_url, scenario, workshops):
+        self.base_url = base_url
+        self.scenario = scenario
+        self.results = Results({})
+        self.workshop_ids = [w["id"] for w in workshops]
+
+    def run(self):
+        start = time.perf_counter()
+        connections = self.scenario.get("connections", 50)
+        with ThreadPoolExecutor(connections) as pool:
+            list(pool.map(self.client, range(connections)))
+
+        return self.results.report(time.perf_counter() - start)
+
+    def client(self, index):
+        rng = random.Random(f"{self.scenario['seed']}-{index}")
+        paths = self.scenario["paths"]
+        weights = [path.get("weight", 1) for path in paths]
+        session = Session(self.base_url)
+
+        try:
+            for _ in range(self.scenario.get("requests", 100)):
+                path = rng.choices(paths, weights)[0]
+                url = path["path"]
+                if "{workshop_id}" in url:
+                    url = url.format(workshop_id=rng.choice(self.workshop_ids))
+
+                start = time.perf_counter()
+                try:
+                    status, _ = session.request("GET", url)
+                except (http.client.HTTPException, OSError):
+                    status = "connection error"
+                self.results.record(
+                    path["endpoint"], status, (time.perf_counter() - start) * 1000
+                )
+        finally:
+            session.close()
+
+
+def delegate_email(index):
+    return f"loadtest{index}@example.com"
+
+
+def workshop_fields(workshop_ids):
+    return {f"workshop_{i + 1}_id": str(w) for i, w in enumerate(workshop_ids)}
@@ -0,0 +1,51 @@
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+from monitoring import metrics
+
+
+class InstrumentedEmailBackend(BaseEmailBackend):
+    """
+    Email backend timing every send of the backend in
+    INSTRUMENTED_EMAIL_BACKEND (SMTP by default).
+    """
+
+    def __init__(self, fail_silently=False, **kwargs):
+        super().__init__(fail_silently=fail_silently)
+        self.backend = get_connection(
+            getattr(
+                settings,
+                "INSTRUMENTED_EMAIL_BACKEND",
+                "django.core.mail.backends.smtp.EmailBackend",
+            ),
+            fail_silently=fail_silently,
+            **kwargs,
+        )
+
+    def open(self):
+        return self.backend.open()
+
+    def close(self):
+        return self.backend.close()
+
+    def send_messages(self, email_messages):
+        # queued now so other workers see the backlog while SMTP is slow
+        metrics.record_email_queued(len(email_messages))
+        metrics.registry.flush()
+
+        start = time.perf_counter()
+        sent = 0
+        try:
+            sent = self.backend.send_messages(email_messages) or 0
+        finally:
+            metrics.record_email_send(
+                time.perf_counter() - start, sent, len(email_messages) - sent
+            )
+
+            # sends from management commands never reach the middleware flush
+            metrics.registry.flush()
+
+        return sent
@@ -0,0 +1,165 @@
+import json
+import os
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.utils import timezone
+
+from monitoring.loadtest import LoadTest, ReadStorm, delegate_email
+from one_time_verification.models import PendingVerification
+from registration.models import Workshop
+from registration.seed import clear_event, seed_event, seeding_allowed
+
+DEFAULT_SCENARIO = os.path.join(
+    settings.BASE_DIR, "monitoring", "scenarios", "registration_day.json"
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay registration day against a running server: seed a synthetic "
+        "event, then drive sign up, verification, catalog polling and "
+        "registration with a pool of delegates. The server must use the same "
+        "database and should send email with a dummy backend "
+        "(INSTRUMENTED_EMAIL_BACKEND)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000")
+        parser.add_argument("--scenario", default=DEFAULT_SCENARIO)
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Delete the current event (see seedevent) before seeding",
+        )
+        parser.add_argument(
+            "--no-seed",
+            action="store_true",
+            help="Use the workshops already in the database",
+        )
+        parser.add_argument("--delegates", type=int, help="Overrides the scenario")
+        parser.add_argument("--concurrency", type=int, help="Overrides the scenario")
+        parser.add_argument("--connections", type=int, help="Overrides the scenario")
+        parser.add_argument("--json", action="store_true", help="Print the raw report")
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Run even though neither DEBUG nor DEVELOPMENT_MODE is on",
+        )
+
+    def handle(self, *args, **options):
+        # it deletes and creates accounts in whatever database it points at
+        if not (options["force"] or seeding_allowed()):
+            raise CommandError(
+                "Refusing to load test outside DEBUG or DEVELOPMENT_MODE, pass --force "
+                "if this really is a scratch database"
+            )
+
+        with open(options["scenario"]) as file:
+            scenario = json.load(file)
+
+        for key in ["delegates", "concurrency", "connections"]:
+            if options[key]:
+                scenario[key] = options[key]
+
+        self.prepare(scenario, options)
+
+        workshops = [
+            {
+                "id": workshop.id,
+                "session": workshop.session,
+                "capacity": workshop.location.capacity - workshop.taken,
+            }
+            for workshop in occupancy()
+        ]
+
+        # "reads" hammers the read endpoints instead of registering
+        if scenario.get("journey") == "reads":
+            report = ReadStorm(options["url"], scenario, workshops).run()
+        else:
+            report = LoadTest(options["url"], scenario, workshops).run()
+        report["oversold_seats"] = oversold_seats()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=4))
+            return
+
+        self.print_report(report)
+
+    def prepare(self, scenario, options):
+        emails = [delegate_email(i) for i in range(scenario.get("delegates", 0))]
+
+        # leftovers of the last run
+        User.objects.filter(email__in=emails).delete()
+        PendingVerification.objects.filter(email__in=emails).delete()
+
+        if options["reset"]:
+            clear_event()
+
+        if not options["no_seed"]:
+            if Workshop.objects.exists():
+                raise CommandError(
+                    "The database already has workshops, pass --reset to replace "
+                    "them or --no-seed to use them"
+                )
+
+            counts = seed_event(
+                seed=scenario["seed"],
+                schools=scenario.get("schools", 40),
+                workshops_per_session=scenario.get("workshops_per_session", 12),
+                capacity=scenario.get("capacity", 30),
+            )
+            if not options["json"]:
+                self.stdout.write(f"Seeded {counts}")
+
+        # the codes delegates would have been emailed
+        PendingVerification.objects.bulk_create(
+            [
+                PendingVerification(
+                    email=email,
+                    code=scenario.get("otp_code", "123456"),
+                    expiration=timezone.now() + timezone.timedelta(hours=1),
+                )
+                for email in emails
+            ]
+        )
+
+    def print_report(self, report):
+        self.stdout.write(
+            f"{'endpoint':<16}{'requests':>9}{'req/s':>9}{'p50':>9}{'p90':>9}"
+            f"{'p99':>9}{'max':>9}{'oversells':>11}  statuses"
+        )
+        for endpoint, row in report.items():
+            if endpoint == "oversold_seats":
+                continue
+
+            statuses = " ".join(f"{code}:{n}" for code, n in row["statuses"].items())
+            self.stdout.write(
+                f"{endpoint:<16}{row['requests']:>9}{row['per_second']:>9}"
+                f"{row['p50_ms']:>9}{row['p90_ms']:>9}{row['p99_ms']:>9}"
+                f"{row['max_ms']:>9}{row['oversells']:>11}  {statuses}"
+            )
+
+        style = self.style.ERROR if report["oversold_seats"] else self.style.SUCCESS
+        self.stdout.write(style(f"Oversold seats in the database: {report['oversold_seats']}"))
+
+
+def oversold_seats():
+    """
+    Seats taken past capacity, counted in the database.
+    """
+    return sum(
+        max(0, workshop.taken - workshop.location.capacity) for workshop in occupancy()
+    )
+
+
+def occupancy():
+    """
+    Workshops with the number of seats taken by delegates and facilitators.
+    """
+    return Workshop.objects.select_related("location").annotate(
+        taken=Count("registration", distinct=True)
+        + Count("facilitatorregistration", distinct=True)
+    )
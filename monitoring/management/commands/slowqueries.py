@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from monitoring import slowqueries
+
+SORT_KEYS = {
+    "total": "total_ms",
+    "count": "count",
+    "max": "max_ms",
+}
+
+
+class Command(BaseCommand):
+    help = "Report the slow query log grouped by SQL fingerprint and call site"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--file",
+            default=settings.SLOW_QUERY_LOG_FILE,
+            help="Slow query log (rotated backups are read too)",
+        )
+        parser.add_argument("--limit", type=int, default=20)
+        parser.add_argument("--sort", choices=SORT_KEYS, default="total")
+
+    def handle(self, *args, **options):
+        files = slowqueries.log_files(options["file"])
+        if not files:
+            self.stdout.write(f"No slow query log at {options['file']}")
+            return
+
+        lines = []
+        for path in files:
+            lines += slowqueries.read_lines(path)
+
+        entries = slowqueries.aggregate(lines)
+        entries.sort(key=lambda entry: entry[SORT_KEYS[options["sort"]]], reverse=True)
+
+        for entry in entries[: options["limit"]]:
+            views = ", ".join(sorted(view for view in entry["views"] if view))
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{entry['count']} calls, {entry['total_ms']:.1f} ms total, "
+                    f"{entry['max_ms']:.1f} ms max, {entry['requests']} requests"
+                )
+            )
+            self.stdout.write(f"  {entry['site']} ({views or 'no view'})")
+            self.stdout.write(f"  {entry['fingerprint']}\n")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"{len(entries)} fingerprints from {len(files)} files")
+        )
@@ -0,0 +1,311 @@
+import json
+import math
+import os
+import threading
+import time
+
+from django.conf import settings
+
+# seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+HELP = {
+    "http_request_duration_seconds": "Request latency by URL name",
+    "http_responses_total": "Responses by URL name and status code",
+    "db_queries_per_request": "Queries run by a single request, by URL name",
+    "db_queries_total": "Queries run by URL name",
+    "email_send_duration_seconds": "Time spent sending a batch of emails",
+    "emails_sent_total": "Emails sent",
+    "emails_queued_total": "Emails handed to the email backend",
+    "emails_failed_total": "Emails the email backend did not send",
+    "workshop_full_rejections_total": "Registrations rejected because the workshop is full",
+    "cache_requests_total": "Cache lookups by cache name and result",
+    "password_hash_duration_seconds": "Password hashing time, including the wait for a pool process",
+    "password_hash_rejections_total": "Password hashes turned away because the pool was saturated",
+    "rate_limited_total": "Requests rejected by a rate limit, by scope and key",
+}
+
+
+def label_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+class Registry:
+    """
+    In-process counters and histograms.
+    With a directory set, every process writes its own values to
+    <directory>/<pid>.json on flush() and collect() adds up the files of all
+    processes, so gunicorn workers report as one. The directory should be
+    emptied when the server is (re)started.
+    Requests call maybe_flush(), which writes at most once per
+    flush_interval seconds, so a scrape sees other workers' values that
+    old at most.
+    """
+
+    def __init__(self, directory=None, process=None, flush_interval=5):
+        self.directory = directory
+        # file name for this process' values, the pid unless given
+        self.process = process
+        self.flush_interval = flush_interval
+        self.flushed_at = None
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, labels=None, value=1):
+        key = (name, label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=None, buckets=LATENCY_BUCKETS):
+        key = (name, label_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = {
+                    "buckets": list(buckets),
+                    "counts": [0] * len(buckets),
+                    "sum": 0,
+                    "count": 0,
+                }
+                self.histograms[key] = histogram
+
+            for i, bound in enumerate(histogram["buckets"]):
+                if value <= bound:
+                    histogram["counts"][i] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def snapshot(self):
+        """
+        JSON serializable copy of this process' values.
+        """
+        with self.lock:
+            return {
+                "counters": [
+                    [name, dict(labels), value]
+                    for (name, labels), value in self.counters.items()
+                ],
+                "histograms": [
+                    [name, dict(labels), json.loads(json.dumps(histogram))]
+                    for (name, labels), histogram in self.histograms.items()
+                ],
+            }
+
+    def maybe_flush(self, now=None):
+        """
+        flush() unless this process flushed less than flush_interval seconds ago.
+        """
+        if not self.directory:
+            return
+
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            if self.flushed_at is not None and now - self.flushed_at < self.flush_interval:
+                return
+            self.flushed_at = now
+
+        self.flush()
+
+    def flush(self):
+        """
+        Write this process' values to the shared directory (no-op without one).
+        """
+        if not self.directory:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{self.process or os.getpid()}.json")
+
+        # write then rename so readers never see a half written file
+        with open(f"{path}.tmp", "w") as file:
+            json.dump(self.snapshot(), file)
+        os.replace(f"{path}.tmp", path)
+
+    def snapshots(self):
+        if not self.directory:
+            return [self.snapshot()]
+
+        self.flush()
+
+        snapshots = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as file:
+                    snapshots.append(json.load(file))
+            except (OSError, ValueError):
+                # process exited or is rewriting its file
+                continue
+
+        return snapshots
+
+    def collect(self):
+        """
+        Values of every process added together.
+        Returns:
+            tuple: (counters, histograms) keyed by (name, labels)
+        """
+        counters = {}
+        histograms = {}
+
+        for snapshot in self.snapshots():
+            for name, labels, value in snapshot["counters"]:
+                key = (name, label_key(labels))
+                counters[key] = counters.get(key, 0) + value
+
+            for name, labels, histogram in snapshot["histograms"]:
+                key = (name, label_key(labels))
+                total = histograms.get(key)
+                if total is None:
+                    histograms[key] = histogram
+                    continue
+
+                total["counts"] = [
+                    a + b for a, b in zip(total["counts"], histogram["counts"])
+                ]
+                total["sum"] += histogram["sum"]
+                total["count"] += histogram["count"]
+
+        return counters, histograms
+
+    def render(self):
+        """
+        Every metric in the Prometheus text exposition format.
+        """
+        counters, histograms = self.collect()
+        lines = []
+
+        for name in sorted({name for name, _ in counters}):
+            lines += header(name, "counter")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+
+        for name in sorted({name for name, _ in histograms}):
+            lines += header(name, "histogram")
+            for (metric, labels), histogram in sorted(histograms.items()):
+                if metric != name:
+                    continue
+
+                for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                    bucket_labels = labels + (("le", format_value(bound)),)
+                    lines.append(f"{name}_bucket{format_labels(bucket_labels)} {count}")
+
+                inf_labels = labels + (("le", "+Inf"),)
+                lines.append(
+                    f"{name}_bucket{format_labels(inf_labels)} {histogram['count']}"
+                )
+                lines.append(
+                    f"{name}_sum{format_labels(labels)} {format_value(histogram['sum'])}"
+                )
+                lines.append(f"{name}_count{format_labels(labels)} {histogram['count']}")
+
+        return "\n".join(lines) + "\n"
+
+
+def header(name, metric_type):
+    lines = []
+    if name in HELP:
+        lines.append(f"# HELP {name} {HELP[name]}")
+    lines.append(f"# TYPE {name} {metric_type}")
+    return lines
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in labels) + "}"
+
+
+def format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+registry = Registry(
+    getattr(settings, "METRICS_DIR", None),
+    flush_interval=getattr(settings, "METRICS_FLUSH_INTERVAL", 5),
+)
+
+
+def record_request(stats, duration):
+    """
+    Request latency and query counts from QueryInstrumentationMiddleware.
+    """
+    view = stats["view"] or "unmatched"
+
+    registry.observe(
+        "http_request_duration_seconds",
+        duration,
+        {"view": view, "method": stats["method"]},
+    )
+    registry.inc("http_responses_total", {"view": view, "status": str(stats["status"])})
+    registry.observe(
+        "db_queries_per_request",
+        stats["queries"],
+        {"view": view},
+        buckets=QUERY_COUNT_BUCKETS,
+    )
+    registry.inc("db_queries_total", {"view": view}, stats["queries"])
+
+
+def record_email_queued(count):
+    registry.inc("emails_queued_total", value=count)
+
+
+def record_email_send(duration, sent, failed=0):
+    registry.observe("email_send_duration_seconds", duration)
+    registry.inc("emails_sent_total", value=sent)
+    if failed:
+        registry.inc("emails_failed_total", value=failed)
+
+
+def email_backlog():
+    """
+    Emails handed to the email backend and not sent or failed yet, across
+    workers when METRICS_DIR is set.
+    """
+    counters, histograms = registry.collect()
+
+    def total(name):
+        return counters.get((name, ()), 0)
+
+    return max(
+        0,
+        total("emails_queued_total")
+        - total("emails_sent_total")
+        - total("emails_failed_total"),
+    )
+
+
+def record_workshop_full(workshop):
+    """
+    A registration was turned away with 409 "<workshop> is full".
+    """
+    registry.inc("workshop_full_rejections_total", {"workshop": workshop.title})
+
+
+def record_cache(cache, hit):
+    registry.inc("cache_requests_total", {"cache": cache, "result": "hit" if hit else "miss"})
+
+
+def record_password_hash(duration):
+    registry.observe("password_hash_duration_seconds", duration)
+
+
+def record_password_hash_rejected():
+    registry.inc("password_hash_rejections_total")
+
+
+def record_rate_limited(scope, key):
+    registry.inc("rate_limited_total", {"scope": scope, "key": key})
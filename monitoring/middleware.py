@@ -0,0 +1,121 @@
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+
+from monitoring import budgets, metrics, slowqueries
+from monitoring.queries import QueryRecorder
+
+logger = logging.getLogger("monitoring.requests")
+
+
+def server_timing(stats):
+    """
+    Server-Timing header value for the request stats, shown in the
+    browser dev tools network tab.
+    """
+    return (
+        f'db;dur={stats["db_ms"]};desc="{stats["queries"]} queries", '
+        f'total;dur={stats["total_ms"]}'
+    )
+
+
+def new_recorder():
+    return QueryRecorder(
+        getattr(settings, "QUERY_SLOWEST_KEPT", 5),
+        track_sites=getattr(settings, "SLOW_QUERY_LOG_ENABLED", False),
+    )
+
+
+def install(recorder):
+    connection.execute_wrappers.append(recorder)
+
+
+def uninstall(recorder):
+    connection.execute_wrappers.remove(recorder)
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Record query count, DB time and the slowest statements of every request.
+    The stats are sent back as a Server-Timing header, logged as one JSON
+    line per request (a warning if the view is over its query budget or
+    slower than REQUEST_LOG_SLOW_MS, debug otherwise) and attached to the
+    response as response.query_stats for tests.
+    With SLOW_QUERY_LOG_ENABLED, slow and repeated queries are also written
+    to the slow query log grouped by fingerprint and call site.
+    Runs natively under ASGI so async views don't fall back to a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        recorder = new_recorder()
+
+        start = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+
+        return self.finish(request, response, recorder, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        recorder = new_recorder()
+
+        # async views query through sync_to_async, which runs every call of
+        # a request on the same thread, so the wrapper goes on that thread's
+        # connection
+        start = time.perf_counter()
+        await sync_to_async(install)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(uninstall)(recorder)
+
+        return self.finish(request, response, recorder, time.perf_counter() - start)
+
+    def finish(self, request, response, recorder, total):
+        match = getattr(request, "resolver_match", None)
+        view_name = match.view_name if match else None
+        budget = budgets.get_budget(view_name)
+
+        stats = {
+            "method": request.method,
+            "path": request.path,
+            "view": view_name,
+            "status": response.status_code,
+            "queries": recorder.count,
+            "db_ms": round(recorder.duration * 1000, 3),
+            "total_ms": round(total * 1000, 3),
+            "budget": budget,
+            "over_budget": budget is not None and recorder.count > budget,
+            "slowest": recorder.slowest(),
+        }
+
+        response["Server-Timing"] = server_timing(stats)
+        response.query_stats = stats
+
+        if recorder.track_sites:
+            slowqueries.log_offenders(recorder.sites, view_name)
+
+        metrics.record_request(stats, total)
+        metrics.registry.maybe_flush()
+
+        slow = stats["total_ms"] >= getattr(settings, "REQUEST_LOG_SLOW_MS", 1000)
+        level = logging.WARNING if stats["over_budget"] or slow else logging.DEBUG
+        if logger.isEnabledFor(level):
+            logger.log(level, json.dumps(stats))
+
+        return response
@@ -0,0 +1,162 @@
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import threading
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+
+PROFILE_SALT = "monitoring.profiling"
+
+
+def profile_token(user):
+    """
+    Signed value for ?__profile= that lets this user profile requests.
+    """
+    return signing.TimestampSigner(salt=PROFILE_SALT).sign(str(user.pk))
+
+
+def is_valid_token(request, token):
+    """
+    Whether token was made by profile_token for the logged in admin and
+    has not expired (PROFILER_TOKEN_MAX_AGE seconds).
+    """
+    if not request.user.is_authenticated:
+        return False
+
+    try:
+        pk = signing.TimestampSigner(salt=PROFILE_SALT).unsign(
+            token, max_age=getattr(settings, "PROFILER_TOKEN_MAX_AGE", 3600)
+        )
+    except signing.BadSignature:
+        return False
+
+    return pk == str(request.user.pk) and request.user.groups.filter(
+        name="FACTAdmin"
+    ).exists()
+
+
+def stats_report(stats, limit=None):
+    """
+    Functions ranked by cumulative time, as plain text.
+    """
+    stream = io.StringIO()
+    stats.stream = stream
+    stats.sort_stats("cumulative").print_stats(
+        limit or getattr(settings, "PROFILER_TOP", 40)
+    )
+    return stream.getvalue()
+
+
+def profile_response(stats, name, output_format=None):
+    """
+    The ranked report, or the raw stats as a .prof file for snakeviz or
+    pstats if output_format is "prof".
+    """
+    if output_format == "prof":
+        response = HttpResponse(
+            marshal.dumps(stats.stats), content_type="application/octet-stream"
+        )
+        response["Content-Disposition"] = f'attachment; filename="{name}.prof"'
+        return response
+
+    return HttpResponse(stats_report(stats), content_type="text/plain; charset=utf-8")
+
+
+def sample_path(view_name, process=None):
+    directory = getattr(settings, "PROFILER_DIR", None)
+    return os.path.join(directory, f"{view_name}.{process or os.getpid()}.prof")
+
+
+def load_samples(view_name):
+    """
+    Aggregate profile of the sampled requests of every process.
+    Returns:
+        pstats.Stats or None if nothing was sampled yet
+    """
+    directory = getattr(settings, "PROFILER_DIR", None)
+    if not directory or not os.path.isdir(directory):
+        return None
+
+    stats = None
+    for name in sorted(os.listdir(directory)):
+        if not name.startswith(f"{view_name}.") or not name.endswith(".prof"):
+            continue
+
+        path = os.path.join(directory, name)
+        if stats is None:
+            stats = pstats.Stats(path)
+        else:
+            stats.add(path)
+
+    return stats
+
+
+class ProfilerMiddleware:
+    """
+    Run views under cProfile on demand.
+    - A FACTAdmin passing ?__profile=<profile_token> gets the ranked report of
+      that request instead of the normal response (&__profile_format=prof
+      downloads the raw stats).
+    - URL names in PROFILER_SAMPLES are profiled for their first N requests
+      in every worker and aggregated in PROFILER_DIR, see
+      /profile/samples/<url name>.
+    Removed from the middleware chain entirely unless PROFILER_ENABLED.
+    Must come after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PROFILER_ENABLED", False):
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+        self.lock = threading.Lock()
+        self.remaining = dict(getattr(settings, "PROFILER_SAMPLES", {}))
+        self.samples = {}
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_name = request.resolver_match.view_name
+
+        token = request.GET.get("__profile")
+        if token and is_valid_token(request, token):
+            profile = cProfile.Profile()
+            profile.runcall(view_func, request, *view_args, **view_kwargs)
+
+            return profile_response(
+                pstats.Stats(profile),
+                view_name,
+                request.GET.get("__profile_format"),
+            )
+
+        if self.remaining.get(view_name, 0) > 0:
+            return self.sample(request, view_name, view_func, view_args, view_kwargs)
+
+        return None
+
+    def sample(self, request, view_name, view_func, view_args, view_kwargs):
+        with self.lock:
+            if self.remaining[view_name] <= 0:
+                return None
+            self.remaining[view_name] -= 1
+
+        profile = cProfile.Profile()
+        response = profile.runcall(view_func, request, *view_args, **view_kwargs)
+
+        with self.lock:
+            stats = self.samples.get(view_name)
+            if stats is None:
+                stats = self.samples[view_name] = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+
+            os.makedirs(settings.PROFILER_DIR, exist_ok=True)
+            stats.dump_stats(sample_path(view_name))
+
+        return response
@@ -0,0 +1,67 @@
+import heapq
+import time
+
+from monitoring import slowqueries
+
+
+class QueryRecorder:
+    """
+    connection.execute_wrapper hook that counts and times every query run
+    while it is installed, keeping the slowest statements.
+    """
+
+    def __init__(self, keep=5, track_sites=False):
+        self.count = 0
+        self.duration = 0.0
+        self.keep = keep
+        # min heap of (duration, order, sql) so the fastest kept query is dropped first
+        self._slowest = []
+        # {(fingerprint, call site): {"count", "total_ms", "max_ms"}} for the slow query log
+        self.track_sites = track_sites
+        self.sites = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.record(sql, duration)
+
+            if self.track_sites:
+                self.record_site(sql, slowqueries.call_site(), duration)
+
+    def record(self, sql, duration):
+        self.count += 1
+        self.duration += duration
+
+        if not self.keep:
+            return
+
+        entry = (duration, self.count, sql)
+        if len(self._slowest) < self.keep:
+            heapq.heappush(self._slowest, entry)
+        else:
+            heapq.heappushpop(self._slowest, entry)
+
+    def record_site(self, sql, site, duration):
+        key = (slowqueries.fingerprint(sql), site)
+        entry = self.sites.get(key)
+        if entry is None:
+            entry = self.sites[key] = {"count": 0, "total_ms": 0, "max_ms": 0}
+
+        ms = duration * 1000
+        entry["count"] += 1
+        entry["total_ms"] += ms
+        entry["max_ms"] = max(entry["max_ms"], ms)
+
+    def slowest(self):
+        """
+        Kept queries, slowest first.
+        Returns:
+            list: {"sql", "ms"} for each kept query
+        """
+        return [
+            {"sql": sql, "ms": round(duration * 1000, 3)}
+            for duration, _, sql in sorted(self._slowest, reverse=True)
+        ]
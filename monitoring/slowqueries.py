@@ -0,0 +1,155 @@
+import gzip
+import json
+import logging
+import os
+import re
+import sys
+
+from django.conf import settings
+
+logger = logging.getLogger("monitoring.slowqueries")
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r"(?<![\w.\"])-?\d+(?:\.\d+)?(?![\w\"])")
+PLACEHOLDER = re.compile(r"%s|\?")
+IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """
+    SQL with every literal and parameter replaced by ?, so executions of
+    the same statement with different values group together.
+    IN lists of any length become IN (...).
+    """
+    sql = STRING_LITERAL.sub("?", sql)
+    sql = NUMBER_LITERAL.sub("?", sql)
+    sql = PLACEHOLDER.sub("?", sql)
+    sql = IN_LIST.sub("IN (...)", sql)
+    return WHITESPACE.sub(" ", sql).strip()
+
+
+def call_site():
+    """
+    The innermost frame of project code (outside monitoring) running the
+    current query, as "path/to/file.py:line function".
+    """
+    base = str(settings.BASE_DIR) + os.sep
+    monitoring = os.path.join(base, "monitoring") + os.sep
+
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(base)
+            and not filename.startswith(monitoring)
+            and "site-packages" not in filename
+        ):
+            path = os.path.relpath(filename, base)
+            return f"{path}:{frame.f_lineno} {frame.f_code.co_name}"
+        frame = frame.f_back
+
+    return "unknown"
+
+
+def offenders(sites):
+    """
+    Executions of a request worth keeping: slow in total, or repeated
+    often enough to be an N+1.
+    Args:
+        sites: {(fingerprint, call site): {"count", "total_ms", "max_ms"}}
+    Returns:
+        list: The entries over SLOW_QUERY_MS or SLOW_QUERY_REPEATS
+    """
+    min_ms = getattr(settings, "SLOW_QUERY_MS", 100)
+    min_count = getattr(settings, "SLOW_QUERY_REPEATS", 10)
+
+    return sorted(
+        (
+            {"fingerprint": query, "site": site, **entry}
+            for (query, site), entry in sites.items()
+            if entry["total_ms"] >= min_ms or entry["count"] >= min_count
+        ),
+        key=lambda entry: entry["total_ms"],
+        reverse=True,
+    )
+
+
+def log_offenders(sites, view_name):
+    """
+    Append the offenders of a request to the slow query log, one JSON line
+    each (see the slowqueries command).
+    """
+    for entry in offenders(sites):
+        entry["view"] = view_name
+        entry["total_ms"] = round(entry["total_ms"], 3)
+        entry["max_ms"] = round(entry["max_ms"], 3)
+        logger.info(json.dumps(entry))
+
+
+def log_files(path):
+    """
+    The slow query log and its rotated backups (path.1, path.2.gz, ...),
+    oldest first.
+    """
+    files = []
+    i = 1
+    while True:
+        if os.path.exists(f"{path}.{i}"):
+            files.append(f"{path}.{i}")
+        elif os.path.exists(f"{path}.{i}.gz"):
+            files.append(f"{path}.{i}.gz")
+        else:
+            break
+        i += 1
+
+    files.reverse()
+    if os.path.exists(path):
+        files.append(path)
+
+    return files
+
+
+def read_lines(path):
+    """
+    Lines of a slow query log file, compressed backups included.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt") as file:
+        return file.readlines()
+
+
+def aggregate(lines):
+    """
+    Add up logged offenders by fingerprint and call site.
+    Returns:
+        list: {"fingerprint", "site", "views", "count", "total_ms", "max_ms", "requests"}
+    """
+    totals = {}
+
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+
+        key = (entry["fingerprint"], entry["site"])
+        total = totals.get(key)
+        if total is None:
+            total = totals[key] = {
+                "fingerprint": entry["fingerprint"],
+                "site": entry["site"],
+                "views": set(),
+                "count": 0,
+                "total_ms": 0,
+                "max_ms": 0,
+                "requests": 0,
+            }
+
+        total["views"].add(entry.get("view") or "")
+        total["count"] += entry["count"]
+        total["total_ms"] += entry["total_ms"]
+        total["max_ms"] = max(total["max_ms"], entry["max_ms"])
+        total["requests"] += 1
+
+    return list(totals.values())
@@ -0,0 +1,27 @@
+class QueryBudgetMixin:
+    """
+    TestCase mixin checking responses against the query budgets in
+    QUERY_BUDGETS_FILE. Needs QueryInstrumentationMiddleware installed.
+    """
+
+    def assertWithinQueryBudget(self, response, budget=None):
+        """
+        Fail if the request behind response ran more queries than its
+        budget (or the given budget).
+        """
+        stats = getattr(response, "query_stats", None)
+        if stats is None:
+            self.fail(
+                "Response has no query stats, is QueryInstrumentationMiddleware installed?"
+            )
+
+        budget = budget if budget is not None else stats["budget"]
+        if budget is None:
+            self.fail(f"No query budget for {stats['view']}")
+
+        if stats["queries"] > budget:
+            slowest = "\n".join(query["sql"] for query in stats["slowest"])
+            self.fail(
+                f"{stats['view']} ran {stats['queries']} queries, budget is {budget}\n"
+                f"Slowest:\n{slowest}"
+            )
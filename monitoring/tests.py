@@ -0,0 +1,723 @@
+import gzip
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import Group, User
+from django.core import mail
+from django.core.mail import EmailMessage, get_connection
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, LiveServerTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from fact_admin.models import AgendaItem
+from monitoring import budgets, loadtest, metrics, profiling, slowqueries
+from monitoring.queries import QueryRecorder
+from monitoring.testing import QueryBudgetMixin
+from registration.cache import response_cache
+from registration.models import (
+    Delegate,
+    Facilitator,
+    FacilitatorWorkshop,
+    Location,
+    Registration,
+    School,
+    Workshop,
+)
+
+
+def create_event(workshops=6, delegates=12):
+    """
+    Small event: locations, workshops with a facilitator each, schools and
+    delegates registered for every session.
+    """
+    school = School.objects.create(name="school")
+
+    created = []
+    for i in range(workshops):
+        location = Location.objects.create(
+            building="building", room_num=str(i), capacity=30, session=i % 3 + 1
+        )
+        workshop = Workshop.objects.create(
+            title=f"workshop {i}",
+            description="description",
+            session=i % 3 + 1,
+            location=location,
+        )
+        user = User.objects.create(username=f"facilitator{i}")
+        facilitator = Facilitator.objects.create(
+            user=user,
+            department_name=f"dept {i}",
+            facilitators="a, b",
+            image_url="https://example.com/a.png",
+            bio="bio",
+        )
+        FacilitatorWorkshop.objects.create(facilitator=facilitator, workshop=workshop)
+        created.append(workshop)
+
+    for i in range(delegates):
+        user = User.objects.create(
+            username=f"delegate{i}@example.com", email=f"delegate{i}@example.com"
+        )
+        delegate = Delegate.objects.create(user=user, school=school)
+        for workshop in created[:3]:
+            Registration.objects.create(delegate=delegate, workshop=workshop)
+
+    return created
+
+
+class QueryRecorderTest(TestCase):
+    def test_keeps_slowest_queries(self):
+        recorder = QueryRecorder(keep=2)
+
+        for sql, duration in [("a", 0.003), ("b", 0.001), ("c", 0.005), ("d", 0.002)]:
+            recorder.record(sql, duration)
+
+        self.assertEqual(recorder.count, 4)
+        self.assertAlmostEqual(recorder.duration, 0.011)
+        self.assertEqual([query["sql"] for query in recorder.slowest()], ["c", "a"])
+
+
+class QueryInstrumentationMiddlewareTest(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        response_cache().clear()
+        self.client = Client()
+        create_event()
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse("registration:location"))
+
+        stats = response.query_stats
+        self.assertEqual(stats["view"], "registration:location")
+        self.assertEqual(stats["queries"], 1)
+        self.assertIn('desc="1 queries"', response["Server-Timing"])
+        self.assertIn("total;dur=", response["Server-Timing"])
+        self.assertIn("registration_location", stats["slowest"][0]["sql"])
+
+    async def test_counts_queries_under_asgi(self):
+        response = await self.async_client.get(reverse("registration:location"))
+
+        self.assertEqual(response.query_stats["queries"], 1)
+        self.assertIn('desc="1 queries"', response["Server-Timing"])
+
+    def test_logs_request_stats(self):
+        with self.assertLogs("monitoring.requests", level="DEBUG") as logs:
+            self.client.get(reverse("registration:schools"))
+
+        self.assertEqual(logs.records[0].levelname, "DEBUG")
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line["view"], "registration:schools")
+        self.assertEqual(line["status"], 200)
+        self.assertFalse(line["over_budget"])
+
+    @override_settings(REQUEST_LOG_SLOW_MS=0)
+    def test_slow_request_is_a_warning(self):
+        with self.assertLogs("monitoring.requests", level="WARNING"):
+            self.client.get(reverse("registration:schools"))
+
+    def test_over_budget_is_a_warning(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "budgets.json")
+            with open(path, "w") as file:
+                json.dump({"registration:workshops_all": 1}, file)
+
+            with override_settings(QUERY_BUDGETS_FILE=path):
+                with self.assertLogs("monitoring.requests", level="WARNING"):
+                    response = self.client.get(reverse("registration:workshops_all"))
+
+        self.assertTrue(response.query_stats["over_budget"])
+        with self.assertRaises(AssertionError):
+            self.assertWithinQueryBudget(response)
+
+    def test_unknown_budget_file(self):
+        with override_settings(QUERY_BUDGETS_FILE="/does/not/exist.json"):
+            self.assertIsNone(budgets.get_budget("registration:workshops_all"))
+
+
+class QueryBudgets(QueryBudgetMixin, TestCase):
+    """
+    Every budgeted endpoint on a small event. Raise a budget only together
+    with the change that needs it.
+    """
+
+    def setUp(self):
+        response_cache().clear()
+        self.client = Client()
+        self.workshops = create_event()
+
+        group = Group.objects.create(name="FACTAdmin")
+        admin = User.objects.create(username="admin")
+        admin.groups.add(group)
+        self.admin = admin
+
+    def test_workshops_all(self):
+        self.assertWithinQueryBudget(self.client.get(reverse("registration:workshops_all")))
+
+    def test_workshop_id(self):
+        response = self.client.get(
+            reverse("registration:workshop_id", args=[self.workshops[0].pk])
+        )
+        self.assertWithinQueryBudget(response)
+
+    def test_catalog(self):
+        for name in [
+            "registration:workshop",
+            "registration:location",
+            "registration:schools",
+            "fact_admin:agenda_items",
+            "fact_admin:notifications",
+        ]:
+            self.assertWithinQueryBudget(self.client.get(reverse(name)))
+
+    def test_schools_search(self):
+        self.assertWithinQueryBudget(
+            self.client.get(reverse("registration:schools_search"), {"q": "school"})
+        )
+
+    def test_facilitators_dashboard(self):
+        self.client.force_login(User.objects.get(username="facilitator0"))
+        self.assertWithinQueryBudget(
+            self.client.get(reverse("registration:facilitators_dashboard"))
+        )
+
+    def test_summary(self):
+        self.client.force_login(self.admin)
+        self.assertWithinQueryBudget(self.client.get(reverse("fact_admin:summary")))
+
+    def test_forecast(self):
+        self.client.force_login(self.admin)
+        self.assertWithinQueryBudget(self.client.get(reverse("fact_admin:forecast")))
+
+    def test_delegate_sheet(self):
+        # the view writes the sheet to the working directory
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(directory.name)
+
+        self.client.force_login(self.admin)
+        self.assertWithinQueryBudget(self.client.get(reverse("fact_admin:delegate_sheet")))
+
+
+class MetricsRegistry(TestCase):
+    def test_aggregates_worker_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            first = metrics.Registry(directory, process="worker-1")
+            second = metrics.Registry(directory, process="worker-2")
+
+            first.inc("emails_sent_total", value=2)
+            second.inc("emails_sent_total", value=3)
+            first.observe("email_send_duration_seconds", 0.02)
+            second.observe("email_send_duration_seconds", 3)
+            first.flush()
+            second.flush()
+
+            counters, histograms = metrics.Registry(directory, process="reader").collect()
+
+        self.assertEqual(counters[("emails_sent_total", ())], 5)
+        histogram = histograms[("email_send_duration_seconds", ())]
+        self.assertEqual(histogram["count"], 2)
+        self.assertEqual(histogram["counts"][histogram["buckets"].index(0.025)], 1)
+        self.assertEqual(histogram["counts"][histogram["buckets"].index(5)], 2)
+
+    def test_flushes_on_an_interval(self):
+        with tempfile.TemporaryDirectory() as directory:
+            registry = metrics.Registry(directory, process="worker", flush_interval=5)
+            path = os.path.join(directory, "worker.json")
+
+            registry.inc("emails_sent_total")
+            registry.maybe_flush(now=100)
+            registry.inc("emails_sent_total")
+            registry.maybe_flush(now=103)
+
+            with open(path) as file:
+                self.assertEqual(json.load(file)["counters"][0][2], 1)
+
+            registry.maybe_flush(now=105)
+            with open(path) as file:
+                self.assertEqual(json.load(file)["counters"][0][2], 2)
+
+    def test_prometheus_text(self):
+        registry = metrics.Registry()
+        registry.inc("workshop_full_rejections_total", {"workshop": 'the "panel"'})
+        registry.observe("http_request_duration_seconds", 0.3, {"view": "v", "method": "GET"})
+
+        text = registry.render()
+
+        self.assertIn("# TYPE workshop_full_rejections_total counter", text)
+        self.assertIn('workshop_full_rejections_total{workshop="the \\"panel\\""} 1', text)
+        self.assertIn(
+            'http_request_duration_seconds_bucket{method="GET",view="v",le="0.25"} 0', text
+        )
+        self.assertIn(
+            'http_request_duration_seconds_bucket{method="GET",view="v",le="0.5"} 1', text
+        )
+        self.assertIn(
+            'http_request_duration_seconds_bucket{method="GET",view="v",le="+Inf"} 1', text
+        )
+        self.assertIn('http_request_duration_seconds_count{method="GET",view="v"} 1', text)
+
+    @override_settings(
+        INSTRUMENTED_EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend"
+    )
+    def test_times_email_sends(self):
+        before = metrics.registry.collect()[0].get(("emails_sent_total", ()), 0)
+
+        connection = get_connection("monitoring.mail.InstrumentedEmailBackend")
+        EmailMessage(
+            "subject", "body", "a@example.com", ["b@example.com"], connection=connection
+        ).send()
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(
+            metrics.registry.collect()[0][("emails_sent_total", ())], before + 1
+        )
+
+    def test_email_backlog(self):
+        connection = get_connection("monitoring.mail.InstrumentedEmailBackend")
+        message = EmailMessage("subject", "body", "a@example.com", ["b@example.com"])
+        seen = []
+
+        def send_messages(messages):
+            # while SMTP is busy the message is in the backlog
+            seen.append(metrics.email_backlog())
+            raise OSError("connection refused")
+
+        with mock.patch.object(connection.backend, "send_messages", send_messages):
+            with self.assertRaises(OSError):
+                connection.send_messages([message])
+
+        self.assertEqual(seen, [1])
+        self.assertEqual(metrics.email_backlog(), 0)
+
+
+class MetricsEndpoint(TestCase):
+    def setUp(self):
+        response_cache().clear()
+        self.client = Client()
+        self.url = reverse("monitoring:metrics")
+
+    def test_admin_only(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_reports_requests(self):
+        admin = User.objects.create(username="admin")
+        admin.groups.add(Group.objects.create(name="FACTAdmin"))
+        self.client.force_login(admin)
+
+        self.client.get(reverse("registration:schools"))
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        text = response.content.decode()
+        self.assertIn(
+            'http_request_duration_seconds_count{method="GET",view="registration:schools"}',
+            text,
+        )
+        self.assertIn('db_queries_total{view="registration:schools"}', text)
+
+
+class ProfilerMiddlewareTest(TestCase):
+    def setUp(self):
+        response_cache().clear()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+        self.settings = override_settings(
+            PROFILER_ENABLED=True,
+            PROFILER_DIR=self.directory.name,
+            PROFILER_SAMPLES={"registration:workshops_all": 2},
+        )
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+
+        create_event()
+
+        self.admin = User.objects.create(username="admin")
+        self.admin.groups.add(Group.objects.create(name="FACTAdmin"))
+
+        self.client = Client()
+        self.client.force_login(self.admin)
+        self.token = self.client.get(reverse("monitoring:profile_token")).json()["token"]
+
+    def test_ranked_report(self):
+        response = self.client.get(
+            reverse("registration:workshop"), {"__profile": self.token}
+        )
+
+        self.assertEqual(response["Content-Type"], "text/plain; charset=utf-8")
+        report = response.content.decode()
+        self.assertIn("cumulative", report)
+        self.assertIn("views.py", report)
+
+    def test_prof_download(self):
+        response = self.client.get(
+            reverse("registration:workshop"),
+            {"__profile": self.token, "__profile_format": "prof"},
+        )
+
+        self.assertIn("registration:workshop.prof", response["Content-Disposition"])
+
+    def test_requires_admin_token(self):
+        other = User.objects.create(username="other")
+        client = Client()
+        client.force_login(other)
+
+        for token in [self.token, "1", profiling.profile_token(other)]:
+            response = client.get(reverse("registration:workshop"), {"__profile": token})
+            self.assertEqual(response["Content-Type"], "application/json")
+
+    def test_aggregates_samples(self):
+        for i in range(3):
+            response = self.client.get(reverse("registration:workshops_all"))
+            self.assertEqual(response.status_code, 200)
+
+        stats = profiling.load_samples("registration:workshops_all")
+        view = [
+            calls
+            for (file, line, function), (_, calls, *_rest) in stats.stats.items()
+            if function == "workshops_all"
+        ]
+        self.assertEqual(view, [2])
+
+        response = self.client.get(
+            reverse("monitoring:profile_samples", args=["registration:workshops_all"])
+        )
+        self.assertIn("workshops_all", response.content.decode())
+
+    @override_settings(PROFILER_ENABLED=False)
+    def test_disabled(self):
+        client = Client()
+        client.force_login(self.admin)
+
+        response = client.get(reverse("registration:workshop"), {"__profile": self.token})
+
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertFalse(os.listdir(self.directory.name))
+
+
+class SlowQueryLog(TestCase):
+    def test_fingerprint_strips_literals(self):
+        self.assertEqual(
+            slowqueries.fingerprint(
+                "SELECT \"t1\".\"id\" FROM \"t1\"  WHERE \"t1\".\"x\" = 15 AND "
+                "name = 'it''s' AND id IN (%s, %s, %s) LIMIT 21"
+            ),
+            'SELECT "t1"."id" FROM "t1" WHERE "t1"."x" = ? AND name = ? AND id IN (...) LIMIT ?',
+        )
+
+    @override_settings(SLOW_QUERY_LOG_ENABLED=True, SLOW_QUERY_REPEATS=10)
+    def test_n_plus_one_is_one_fingerprint(self):
+        create_event(delegates=12)
+        admin = User.objects.create(username="admin")
+        admin.groups.add(Group.objects.create(name="FACTAdmin"))
+
+        client = Client()
+        client.force_login(admin)
+
+        # the view writes the sheet to the working directory
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(directory.name)
+
+        with self.assertLogs("monitoring.slowqueries", level="INFO") as logs:
+            client.get(reverse("fact_admin:delegate_sheet"))
+
+        entries = [json.loads(record.getMessage()) for record in logs.records]
+        workshop_gets = [
+            entry
+            for entry in entries
+            if entry["fingerprint"].startswith('SELECT "registration_workshop"')
+        ]
+        self.assertEqual(len(workshop_gets), 1)
+        self.assertEqual(workshop_gets[0]["count"], 36)
+        self.assertTrue(
+            workshop_gets[0]["site"].startswith("fact_admin/actions/views.py:")
+        )
+        self.assertTrue(workshop_gets[0]["site"].endswith(" delegate_sheet"))
+        self.assertEqual(workshop_gets[0]["view"], "fact_admin:delegate_sheet")
+
+        # two requests worth of log lines, aggregated by the command
+        path = os.path.join(directory.name, "slow.log")
+        with open(path, "w") as file:
+            file.writelines(f"{record.getMessage()}\n" for record in logs.records * 2)
+
+        out = StringIO()
+        call_command("slowqueries", file=path, sort="count", limit=1, stdout=out)
+
+        report = out.getvalue()
+        self.assertIn("72 calls", report)
+        self.assertIn("2 requests", report)
+
+    def test_command_reads_rotated_files(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "slow.log")
+
+        entry = {
+            "fingerprint": "SELECT ?",
+            "site": "monitoring/tests.py:1 test",
+            "view": "registration:schools",
+            "count": 1,
+            "total_ms": 150.0,
+            "max_ms": 150.0,
+        }
+        # the live log, a backup not yet compressed and a compressed one
+        for name, opener in [
+            (path, open),
+            (f"{path}.1", open),
+            (f"{path}.2.gz", gzip.open),
+        ]:
+            with opener(name, "wt") as file:
+                file.write(json.dumps(entry) + "\n")
+
+        self.assertEqual(
+            slowqueries.log_files(path), [f"{path}.2.gz", f"{path}.1", path]
+        )
+
+        out = StringIO()
+        call_command("slowqueries", file=path, stdout=out)
+        self.assertIn("3 requests", out.getvalue())
+        self.assertIn("from 3 files", out.getvalue())
+
+
+class LoadTestResults(TestCase):
+    def test_percentiles_and_oversells(self):
+        results = loadtest.Results({1: 1, 2: 5})
+        for ms in range(1, 101):
+            results.record("delegates", 200, ms)
+        results.record("delegates", 409, 1000)
+
+        results.book("delegates", [1, 2])
+        results.book("delegates", [1])
+        results.book("delegate_me", [2], [1])
+        results.book("delegate_me", [1], [2])
+
+        report = results.report(duration=10)["delegates"]
+        self.assertEqual(report["requests"], 101)
+        self.assertEqual(report["per_second"], 10.1)
+        self.assertEqual(report["p50_ms"], 51)
+        self.assertEqual(report["p99_ms"], 100)
+        self.assertEqual(report["max_ms"], 1000)
+        self.assertEqual(report["statuses"], {"200": 100, "409": 1})
+        self.assertEqual(report["oversells"], 1)
+        self.assertEqual(results.oversells["delegate_me"], 1)
+
+
+@override_settings(DEVELOPMENT_MODE=True)
+class LoadTestCommand(LiveServerTestCase):
+    def setUp(self):
+        response_cache().clear()
+
+    @mock.patch.dict(os.environ, {"EMAIL_HOST_USER": "fact@example.com"})
+    def test_replays_registration_day(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        # one 5 seat workshop per session for 7 delegates
+        scenario = os.path.join(directory.name, "scenario.json")
+        with open(scenario, "w") as file:
+            json.dump(
+                {
+                    "seed": 1,
+                    "schools": 2,
+                    "workshops_per_session": 1,
+                    "capacity": 1,
+                    "delegates": 7,
+                    "concurrency": 1,
+                    "workshops_all_polls": 2,
+                    "change_workshops": 1,
+                },
+                file,
+            )
+
+        out = StringIO()
+        call_command(
+            "loadtest",
+            url=self.live_server_url,
+            scenario=scenario,
+            json=True,
+            stdout=out,
+        )
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(report["create_delegate"]["statuses"], {"200": 7})
+        self.assertEqual(report["otp_verify"]["statuses"], {"200": 7})
+        self.assertEqual(report["workshops_all"]["requests"], 14)
+        self.assertEqual(report["delegates"]["statuses"], {"200": 5, "409": 6})
+        self.assertEqual(report["delegates"]["oversells"], 0)
+        self.assertEqual(report["oversold_seats"], 0)
+        self.assertEqual(Workshop.objects.count(), 3)
+        self.assertEqual(Registration.objects.count(), 15)
+
+        # seeding again would duplicate the event
+        with self.assertRaises(CommandError):
+            call_command("loadtest", url=self.live_server_url, scenario=scenario, stdout=out)
+
+
+STARTUP_SCRIPT = """
+import json, resource, sys
+import django
+
+django.setup()
+import fact_registration_backend.urls
+
+def rss():
+    # current RSS, ru_maxrss can carry over the parent's peak across fork + exec
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+
+loaded = [name for name in ("numpy", "pandas.core", "openpyxl.reader") if name in sys.modules]
+booted = rss()
+
+import pandas
+pandas.DataFrame()
+
+print(json.dumps({"loaded": loaded, "booted_mb": booted, "with_pandas_mb": rss()}))
+"""
+
+
+class StartupFootprint(TestCase):
+    """
+    Loading the URL conf (what every web worker does at boot) must not
+    import pandas, numpy or openpyxl.
+    """
+
+    def test_boot_skips_tabular_imports(self):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            env={
+                **os.environ,
+                "DJANGO_SETTINGS_MODULE": "fact_registration_backend.settings",
+                "DEVELOPMENT_MODE": "True",
+            },
+            capture_output=True,
+            text=True,
+            timeout=120,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+
+        footprint = json.loads(result.stdout.strip().splitlines()[-1])
+
+        # -X importtime lines: "import time: self [us] | cumulative | imported package"
+        slowest = sorted(
+            (
+                line.split("|")
+                for line in result.stderr.splitlines()
+                if line.startswith("import time:") and "cumulative" not in line
+            ),
+            key=lambda columns: int(columns[1]),
+            reverse=True,
+        )[:10]
+        report = "\n".join(
+            f"{columns[1].strip()} us {columns[2].strip()}" for columns in slowest
+        )
+
+        self.assertEqual(footprint["loaded"], [], report)
+        # pandas and numpy are tens of MB of the boot RSS when imported eagerly
+        self.assertLess(footprint["booted_mb"] + 20, footprint["with_pandas_mb"], report)
+
+
+@override_settings(DEVELOPMENT_MODE=True)
+class SeedEvent(TestCase):
+    """
+    seedevent builds a large, reproducible event in a bounded number of queries.
+    """
+
+    options = {
+        "schools": 20,
+        "workshops_per_session": 10,
+        "capacity": 300,
+        "delegates": 1500,
+        "stdout": StringIO(),
+    }
+
+    def registrations(self):
+        return sorted(
+            Registration.objects.values_list(
+                "delegate__user__email", "workshop__title"
+            )
+        )
+
+    def test_seed_event(self):
+        with CaptureQueriesContext(connection) as queries:
+            call_command("seedevent", **self.options)
+
+        self.assertLess(len(queries.captured_queries), 100)
+        self.assertEqual(Workshop.objects.count(), 30)
+        self.assertEqual(FacilitatorWorkshop.objects.count(), 30)
+        self.assertEqual(Delegate.objects.count(), 1500)
+        self.assertEqual(AgendaItem.objects.filter(session_num=2).count(), 1)
+        # nobody can log in to the synthetic accounts by default
+        self.assertFalse(
+            User.objects.get(username="synthetic.delegate1@example.com").has_usable_password()
+        )
+
+        # rooms fill up and nobody is registered twice in a session
+        for workshop in Workshop.objects.annotate(taken=Count("registration")):
+            self.assertLessEqual(workshop.taken, workshop.location.capacity)
+        for session in range(1, 4):
+            self.assertEqual(
+                Registration.objects.filter(workshop__session=session)
+                .values("delegate")
+                .distinct()
+                .count(),
+                Registration.objects.filter(workshop__session=session).count(),
+            )
+
+        # popularity is skewed, not uniform
+        taken = sorted(
+            Workshop.objects.filter(session=1)
+            .annotate(taken=Count("registration"))
+            .values_list("taken", flat=True)
+        )
+        self.assertGreater(taken[-1], 3 * taken[0])
+
+        first = self.registrations()
+        call_command("seedevent", reset=True, **self.options)
+        self.assertEqual(self.registrations(), first)
+
+    def test_refuses_to_seed_over_an_event(self):
+        Workshop.objects.create(title="real", description="real")
+
+        with self.assertRaises(CommandError):
+            call_command("seedevent", **self.options)
+
+    def test_password(self):
+        call_command(
+            "seedevent", password="rehearsal", **{**self.options, "delegates": 1}
+        )
+
+        self.assertTrue(
+            User.objects.get(username="synthetic.delegate1@example.com").check_password(
+                "rehearsal"
+            )
+        )
+
+    @override_settings(DEBUG=False, DEVELOPMENT_MODE=False)
+    def test_refuses_outside_development(self):
+        with self.assertRaises(CommandError):
+            call_command("seedevent", reset=True, **self.options)
+        with self.assertRaises(CommandError):
+            call_command("loadtest", stdout=StringIO())
+
+        self.assertEqual(Workshop.objects.count(), 0)
+
+        call_command("seedevent", force=True, **{**self.options, "delegates": 1})
+        self.assertEqual(Delegate.objects.count(), 1)
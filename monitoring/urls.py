@@ -0,0 +1,14 @@
+from django.urls import path
+
+from . import views
+
+app_name = "monitoring"
+urlpatterns = [
+    path("metrics", views.metrics_view, name="metrics"),
+    path("profile/token/", views.profile_token, name="profile_token"),
+    path(
+        "profile/samples/<str:view_name>/",
+        views.profile_samples,
+        name="profile_samples",
+    ),
+]
@@ -0,0 +1,60 @@
+from django.http import HttpResponse, JsonResponse
+
+from monitoring import metrics, profiling
+
+
+def metrics_view(request):
+    """
+    GET: Every metric in the Prometheus text format (admin only)
+    Aggregated across workers when METRICS_DIR is set
+    """
+    if not request.user.groups.filter(name="FACTAdmin").exists():
+        return JsonResponse(
+            {"message": "Must be admin to make this request"}, status=403
+        )
+
+    if request.method == "GET":
+        return HttpResponse(
+            metrics.registry.render(),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
+    else:
+        return JsonResponse({"message": "Method not allowed"}, status=405)
+
+
+def profile_token(request):
+    """
+    GET: Token for ?__profile= on any request (admin only)
+    Only works for the requesting admin and expires after PROFILER_TOKEN_MAX_AGE
+    """
+    if not request.user.groups.filter(name="FACTAdmin").exists():
+        return JsonResponse(
+            {"message": "Must be admin to make this request"}, status=403
+        )
+
+    if request.method == "GET":
+        return JsonResponse({"token": profiling.profile_token(request.user)})
+    else:
+        return JsonResponse({"message": "Method not allowed"}, status=405)
+
+
+def profile_samples(request, view_name):
+    """
+    GET: Aggregate profile of the requests sampled for a URL name (admin only)
+    Optional query params:
+        - format=prof: Download the raw stats instead of the ranked report
+    Returns 404 if nothing has been sampled for the URL name
+    """
+    if not request.user.groups.filter(name="FACTAdmin").exists():
+        return JsonResponse(
+            {"message": "Must be admin to make this request"}, status=403
+        )
+
+    if request.method == "GET":
+        stats = profiling.load_samples(view_name)
+        if stats is None:
+            return JsonResponse({"message": "No samples"}, status=404)
+
+        return profiling.profile_response(stats, view_name, request.GET.get("format"))
+    else:
+        return JsonResponse({"message": "Method not allowed"}, status=405)
@@ -1,5 +1,9 @@
 import json
-from django.test import Client, TestCase
+import os
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
 from django.core import mail
@@ -182,3 +186,35 @@ class VerifyPendingVerification(TestCase):
         )
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(PendingVerification.objects.all()), 0)
+
+
+@override_settings(
+    RATE_LIMITING=True,
+    RATE_LIMITS={"verification": {"ip": (5, 3600), "account": (2, 900)}},
+)
+class RequestVerificationRateLimit(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def post(self, data):
+        return self.client.post(
+            reverse("verifications:request"), json.dumps(data), content_type="application/json"
+        )
+
+    @mock.patch.dict(os.environ, {"EMAIL_HOST_USER": "fact@example.com"})
+    def test_account_limit_rejects_before_any_work(self):
+        data = {"email": "limit@example.com", "email_subject": "Verify"}
+        self.post(data)
+        self.post(data)
+
+        with self.assertNumQueries(0):
+            response = self.post(data)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response["Retry-After"]), 0)
+        self.assertEqual(len(mail.outbox), 2)
+
+        # the same address in another case is the same account
+        data["email"] = "LIMIT@example.com"
+        self.assertEqual(self.post(data).status_code, 429)
@@ -1,5 +1,4 @@
 import json
-import environ
 import secrets
 
 from django.http import JsonResponse
@@ -10,10 +9,11 @@ from django.core.validators import validate_email
 
 from one_time_verification.models import PendingVerification
 
-env = environ.Env()
-environ.Env.read_env()
+from fact_registration_backend.environment import env
+from fact_registration_backend.ratelimit import rate_limit
 
 
+@rate_limit("verification")
 def request_verification(request):
     """
     POST: Request email verification code
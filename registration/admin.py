@@ -2,6 +2,7 @@ from django.contrib import admin
 from .models import (
     AccountSetUp,
     FacilitatorAssistant,
+    FacilitatorMember,
     FacilitatorRegistration,
     FacilitatorWorkshop,
     NewSchool,
@@ -11,6 +12,7 @@ from .models import (
     School,
     Delegate,
     Registration,
+    RegistrationEvent,
 )
 
 admin.site.register(Workshop)
@@ -19,8 +21,10 @@ admin.site.register(Facilitator)
 admin.site.register(School)
 admin.site.register(Delegate)
 admin.site.register(Registration)
+admin.site.register(FacilitatorMember)
 admin.site.register(FacilitatorRegistration)
 admin.site.register(FacilitatorWorkshop)
 admin.site.register(FacilitatorAssistant)
 admin.site.register(NewSchool)
 admin.site.register(AccountSetUp)
+admin.site.register(RegistrationEvent)
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class RegistrationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'registration'
+
+    def ready(self):
+        from registration import cache, events
+        from registration.facilitator import members
+
+        cache.connect_signals()
+        events.connect_signals()
+        members.connect_signals()
@@ -0,0 +1,79 @@
+from fact_registration_backend.lazy import lazy_import
+
+pd = lazy_import("pandas")
+openpyxl = lazy_import("openpyxl")
+
+
+def is_csv(file):
+    return str(getattr(file, "name", "")).lower().endswith(".csv")
+
+
+def iter_excel_chunks(file, chunk_size=None):
+    """
+    Stream the first sheet of an Excel file with openpyxl in read-only
+    mode, so only chunk_size rows are held in memory at a time.
+    Yields:
+        dataframe: Up to chunk_size rows, indexed by position in the sheet
+    """
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+
+        if header is None:
+            raise ValueError("Sheet is empty")
+
+        columns = list(header)
+        start = 0
+        chunk = []
+
+        for row in rows:
+            chunk.append(row)
+
+            if chunk_size and len(chunk) >= chunk_size:
+                yield excel_frame(chunk, columns, start)
+                start += len(chunk)
+                chunk = []
+
+        if chunk or start == 0:
+            yield excel_frame(chunk, columns, start)
+    finally:
+        workbook.close()
+
+
+def excel_frame(rows, columns, start):
+    # DataFrame, from_records can't build a header only sheet
+    df = pd.DataFrame(
+        list(rows), columns=columns, index=range(start, start + len(rows))
+    )
+
+    # drop columns without a header and rows without any values
+    df = df.loc[:, [column is not None for column in df.columns]]
+    return df.dropna(how="all")
+
+
+def iter_csv_chunks(file, chunk_size=None):
+    """
+    Stream a CSV file with pandas in chunks of chunk_size rows.
+    Yields:
+        dataframe: Up to chunk_size rows, indexed by position in the file
+    """
+    if not chunk_size:
+        yield pd.read_csv(file)
+        return
+
+    with pd.read_csv(file, chunksize=chunk_size) as reader:
+        for chunk in reader:
+            yield chunk
+
+
+def iter_chunks(file, chunk_size=None):
+    """
+    Stream an uploaded .xlsx or .csv file in chunks of chunk_size rows
+    (the whole file at once if chunk_size is None).
+    """
+    if is_csv(file):
+        return iter_csv_chunks(file, chunk_size)
+
+    return iter_excel_chunks(file, chunk_size)
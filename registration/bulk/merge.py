@@ -0,0 +1,92 @@
+from django.db import transaction
+
+from registration import cache as response_cache
+from registration.bulk.pipeline import get_batch_size
+
+
+def is_merge(request):
+    """
+    Bulk uploads replace an empty table by default, ?mode=merge upserts
+    into the existing rows instead.
+    """
+    return request.GET.get("mode") == "merge"
+
+
+def compute_diff(existing, incoming, key, fields):
+    """
+    Match incoming rows to existing rows on their natural key.
+    Args:
+        existing: Saved model instances
+        incoming: Unsaved model instances built from the sheet
+        key: Function returning the natural key of an instance
+        fields: Fields copied onto matched rows when they differ
+    Returns:
+        dict: create (new instances), update (changed saved instances),
+              delete (saved instances missing from the sheet), unchanged count
+    """
+    existing_by_key = {key(obj): obj for obj in existing}
+    incoming_keys = set()
+
+    diff = {"create": [], "update": [], "delete": [], "unchanged": 0}
+
+    for obj in incoming:
+        obj_key = key(obj)
+        incoming_keys.add(obj_key)
+
+        current = existing_by_key.get(obj_key)
+        if current is None:
+            diff["create"].append(obj)
+            continue
+
+        changed = False
+        for field in fields:
+            value = getattr(obj, field)
+            if getattr(current, field) != value:
+                setattr(current, field, value)
+                changed = True
+
+        if changed:
+            diff["update"].append(current)
+        else:
+            diff["unchanged"] += 1
+
+    diff["delete"] = [
+        obj for obj_key, obj in existing_by_key.items() if obj_key not in incoming_keys
+    ]
+
+    return diff
+
+
+def apply_diff(model, diff, fields, batch_size=None):
+    """
+    Write a diff from compute_diff in a single transaction.
+    Returns:
+        dict: Summary counts for the response
+    """
+    batch_size = get_batch_size(batch_size)
+
+    with transaction.atomic():
+        response_cache.invalidate()
+
+        if diff["delete"]:
+            model.objects.filter(pk__in=[obj.pk for obj in diff["delete"]]).delete()
+
+        if diff["update"]:
+            model.objects.bulk_update(diff["update"], fields, batch_size=batch_size)
+
+        if diff["create"]:
+            model.objects.bulk_create(diff["create"], batch_size=batch_size)
+
+    return summarize(diff)
+
+
+def summarize(diff):
+    """
+    Summary counts of a diff.
+    """
+    return {
+        "created": len(diff["create"]),
+        "updated": len(diff["update"]),
+        "deleted": len(diff["delete"]),
+        "unchanged": diff["unchanged"],
+    }
@@ -0,0 +1,324 @@
+from django.conf import settings
+from django.db import transaction
+
+from fact_registration_backend.lazy import lazy_import
+from registration import cache as response_cache
+from registration.bulk import ingest
+
+pd = lazy_import("pandas")
+
+
+MISSING_VALUES_MESSAGE = "Missing values - make sure there are no empty cells"
+
+
+def sheet_row(index):
+    """
+    Convert a dataframe index into the row number shown in the spreadsheet
+    (row 1 is the header).
+    """
+    return int(index) + 2
+
+
+def row_error(index, column, message):
+    """
+    Build a single entry of the per-row error report.
+    """
+    return {"row": sheet_row(index), "column": column, "message": message}
+
+
+def error_report(message, errors=None):
+    """
+    Build the response body for a rejected upload.
+    Args:
+        message: Summary message (first problem found)
+        errors: List of per-row errors from row_error
+    """
+    return {"message": message, "errors": errors or []}
+
+
+def is_streaming(request, endpoint):
+    """
+    Whether an upload is validated and inserted in batches instead of
+    reading the whole sheet first. Defaults to BULK_IMPORT_INGEST[endpoint],
+    ?ingest=stream or ?ingest=frame overrides it.
+    """
+    mode = request.GET.get("ingest") or getattr(settings, "BULK_IMPORT_INGEST", {}).get(
+        endpoint, "frame"
+    )
+    return mode == "stream"
+
+
+def is_dry_run(request):
+    """
+    ?dry_run=1 validates an upload and reports every problem without
+    writing anything.
+    """
+    return request.GET.get("dry_run", "").lower() in ("1", "true")
+
+
+def dry_run_report(df, errors, warnings=None):
+    """
+    Build the response for a dry run.
+    Args:
+        df: Validated dataframe
+        errors: Per-row errors that would reject the upload
+        warnings: Problems that would not stop the upload
+    Returns:
+        tuple: (response body, status)
+    """
+    body = error_report(errors[0]["message"] if errors else "Dry run passed", errors)
+    body.update(
+        {
+            "dry_run": True,
+            "valid": not errors,
+            "rows": len(df),
+            "warnings": warnings or [],
+        }
+    )
+
+    return body, 400 if errors else 200
+
+
+class UnreadableFile(Exception):
+    """
+    The upload is not a sheet pandas or openpyxl can read.
+    """
+
+
+def read_chunks(file, chunk_size=None):
+    """
+    ingest.iter_chunks, with read and parse errors raised as UnreadableFile
+    so they can be told apart from errors in the code handling the chunks.
+    """
+    chunks = ingest.iter_chunks(file, chunk_size)
+
+    while True:
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            return
+        except Exception as error:
+            # bad zip, bad csv, empty sheet... the file is at fault
+            raise UnreadableFile() from error
+
+        yield chunk
+
+
+def read_sheet(file):
+    """
+    Read a whole uploaded .xlsx or .csv file into a dataframe.
+    The dataframe index is kept in line with the sheet so errors can point
+    at the right row.
+    Returns:
+        tuple: (dataframe, error_response) - error_response is None on success
+    """
+    try:
+        df = next(read_chunks(file))
+    except (UnreadableFile, StopIteration):
+        return None, error_report("Error reading file")
+
+    return df, None
+
+
+def clean_columns(df, expected_columns, quote_columns=False):
+    """
+    Drop duplicate rows and normalize column names, then check the expected
+    columns are present.
+    Args:
+        df: Dataframe read from the uploaded sheet
+        expected_columns: Columns that must be present
+        quote_columns: Quote the column name in the missing column message
+    Returns:
+        tuple: (dataframe, error_response) - error_response is None on success
+    """
+    df = df.drop_duplicates()
+    # when loading in df, pandas will add ".#" to duplicate columns
+    df.columns = [str(x).lower().split(".")[0] for x in df.columns]
+
+    if len(set(df.columns)) != len(df.columns):
+        return None, error_report("Duplicate column names")
+
+    for column in expected_columns:
+        if column not in df.columns:
+            name = f"'{column}'" if quote_columns else column
+            return None, error_report(f"Missing column {name}")
+
+    return df, None
+
+
+def load_sheet(file, expected_columns, quote_columns=False):
+    """
+    Read an uploaded sheet and normalize its columns.
+    Returns:
+        tuple: (dataframe, error_response) - error_response is None on success
+    """
+    df, error = read_sheet(file)
+    if error:
+        return None, error
+
+    return clean_columns(df, expected_columns, quote_columns=quote_columns)
+
+
+def missing_value_errors(df, columns, message="Missing value"):
+    """
+    Find empty cells in the given columns.
+    Returns:
+        list: Per-row errors, one per empty cell
+    """
+    mask = df[columns].isnull()
+    if not mask.values.any():
+        return []
+
+    cells = mask.stack()
+    cells = cells[cells]
+
+    return [row_error(index, column, message) for index, column in cells.index]
+
+
+def invalid_value_errors(df, column, valid_values, message):
+    """
+    Find cells in a column that are not one of the valid values.
+    Empty cells are ignored (see missing_value_errors).
+    Returns:
+        list: Per-row errors, one per invalid cell
+    """
+    invalid = df[df[column].notnull() & ~df[column].isin(valid_values)]
+
+    return [row_error(index, column, message) for index in invalid.index]
+
+
+def whole_number_errors(df, column, message):
+    """
+    Find cells in a column that are not whole numbers (text, or a number
+    with a fraction). Empty cells are ignored (see missing_value_errors).
+    Returns:
+        list: Per-row errors, one per invalid cell
+    """
+    numbers = pd.to_numeric(df[column], errors="coerce")
+    invalid = df[column].notnull() & (numbers.isnull() | (numbers % 1 != 0))
+
+    return mask_errors(df, invalid.values, column, message)
+
+
+def mask_errors(df, mask, column, message):
+    """
+    Report every row selected by a boolean mask.
+    Returns:
+        list: Per-row errors, one per selected row
+    """
+    return [row_error(index, column, message) for index in df.index[mask]]
+
+
+def duplicate_row_errors(df, columns, message):
+    """
+    Report rows whose values in the given columns already appeared
+    earlier in the sheet.
+    Returns:
+        list: Per-row errors, one per repeated row
+    """
+    return mask_errors(df, df.duplicated(columns).values, None, message)
+
+
+def blank_to_none(series):
+    """
+    Replace empty cells with None so optional fields are stored as null
+    instead of NaN.
+    """
+    return series.astype(object).where(series.notnull(), None)
+
+
+def text_or_none(series):
+    """
+    Convert an optional text column for storage. Empty cells become None
+    and whole numbers read as floats (e.g. room "101" read as 101.0) lose
+    the trailing ".0".
+    """
+    def to_text(value):
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value)
+
+    return blank_to_none(series).map(lambda value: None if value is None else to_text(value))
+
+
+def get_batch_size(batch_size=None):
+    """
+    Batch size for bulk inserts, falling back to BULK_IMPORT_BATCH_SIZE.
+    """
+    if batch_size:
+        return batch_size
+
+    return getattr(settings, "BULK_IMPORT_BATCH_SIZE", 500)
+
+
+def bulk_insert(model, objects, batch_size=None):
+    """
+    Insert all objects in a single transaction.
+    Args:
+        model: Model class to insert
+        objects: Unsaved model instances
+        batch_size: Rows per INSERT statement (default BULK_IMPORT_BATCH_SIZE)
+    Returns:
+        list: Created objects
+    """
+    with transaction.atomic():
+        response_cache.invalidate()
+        return model.objects.bulk_create(objects, batch_size=get_batch_size(batch_size))
+
+
+def stream_import(
+    file, expected_columns, validate, build, model, batch_size=None, quote_columns=False
+):
+    """
+    Validate and insert an upload in batches of batch_size rows inside a
+    single transaction, so the rows held in memory are bounded by the batch
+    size rather than the file size. The exception is duplicate detection,
+    which keeps a hash of every row read so far: that set grows with the
+    file, O(rows) at under 100 bytes a row. Once a batch fails nothing more is inserted, but the
+    remaining batches are still validated so every error is reported, and
+    the transaction is rolled back.
+    Args:
+        file: Uploaded .xlsx or .csv file
+        expected_columns: Columns that must be present
+        validate: Function returning per-row errors for a batch
+        build: Function returning unsaved model instances for a valid batch
+        model: Model class to insert
+    Returns:
+        tuple: (number of rows created, error_response)
+    """
+    batch_size = get_batch_size(batch_size)
+    errors = []
+    created = 0
+    seen = set()
+
+    with transaction.atomic():
+        try:
+            for chunk in read_chunks(file, batch_size):
+                chunk, error = clean_columns(chunk, expected_columns, quote_columns)
+                if error:
+                    transaction.set_rollback(True)
+                    return 0, error
+
+                # drop rows repeated from earlier batches, seen holds one
+                # hash per row of the file
+                hashes = pd.util.hash_pandas_object(chunk, index=False)
+                chunk = chunk[~hashes.isin(seen).values]
+                seen.update(hashes)
+
+                errors += validate(chunk)
+                if errors:
+                    continue
+
+                model.objects.bulk_create(build(chunk), batch_size=batch_size)
+                created += len(chunk)
+        except UnreadableFile:
+            transaction.set_rollback(True)
+            return 0, error_report("Error reading file")
+
+        if errors:
+            transaction.set_rollback(True)
+            return 0, error_report(errors[0]["message"], errors)
+
+        response_cache.invalidate()
+
+    return created, None
@@ -0,0 +1,79 @@
+import io
+import tracemalloc
+import pandas as pd
+
+from django.db import IntegrityError
+from django.test import TestCase
+
+from registration.bulk import ingest, pipeline
+from registration.models import Location
+from registration.testing import excel_upload, location_df
+
+
+class PipelineValidation(TestCase):
+    def test_missing_value_errors_report_sheet_rows(self):
+        df = pd.DataFrame({"name": ["a", None, "c", None], "other": [1, 2, None, 4]})
+
+        errors = pipeline.missing_value_errors(df, ["name", "other"], "empty")
+
+        self.assertEqual(
+            sorted((error["row"], error["column"]) for error in errors),
+            [(3, "name"), (4, "other"), (5, "name")],
+        )
+
+    def test_invalid_value_errors_ignore_empty_cells(self):
+        df = pd.DataFrame({"session": [1, 4, None, 3, 0]})
+
+        errors = pipeline.invalid_value_errors(df, "session", [1, 2, 3], "bad")
+
+        self.assertEqual([error["row"] for error in errors], [3, 6])
+
+    def test_clean_columns_rejects_duplicates(self):
+        df = pd.DataFrame({"name": ["a"], "Name.1": ["b"]})
+
+        df, error = pipeline.clean_columns(df, ["name"])
+
+        self.assertIsNone(df)
+        self.assertEqual(error["message"], "Duplicate column names")
+
+    def test_clean_columns_reports_missing_column(self):
+        df = pd.DataFrame({"name": ["a"]})
+
+        df, error = pipeline.clean_columns(df, ["name", "session"])
+
+        self.assertEqual(error["message"], "Missing column session")
+
+
+class StreamingIngest(TestCase):
+    def test_chunks_keep_sheet_rows(self):
+        chunks = list(ingest.iter_chunks(excel_upload(location_df(25)), 10))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [10, 10, 5])
+        self.assertEqual(list(chunks[2].index), list(range(20, 25)))
+
+    def test_import_errors_are_not_read_errors(self):
+        def build(chunk):
+            raise IntegrityError("duplicate key")
+
+        with self.assertRaises(IntegrityError):
+            pipeline.stream_import(
+                excel_upload(location_df(5)), ["building"], lambda chunk: [], build, Location
+            )
+
+    def test_streaming_peak_memory(self):
+        content = excel_upload(location_df(20000)).read()
+
+        def peak(read):
+            tracemalloc.start()
+            try:
+                read(io.BytesIO(content))
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        def stream(file):
+            for chunk in ingest.iter_excel_chunks(file, 500):
+                pass
+
+        # streaming only ever holds one batch of rows
+        self.assertLess(peak(stream) * 2, peak(pd.read_excel))
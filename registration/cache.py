@@ -0,0 +1,129 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from monitoring import metrics
+
+DEFAULT_TIMEOUT = 60
+
+
+def response_cache():
+    return caches["responses"]
+
+
+def timeout(name):
+    return getattr(settings, "RESPONSE_CACHE_TIMEOUTS", {}).get(name, DEFAULT_TIMEOUT)
+
+
+def cached(name, key, build):
+    """
+    JSON body of a read endpoint from the response cache, built and stored
+    for RESPONSE_CACHE_TIMEOUTS[name] seconds on a miss.
+    Args:
+        name: Endpoint, for the timeout and the cache metrics
+        key: Cache key of this particular response
+        build: Returns the body, may raise Http404 (not cached)
+    """
+    cache = response_cache()
+    body = cache.get(key)
+    metrics.record_cache(name, body is not None)
+
+    if body is None:
+        body = build()
+        cache.set(key, body, timeout(name))
+
+    return body
+
+
+async def acached(name, key, build):
+    """
+    cached() for async views, build is a coroutine function.
+    """
+    cache = response_cache()
+
+    # locmem never blocks, skip the thread the default aget()/aset() go through
+    if isinstance(cache, LocMemCache):
+        body = cache.get(key)
+    else:
+        body = await cache.aget(key)
+    metrics.record_cache(name, body is not None)
+
+    if body is None:
+        body = await build()
+        if isinstance(cache, LocMemCache):
+            cache.set(key, body, timeout(name))
+        else:
+            await cache.aset(key, body, timeout(name))
+
+    return body
+
+
+def invalidate():
+    """
+    Drop every cached response once the current transaction commits.
+    Event data changes rarely (admin edits and uploads), so clearing all of
+    it is simpler than tracking which responses a change touches.
+    Registrations don't invalidate, seat counts in the catalog are only as
+    old as its (short) timeout.
+    """
+    transaction.on_commit(response_cache().clear)
+
+
+def version(name):
+    """
+    Token that changes whenever the response cache is invalidated (the key
+    goes with the clear), for data a process builds from the database and
+    keeps in memory, like the school search index.
+    Args:
+        name: What the version is for
+    """
+    cache = response_cache()
+    key = f"version:{name}"
+
+    token = cache.get(key)
+    if token is None:
+        token = uuid.uuid4().hex
+        # another process may have set it first
+        if not cache.add(key, token, None):
+            token = cache.get(key) or token
+
+    return token
+
+
+def invalidate_on_change(sender, **kwargs):
+    invalidate()
+
+
+def connect_signals():
+    """
+    Invalidate when a cached model is saved or deleted. bulk_create and
+    queryset updates don't send signals, the bulk import paths call
+    invalidate() themselves.
+    """
+    from fact_admin.models import AgendaItem, Notification, RegistrationFlag
+    from registration.models import (
+        Facilitator,
+        FacilitatorAssistant,
+        FacilitatorWorkshop,
+        Location,
+        School,
+        Workshop,
+    )
+
+    for model in [
+        AgendaItem,
+        Facilitator,
+        FacilitatorAssistant,
+        FacilitatorWorkshop,
+        Location,
+        Notification,
+        RegistrationFlag,
+        School,
+        Workshop,
+    ]:
+        post_save.connect(invalidate_on_change, sender=model, dispatch_uid=f"cache.{model.__name__}")
+        post_delete.connect(invalidate_on_change, sender=model, dispatch_uid=f"cache.{model.__name__}")
@@ -1,16 +1,39 @@
+import datetime
+import importlib
+import io
+import json
+import os
+from unittest import mock
+
+from django.apps import apps as django_apps
+from django.contrib.auth.hashers import check_password, make_password
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import Count
 from django.forms import model_to_dict
-from django.test import Client, TestCase
+from django.test import Client, RequestFactory, TestCase, override_settings
 from django.contrib.auth.models import User
 from django.urls import reverse
+from django.utils import timezone
 
+from fact_registration_backend import ratelimit
+from registration import events, passwords
 from registration.models import (
     Delegate,
     Location,
     NewSchool,
+    PasswordReset,
     Registration,
+    RegistrationEvent,
+    RegistrationMinute,
     School,
+    UpdateReport,
     Workshop,
+    WorkshopSeats,
 )
+from registration.reports import delegate_report
+from registration.testing import seed_small_event
 
 
 class DelegatesPOST(TestCase):
@@ -282,3 +305,332 @@ class UsersLogoutPOST(TestCase):
 
     def test_logout(self):
         pass
+
+
+class PasswordHashing(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(
+            username="hash@example.com",
+            email="hash@example.com",
+            password=make_password("Hashing-Pool-1"),
+        )
+        self.client = Client()
+
+    def tearDown(self):
+        passwords.reset_pool()
+
+    @override_settings(PASSWORD_HASHING_WORKERS=1, PASSWORD_HASHING_MAX_PENDING=2)
+    def test_pool_hashes_in_another_process(self):
+        pool = passwords.get_pool()
+
+        self.assertNotEqual(pool.run(os.getpid), os.getpid())
+        self.assertTrue(check_password("Hashing-Pool-1", make_password("Hashing-Pool-1")))
+
+    @override_settings(PASSWORD_HASHING_MAX_PENDING=1)
+    def test_saturated_pool_answers_503(self):
+        # hold the only slot, as a hash still running would
+        passwords.get_pool().slots.acquire()
+
+        response = self.client.post(
+            reverse("registration:delegates_login"),
+            json.dumps({"email": "hash@example.com", "password": "Hashing-Pool-1"}),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "2")
+
+    @override_settings(PASSWORD_HASHING_MAX_PENDING=1)
+    def test_saturated_pool_keeps_reset_token(self):
+        PasswordReset.objects.create(
+            email="hash@example.com",
+            token="reset-token",
+            expiration=timezone.now() + datetime.timedelta(minutes=15),
+        )
+        passwords.get_pool().slots.acquire()
+
+        response = self.client.post(
+            reverse("registration:reset_password"),
+            json.dumps({"token": "reset-token", "password": "Hashing-Pool-2"}),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 503)
+        self.assertTrue(PasswordReset.objects.filter(token="reset-token").exists())
+
+    def test_unknown_token_is_not_hashed(self):
+        with mock.patch.object(passwords.HashingPool, "run") as run:
+            response = self.client.post(
+                reverse("registration:reset_password"),
+                json.dumps({"token": "made-up", "password": "Hashing-Pool-2"}),
+                content_type="application/json",
+            )
+
+        self.assertEqual(response.status_code, 409)
+        run.assert_not_called()
+
+
+@override_settings(
+    RATE_LIMITING=True,
+    RATE_LIMITS={"login": {"ip": (5, 300), "account": (3, 300)}},
+)
+class RateLimit(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def post(self, name, data, **extra):
+        return self.client.post(
+            reverse(name), json.dumps(data), content_type="application/json", **extra
+        )
+
+    def test_ip_limit_spans_accounts(self):
+        for i in range(5):
+            response = self.post(
+                "registration:delegates_login",
+                {"email": f"user{i}@example.com", "password": "wrong"},
+            )
+            self.assertEqual(response.status_code, 400)
+
+        response = self.post(
+            "registration:delegates_login", {"email": "user9@example.com", "password": "wrong"}
+        )
+        self.assertEqual(response.status_code, 429)
+
+        # another client is not affected
+        response = self.post(
+            "registration:delegates_login",
+            {"email": "user9@example.com", "password": "wrong"},
+            REMOTE_ADDR="10.0.0.2",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(RATE_LIMIT_PROXY_COUNT=1)
+    def test_client_ip_behind_proxy(self):
+        request = RequestFactory().post(
+            "/", HTTP_X_FORWARDED_FOR="1.2.3.4, 10.0.0.9", REMOTE_ADDR="10.0.0.1"
+        )
+
+        self.assertEqual(ratelimit.client_ip(request), "10.0.0.9")
+
+    def test_window_slides(self):
+        # 4 hits late in one window still count early in the next
+        for _ in range(4):
+            self.assertEqual(ratelimit.hit("slide", 4, 100, now=190), 0)
+
+        self.assertEqual(ratelimit.hit("slide", 4, 100, now=205), 0)
+        wait = ratelimit.hit("slide", 4, 100, now=206)
+        self.assertEqual(wait, 20)
+        self.assertGreater(ratelimit.hit("slide", 4, 100, now=206 + wait - 1), 0)
+        self.assertEqual(ratelimit.hit("slide", 4, 100, now=206 + wait), 0)
+
+
+@mock.patch.dict(os.environ, {"EMAIL_HOST_USER": "fact@example.com"})
+class SendUpdate(TestCase):
+    def setUp(self):
+        seed_small_event()
+
+    def send(self, *args):
+        call_command("sendupdate", *args, stdout=io.StringIO())
+
+    def attachment(self):
+        import pandas
+
+        name, content, mimetype = mail.outbox[-1].attachments[0]
+        return pandas.read_excel(io.BytesIO(content)).fillna("")
+
+    def test_full_report(self):
+        with self.assertNumQueries(2):
+            report = delegate_report()
+
+        self.assertEqual(len(report), Delegate.objects.count())
+
+        delegate = Delegate.objects.select_related("user", "school").order_by("id").first()
+        row = report.iloc[0]
+        self.assertEqual(row["email"], delegate.user.email)
+        self.assertEqual(row["school"], delegate.school.name)
+        for registration in Registration.objects.filter(delegate=delegate).select_related(
+            "workshop"
+        ):
+            self.assertEqual(
+                row[f"session_{registration.workshop.session}"], registration.workshop.title
+            )
+
+        self.send()
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(len(self.attachment()), Delegate.objects.count())
+        self.assertIsNone(UpdateReport.objects.get().since)
+
+    def test_changed_sends_only_the_delta(self):
+        self.send("--changed")
+        self.assertEqual(len(mail.outbox), 1)
+
+        delegate = Delegate.objects.order_by("id").last()
+        delegate.pronouns = "they/them"
+        delegate.save()
+
+        self.send("--changed")
+        self.assertEqual(len(mail.outbox), 2)
+        changes = self.attachment()
+        self.assertEqual(list(changes["email"]), [delegate.user.email])
+        self.assertEqual(changes.iloc[0]["pronouns"], "they/them")
+
+        # nothing changed since, nothing sent
+        self.send("--changed")
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(UpdateReport.objects.count(), 2)
+
+    def test_since(self):
+        self.send("--since", (timezone.now() + datetime.timedelta(days=1)).isoformat())
+        self.assertEqual(len(mail.outbox), 0)
+
+        self.send("--since", "2000-01-01")
+        self.assertEqual(len(self.attachment()), Delegate.objects.count())
+
+
+class RegistrationEvents(TestCase):
+    def setUp(self):
+        seed_small_event()
+        self.delegate = Delegate.objects.select_related("user").order_by("id").first()
+        self.user = self.delegate.user
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def seats(self):
+        return {
+            seats.workshop_id: seats.registered
+            for seats in WorkshopSeats.objects.all()
+            if seats.registered
+        }
+
+    def registered(self):
+        return {
+            workshop.pk: workshop.taken
+            for workshop in Workshop.objects.annotate(taken=Count("registration"))
+            if workshop.taken
+        }
+
+    def test_seed_is_logged(self):
+        self.assertEqual(RegistrationEvent.objects.count(), Registration.objects.count())
+        self.assertEqual(self.seats(), self.registered())
+
+    def test_swap(self):
+        current = {
+            registration.workshop.session: registration.workshop
+            for registration in Registration.objects.filter(delegate=self.delegate)
+        }
+        other = Workshop.objects.filter(session=2).exclude(pk=current[2].pk).first()
+
+        response = self.client.put(
+            reverse("registration:delegates_me"),
+            json.dumps(
+                {
+                    "workshop_1_id": str(current[1].pk),
+                    "workshop_2_id": str(other.pk),
+                    "workshop_3_id": str(current[3].pk),
+                }
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+
+        # only the changed session is logged
+        event = RegistrationEvent.objects.order_by("-id").first()
+        self.assertEqual(event.kind, RegistrationEvent.SWAP)
+        self.assertEqual(
+            (event.workshop, event.from_workshop, event.session, event.actor),
+            (other, current[2], 2, self.user),
+        )
+        self.assertEqual(
+            RegistrationEvent.objects.count(), Registration.objects.count() + 1
+        )
+        self.assertEqual(self.seats(), self.registered())
+        minute = event.created_at.replace(second=0, microsecond=0)
+        self.assertEqual(RegistrationMinute.objects.get(minute=minute).swapped, 1)
+
+    def test_deleting_the_account_unregisters(self):
+        self.client.delete(reverse("registration:delegates_me"))
+
+        self.assertEqual(
+            RegistrationEvent.objects.filter(kind=RegistrationEvent.UNREGISTER).count(), 3
+        )
+        self.assertEqual(self.seats(), self.registered())
+
+        # the log still says who dropped what
+        self.assertEqual(
+            set(
+                RegistrationEvent.objects.filter(
+                    kind=RegistrationEvent.UNREGISTER
+                ).values_list("delegate", "delegate_email", "actor", "actor_username")
+            ),
+            {(None, self.user.email, None, self.user.username)},
+        )
+
+    def test_deleting_the_user_unregisters(self):
+        self.user.delete()
+
+        events = RegistrationEvent.objects.filter(kind=RegistrationEvent.UNREGISTER)
+        self.assertEqual(events.count(), 3)
+        self.assertEqual(set(events.values_list("delegate_email", flat=True)), {self.user.email})
+        self.assertEqual(self.seats(), self.registered())
+
+    def test_deleting_a_workshop_unregisters(self):
+        workshop = Registration.objects.filter(delegate=self.delegate).first().workshop
+        taken = Registration.objects.filter(workshop=workshop).count()
+
+        workshop.delete()
+
+        self.assertEqual(
+            RegistrationEvent.objects.filter(
+                kind=RegistrationEvent.UNREGISTER, session=workshop.session
+            ).count(),
+            taken,
+        )
+        self.assertEqual(self.seats(), self.registered())
+        minute = RegistrationMinute.objects.order_by("-minute").first()
+        self.assertEqual(minute.unregistered, taken)
+
+    def test_migration_snapshots_identities(self):
+        migration = importlib.import_module(
+            "registration.migrations.0023_registrationevent_identity"
+        )
+        RegistrationEvent.objects.update(delegate_email="", actor_username="")
+
+        migration.snapshot_identities(django_apps, None)
+
+        self.assertEqual(
+            set(
+                RegistrationEvent.objects.filter(delegate=self.delegate).values_list(
+                    "delegate_email", flat=True
+                )
+            ),
+            {self.user.email},
+        )
+
+    def test_failed_log_rolls_back_the_change(self):
+        workshops = list(Workshop.objects.filter(session=1)[:1])
+
+        with mock.patch.object(events.SeatCounter, "apply", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                events.set_registrations(self.delegate, workshops)
+
+        self.assertEqual(Registration.objects.filter(delegate=self.delegate).count(), 3)
+
+    def test_replay_rebuilds_the_counters(self):
+        events.set_registrations(self.delegate, [], actor=self.user)
+
+        def histogram():
+            return list(
+                RegistrationMinute.objects.order_by("minute").values_list(
+                    "minute", "registered", "unregistered", "swapped"
+                )
+            )
+
+        expected = (self.seats(), histogram())
+
+        WorkshopSeats.objects.update(registered=0)
+        RegistrationMinute.objects.all().delete()
+        call_command("replayregistrations", stdout=io.StringIO())
+
+        self.assertEqual((self.seats(), histogram()), expected)
@@ -8,8 +8,11 @@ from django.core.mail import send_mail
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from django.utils import timezone
 from django.contrib.auth.password_validation import validate_password
+from django.contrib.auth.hashers import make_password
 
-from registration import serializers
+from monitoring import metrics
+from registration import events, serializers
+from registration.passwords import HashingBusy, busy_response
 from registration.models import (
     Delegate,
     FacilitatorRegistration,
@@ -21,10 +24,8 @@ from registration.models import (
     Workshop,
 )
 
-import environ
-
-env = environ.Env()
-environ.Env.read_env()
+from fact_registration_backend.environment import env
+from fact_registration_backend.ratelimit import rate_limit
 
 
 def delegate_me(request):
@@ -97,12 +98,13 @@ def delegate_me(request):
 
             try:
                 validate_password(new_password)
-                user.set_password(new_password)
             except:
                 return JsonResponse(
                     {"message": "Password is not strong enough"}, status=400
                 )
 
+            user.set_password(new_password)
+
         if pronouns and len(pronouns) > 0:
             user.delegate.pronouns = pronouns
 
@@ -148,21 +150,18 @@ def delegate_me(request):
                 )
 
                 if registrations >= workshop.location.capacity:
+                    metrics.record_workshop_full(workshop)
                     return JsonResponse(
                         {"message": f"{workshop.title} is full"}, status=409
                     )
 
         if len(sessions) == 3:
-            # clear registered workshops
-            Registration.objects.filter(delegate=user.delegate).delete()
-
-            # re register
-            for workshop_id in workshop_ids:
-                workshop = Workshop.objects.get(pk=workshop_id)
-
-                registration = Registration(delegate=user.delegate, workshop=workshop)
-
-                registration.save()
+            # re register, logging the changed sessions
+            events.set_registrations(
+                user.delegate,
+                [Workshop.objects.get(pk=workshop_id) for workshop_id in workshop_ids],
+                actor=user,
+            )
 
         user.save()
         user.delegate.save()
@@ -176,6 +175,9 @@ def delegate_me(request):
 
         data = serializers.serialize_user(user)
 
+        if hasattr(user, "delegate"):
+            events.set_registrations(user.delegate, [], actor=user)
+
         user.delete()
         user.save()
 
@@ -238,6 +240,7 @@ def delegates(request):
             )
 
             if registrations >= workshop.location.capacity:
+                metrics.record_workshop_full(workshop)
                 return JsonResponse(
                     {"message": f"{workshop.title} is full"}, status=409
                 )
@@ -250,17 +253,13 @@ def delegates(request):
 
         delegate = user.delegate
 
-        workshop_details = {}
+        workshops = [Workshop.objects.get(pk=workshop_id) for workshop_id in workshop_ids]
 
         # set registration data
-        for workshop_id in workshop_ids:
-            workshop = Workshop.objects.get(pk=workshop_id)
-
-            registration = Registration(delegate=delegate, workshop=workshop)
-            registration.save()
+        events.set_registrations(delegate, workshops, actor=user)
 
-            # save workshop names for email
-            workshop_details[workshop.session] = workshop.title
+        # save workshop names for email
+        workshop_details = {workshop.session: workshop.title for workshop in workshops}
 
         # login
         login(request, user)
@@ -362,6 +361,7 @@ def create_delegate(request):
     else:
         return JsonResponse({"message": "Method not allowed"}, status=405)
 
+@rate_limit("login")
 def login_delegate(request):
     """
     POST: Authenticate delegate
@@ -409,6 +409,7 @@ def logout_user(request):
         return JsonResponse({"message": "Method not allowed"}, status=405)
 
 
+@rate_limit("password_reset")
 def request_password_reset(request):
     """
     POST: Request password reset token
@@ -463,6 +464,7 @@ def request_password_reset(request):
         return JsonResponse({"message": "Method not allowed"}, status=405)
 
 
+@rate_limit("password_reset", field="token")
 def reset_password(request):
     """
     POST: Reset password using token
@@ -486,17 +488,22 @@ def reset_password(request):
 
         PasswordReset.objects.filter(expiration__lt=timezone.now()).delete()
 
-        try:
-            reset = PasswordReset.objects.get(token=token)
-            email = reset.email
-            reset.delete()
+        reset = PasswordReset.objects.filter(token=token).first()
+        user = User.objects.filter(email=reset.email).first() if reset else None
 
-            user = User.objects.get(email=email)
-            user.set_password(password)
-            user.save()
-        except:
+        if user is None:
             return JsonResponse({"message": "Invalid reset token"}, status=409)
 
+        # hash last, only for a valid token, and keep the token when the
+        # hashing pool is busy so the reset can be retried
+        try:
+            user.password = make_password(password)
+        except HashingBusy:
+            return busy_response()
+
+        reset.delete()
+        user.save()
+
         return JsonResponse({"message": "success"})
     else:
         return JsonResponse({"message": "Method not allowed"}, status=405)
@@ -0,0 +1,254 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.signals import pre_delete
+from django.utils import timezone
+
+from registration.facilitator.dashboard import DashboardInvalidator
+from registration.models import (
+    Delegate,
+    Registration,
+    RegistrationEvent,
+    RegistrationMinute,
+    Workshop,
+    WorkshopSeats,
+)
+
+BATCH_SIZE = 2000
+
+
+class SeatCounter:
+    """
+    WorkshopSeats, +1 for the workshop registered for, -1 for the one left.
+    """
+
+    def apply(self, events):
+        deltas = Counter()
+        for event in events:
+            if event.kind == RegistrationEvent.UNREGISTER:
+                deltas[event.workshop_id] -= 1
+            else:
+                deltas[event.workshop_id] += 1
+            if event.kind == RegistrationEvent.SWAP:
+                deltas[event.from_workshop_id] -= 1
+
+        # deleted workshops have no counter
+        deltas.pop(None, None)
+        add(WorkshopSeats, "workshop_id", deltas, "registered")
+
+    def reset(self):
+        WorkshopSeats.objects.all().delete()
+
+
+class MinuteHistogram:
+    """
+    RegistrationMinute, events counted by kind per minute.
+    """
+
+    columns = {
+        RegistrationEvent.REGISTER: "registered",
+        RegistrationEvent.UNREGISTER: "unregistered",
+        RegistrationEvent.SWAP: "swapped",
+    }
+
+    def apply(self, events):
+        for kind, column in self.columns.items():
+            deltas = Counter(
+                event.created_at.replace(second=0, microsecond=0)
+                for event in events
+                if event.kind == kind
+            )
+            add(RegistrationMinute, "minute", deltas, column)
+
+    def reset(self):
+        RegistrationMinute.objects.all().delete()
+
+
+CONSUMERS = [SeatCounter(), MinuteHistogram(), DashboardInvalidator()]
+
+
+def add(model, key, deltas, column):
+    """
+    Add deltas ({key value: delta}) to a counter column in one UPDATE,
+    creating missing rows first. F() keeps concurrent writers from losing
+    counts.
+    """
+    deltas = {value: delta for value, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    model.objects.bulk_create(
+        [model(**{key: value}) for value in deltas], ignore_conflicts=True
+    )
+    model.objects.filter(**{f"{key}__in": list(deltas)}).update(
+        **{
+            column: F(column)
+            + Case(
+                *[When(**{key: value}, then=Value(delta)) for value, delta in deltas.items()],
+                default=Value(0),
+            )
+        }
+    )
+
+
+def changes(delegate, actor, before, after, now=None):
+    """
+    Events turning one set of registrations into another.
+    Args:
+        delegate: Delegate
+        actor: User making the change, None for scripts
+        before, after: {session: workshop id}
+    Returns:
+        list: Unsaved RegistrationEvents, one per changed session
+    """
+    now = now or timezone.now()
+    events = []
+
+    for session in sorted(set(before) | set(after)):
+        old, new = before.get(session), after.get(session)
+        if old == new:
+            continue
+
+        if old is None:
+            kind = RegistrationEvent.REGISTER
+        elif new is None:
+            kind = RegistrationEvent.UNREGISTER
+        else:
+            kind = RegistrationEvent.SWAP
+
+        events.append(
+            RegistrationEvent(
+                kind=kind,
+                delegate=delegate,
+                actor=actor,
+                workshop_id=old if new is None else new,
+                from_workshop_id=old if kind == RegistrationEvent.SWAP else None,
+                session=session,
+                created_at=now,
+            )
+        )
+
+    return events
+
+
+def log(events):
+    """
+    Append events and update every consumer, in the caller's transaction.
+    The delegate's email and the actor's username are copied onto each
+    event, so the log still says who changed what once they are deleted.
+    """
+    for event in events:
+        if event.delegate_id and not event.delegate_email:
+            event.delegate_email = event.delegate.user.email
+        if event.actor_id and not event.actor_username:
+            event.actor_username = event.actor.username
+
+    with transaction.atomic():
+        RegistrationEvent.objects.bulk_create(events, batch_size=BATCH_SIZE)
+        for consumer in CONSUMERS:
+            consumer.apply(events)
+
+
+def set_registrations(delegate, workshops, actor=None):
+    """
+    Replace a delegate's registrations and log what changed, atomically.
+    Args:
+        delegate: Delegate
+        workshops: Workshops to be registered for, at most one per session
+        actor: User making the change
+    """
+    with transaction.atomic():
+        # concurrent changes for the same delegate would both read the same
+        # before and log the same registration twice
+        Delegate.objects.select_for_update().get(pk=delegate.pk)
+
+        before = dict(
+            Registration.objects.filter(delegate=delegate).values_list(
+                "workshop__session", "workshop_id"
+            )
+        )
+        after = {workshop.session: workshop.pk for workshop in workshops}
+
+        Registration.objects.filter(delegate=delegate).delete()
+        Registration.objects.bulk_create(
+            [Registration(delegate=delegate, workshop=workshop) for workshop in workshops]
+        )
+
+        log(changes(delegate, actor, before, after))
+
+        # registrations count as a change for sendupdate --changed
+        delegate.save(update_fields=["date_modified"])
+
+
+def unregister_on_delete(sender, instance, **kwargs):
+    """
+    Log the registrations a deleted workshop or delegate takes with it
+    (they cascade away without going through set_registrations). The
+    events can't point at the row being deleted, the delegate's email is
+    kept instead.
+    """
+    if sender is Workshop:
+        registrations = Registration.objects.filter(workshop=instance)
+    else:
+        registrations = Registration.objects.filter(delegate=instance)
+
+    now = timezone.now()
+    events = [
+        RegistrationEvent(
+            kind=RegistrationEvent.UNREGISTER,
+            delegate_id=None if sender is Delegate else delegate_id,
+            delegate_email=email,
+            workshop_id=None if sender is Workshop else workshop_id,
+            session=session,
+            created_at=now,
+        )
+        for delegate_id, email, workshop_id, session in registrations.values_list(
+            "delegate_id", "delegate__user__email", "workshop_id", "workshop__session"
+        )
+    ]
+
+    if events:
+        log(events)
+
+
+def connect_signals():
+    """
+    Log unregistrations when a workshop or a delegate (or its user) is
+    deleted, however it is deleted.
+    """
+    for model in [Delegate, Workshop]:
+        pre_delete.connect(
+            unregister_on_delete, sender=model, dispatch_uid=f"events.{model.__name__}"
+        )
+
+
+def replay():
+    """
+    Rebuild every consumer from the whole log.
+    Returns:
+        int: Events replayed
+    """
+    count = 0
+
+    with transaction.atomic():
+        for consumer in CONSUMERS:
+            consumer.reset()
+
+        batch = []
+        for event in RegistrationEvent.objects.order_by("id").iterator(
+            chunk_size=BATCH_SIZE
+        ):
+            batch.append(event)
+            if len(batch) == BATCH_SIZE:
+                count += apply_all(batch)
+                batch = []
+        count += apply_all(batch)
+
+    return count
+
+
+def apply_all(events):
+    for consumer in CONSUMERS:
+        consumer.apply(events)
+    return len(events)
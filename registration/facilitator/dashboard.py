@@ -0,0 +1,113 @@
+import json
+
+from django.core import serializers as django_serializers
+from django.db import transaction
+
+from registration import cache as response_cache
+from registration import serializers
+from registration.models import (
+    FacilitatorMember,
+    FacilitatorRegistration,
+    FacilitatorWorkshop,
+    Workshop,
+)
+
+
+def cache_key(facilitator_id):
+    return f"facilitator_dashboard:{facilitator_id}"
+
+
+def build_dashboard(facilitator):
+    """
+    Everything the facilitator portal shows, in five queries: the
+    facilitator's workshops with their location, registration count,
+    facilitators and assistants, and the workshops each member is
+    registered for.
+    Returns:
+        dict: Dashboard
+    """
+    workshops = serializers.serialize_workshops(
+        Workshop.objects.filter(facilitatorworkshop__facilitator=facilitator)
+        .distinct()
+        .order_by("session", "pk"),
+        include_fas=True,
+    )
+
+    registrations = {}
+    for registration in FacilitatorRegistration.objects.filter(
+        member__facilitator=facilitator
+    ).order_by("workshop__session"):
+        registrations.setdefault(registration.member_id, []).append(
+            registration.workshop_id
+        )
+
+    return {
+        "facilitator": json.loads(django_serializers.serialize("json", [facilitator])),
+        "workshops": list(workshops.values()),
+        "members": [
+            {
+                "id": member.pk,
+                "name": member.name,
+                "workshops": registrations.get(member.pk, []),
+            }
+            for member in FacilitatorMember.objects.filter(facilitator=facilitator).order_by(
+                "pk"
+            )
+        ],
+    }
+
+
+def cached_dashboard(facilitator):
+    """
+    JSON body of the dashboard from the response cache. Cleared for the
+    facilitators of a workshop and of a member when registrations change,
+    see invalidate_workshops, and with the rest of the response cache when
+    event data changes.
+    """
+    return response_cache.cached(
+        "facilitator_dashboard",
+        cache_key(facilitator.pk),
+        lambda: json.dumps(build_dashboard(facilitator)),
+    )
+
+
+def invalidate_workshops(workshop_ids, facilitator_ids=()):
+    """
+    Drop the cached dashboards of the facilitators of these workshops, and
+    of facilitator_ids, once the current transaction commits.
+    Args:
+        workshop_ids: Workshops whose registrations changed
+        facilitator_ids: Facilitators whose members' registrations changed,
+            their dashboards list them whatever workshop they picked
+    """
+    workshop_ids = [pk for pk in set(workshop_ids) if pk is not None]
+    facilitator_ids = {pk for pk in facilitator_ids if pk is not None}
+
+    if workshop_ids:
+        facilitator_ids.update(
+            FacilitatorWorkshop.objects.filter(workshop_id__in=workshop_ids)
+            .values_list("facilitator_id", flat=True)
+            .distinct()
+        )
+
+    keys = [cache_key(facilitator_id) for facilitator_id in sorted(facilitator_ids)]
+    if keys:
+        transaction.on_commit(lambda: response_cache.response_cache().delete_many(keys))
+
+
+class DashboardInvalidator:
+    """
+    Registration log consumer clearing the dashboards of the workshops
+    registered for or left. The log only has delegate registrations, member
+    registrations are cleared by register_facilitator.
+    """
+
+    def apply(self, events):
+        invalidate_workshops(
+            [event.workshop_id for event in events]
+            + [event.from_workshop_id for event in events]
+        )
+
+    def reset(self):
+        # replaying the log doesn't change registrations
+        pass
@@ -0,0 +1,70 @@
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from django.db.models.signals import post_save
+
+from registration.models import Facilitator, FacilitatorMember
+
+
+def split_names(value):
+    """
+    Names in Facilitator.facilitators, a comma separated string (as read
+    from the workshop sheet) or a list of them, in order without duplicates.
+    """
+    values = value if isinstance(value, list) else [value or ""]
+    names = [name.strip() for value in values for name in str(value).split(",")]
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def sync_members(facilitators):
+    """
+    Create a FacilitatorMember for every name in each facilitator's
+    facilitators and delete the members no longer named, unless they are
+    registered for a workshop.
+    Args:
+        facilitators: Saved facilitators
+    """
+    facilitators = list(facilitators)
+    if not facilitators:
+        return
+
+    # a list, members are created in the order they are named
+    wanted = [
+        (facilitator.pk, name)
+        for facilitator in facilitators
+        for name in split_names(facilitator.facilitators)
+    ]
+    existing = set(
+        FacilitatorMember.objects.filter(facilitator__in=facilitators).values_list(
+            "facilitator_id", "name"
+        )
+    )
+
+    FacilitatorMember.objects.bulk_create(
+        [
+            FacilitatorMember(facilitator_id=pk, name=name)
+            for pk, name in wanted
+            if (pk, name) not in existing
+        ],
+        ignore_conflicts=True,
+    )
+
+    stale = existing - set(wanted)
+    if stale:
+        FacilitatorMember.objects.filter(
+            reduce(or_, [Q(facilitator_id=pk, name=name) for pk, name in stale]),
+            facilitatorregistration__isnull=True,
+        ).delete()
+
+
+def sync_on_save(sender, instance, **kwargs):
+    sync_members([instance])
+
+
+def connect_signals():
+    """
+    Sync members when a facilitator is saved. bulk_create doesn't send
+    signals, provision_facilitators calls sync_members itself.
+    """
+    post_save.connect(sync_on_save, sender=Facilitator, dispatch_uid="members.Facilitator")
@@ -1,12 +1,24 @@
+import importlib
 import json
+from unittest import mock
 
+from django.apps import apps as django_apps
 from django.test import Client, TestCase
 from django.urls import reverse
 from django.contrib.auth.models import User
 
+from registration import cache as response_cache
+from registration import events, passwords, serializers
+from registration.facilitator import dashboard, members
+from registration.models import Delegate
 from registration.models import Facilitator
+from registration.models import FacilitatorMember
+from registration.models import FacilitatorRegistration
 from registration.models import FacilitatorWorkshop
+from registration.models import Location
+from registration.models import Registration
 from registration.models import Workshop
+from registration.testing import seed_small_event
 
 
 class FacilitatorAPITestCase(TestCase):
@@ -236,3 +248,278 @@ class FacilitatorAPITestCase(TestCase):
         response = self.client.get(self.register_url)
         self.assertEqual(response.status_code, 405)
         self.assertIn("method not allowed", response.json().get("message", ""))
+
+
+class FacilitatorMembers(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="chem")
+        self.facilitator = Facilitator.objects.create(
+            user=self.user, department_name="Chemistry", facilitators="Ada, Grace ,ada"
+        )
+        location = Location.objects.create(building="quad", capacity=10, session=1)
+        self.workshop = Workshop.objects.create(
+            title="Labs", description="d", session=1, location=location
+        )
+        self.client = Client()
+
+    def names(self):
+        return set(self.facilitator.members.values_list("name", flat=True))
+
+    def test_split_names(self):
+        self.assertEqual(members.split_names("a, b,,a "), ["a", "b"])
+        self.assertEqual(members.split_names(["a, b", "c"]), ["a", "b", "c"])
+        self.assertEqual(members.split_names(None), [])
+
+    def test_synced_on_save(self):
+        self.assertEqual(self.names(), {"Ada", "Grace", "ada"})
+
+        FacilitatorRegistration.objects.create(
+            member=self.facilitator.members.get(name="Grace"),
+            facilitator_name="Grace",
+            workshop=self.workshop,
+        )
+        self.facilitator.facilitators = ["Ada", "Linus"]
+        self.facilitator.save()
+
+        # Grace is registered for a workshop and is kept
+        self.assertEqual(self.names(), {"Ada", "Grace", "Linus"})
+
+    def test_register(self):
+        self.client.force_login(self.user)
+        url = reverse("registration:register_facilitator")
+
+        response = self.client.put(
+            url,
+            json.dumps({"facilitator_name": "Grace", "workshops": [self.workshop.pk]}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        registration = FacilitatorRegistration.objects.get()
+        self.assertEqual(registration.member.name, "Grace")
+
+        # a name the sheet didn't list (a typo) is turned away, not a new member
+        response = self.client.put(
+            url,
+            json.dumps({"facilitator_name": "Linus", "workshops": [self.workshop.pk]}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(FacilitatorMember.objects.filter(name="Linus").exists())
+        self.assertFalse(FacilitatorRegistration.objects.filter(facilitator_name="Linus").exists())
+
+    def test_full_workshop_keeps_previous_registrations(self):
+        self.client.force_login(self.user)
+        url = reverse("registration:register_facilitator")
+        self.client.put(
+            url,
+            json.dumps({"facilitator_name": "Grace", "workshops": [self.workshop.pk]}),
+            content_type="application/json",
+        )
+
+        location = Location.objects.create(building="lab", capacity=0, session=2)
+        full = Workshop.objects.create(
+            title="Full", description="d", session=2, location=location
+        )
+        response = self.client.put(
+            url,
+            json.dumps({"facilitator_name": "Grace", "workshops": [self.workshop.pk, full.pk]}),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(
+            list(FacilitatorRegistration.objects.values_list("workshop_id", flat=True)),
+            [self.workshop.pk],
+        )
+
+    def test_register_scoped_to_the_logged_in_facilitator(self):
+        other = Facilitator.objects.create(
+            user=User.objects.create(username="bio"),
+            department_name="Biology",
+            facilitators="Grace",
+        )
+        self.client.force_login(other.user)
+
+        response = self.client.put(
+            reverse("registration:register_facilitator"),
+            json.dumps({"facilitator_name": "Grace", "workshops": [self.workshop.pk]}),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(FacilitatorRegistration.objects.get().member, other.members.get())
+
+    def test_register_shared_name_without_login(self):
+        Facilitator.objects.create(
+            user=User.objects.create(username="bio"),
+            department_name="Biology",
+            facilitators="Grace",
+        )
+        url = reverse("registration:register_facilitator")
+
+        for _ in range(2):
+            response = self.client.put(
+                url,
+                json.dumps({"facilitator_name": "Grace", "workshops": [self.workshop.pk]}),
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 200)
+
+        # registered by name, as before members, replacing the first time
+        registration = FacilitatorRegistration.objects.get()
+        self.assertIsNone(registration.member)
+        self.assertEqual(registration.facilitator_name, "Grace")
+
+    def test_serialized_registrations(self):
+        other = Facilitator.objects.create(
+            user=User.objects.create(username="bio"),
+            department_name="Biology",
+            facilitators="Grace",
+        )
+        for member in [self.facilitator.members.get(name="Ada"), other.members.get()]:
+            FacilitatorRegistration.objects.create(
+                member=member, facilitator_name=member.name, workshop=self.workshop
+            )
+
+        data = json.loads(serializers.serialize_facilitator(self.facilitator))
+
+        # not the registration of the other department's member
+        self.assertEqual(
+            [registration["fields"]["facilitator_name"] for registration in data["registrations"]],
+            ["Ada"],
+        )
+
+    def test_migration_links_registrations(self):
+        migration = importlib.import_module("registration.migrations.0022_facilitatormember")
+
+        Facilitator.objects.create(
+            user=User.objects.create(username="bio"), department_name="Biology", facilitators="Ada"
+        )
+        FacilitatorMember.objects.all().delete()
+        registration = FacilitatorRegistration.objects.create(
+            facilitator_name=" Grace", workshop=self.workshop
+        )
+        shared = FacilitatorRegistration.objects.create(
+            facilitator_name="Ada", workshop=self.workshop
+        )
+
+        migration.create_members(django_apps, None)
+
+        self.assertEqual(self.names(), {"Ada", "Grace", "ada"})
+        registration.refresh_from_db()
+        self.assertEqual(registration.member.name, "Grace")
+
+        # two facilitators list Ada, so it isn't guessed
+        shared.refresh_from_db()
+        self.assertIsNone(shared.member)
+
+
+class FacilitatorDashboard(TestCase):
+    def setUp(self):
+        response_cache.response_cache().clear()
+        seed_small_event()
+        self.facilitator = Facilitator.objects.select_related("user").order_by("pk").first()
+        self.facilitator.facilitators = "Ada, Grace"
+        self.facilitator.save()
+
+        self.workshop = Workshop.objects.filter(
+            facilitatorworkshop__facilitator=self.facilitator
+        ).first()
+        FacilitatorRegistration.objects.create(
+            member=self.facilitator.members.get(name="Ada"),
+            facilitator_name="Ada",
+            workshop=self.workshop,
+        )
+
+        self.client = Client()
+        self.url = reverse("registration:facilitators_dashboard")
+
+    def test_constant_queries(self):
+        with self.assertNumQueries(5):
+            data = dashboard.build_dashboard(self.facilitator)
+
+        workshop = next(
+            workshop for workshop in data["workshops"]
+            if workshop["workshop"][0]["pk"] == self.workshop.pk
+        )
+        self.assertEqual(
+            workshop["registrations"],
+            Registration.objects.filter(workshop=self.workshop).count() + 1,
+        )
+        self.assertIn("facilitator_assistants", workshop)
+        self.assertEqual(
+            data["members"],
+            [
+                {"id": member.pk, "name": member.name, "workshops": workshops}
+                for member, workshops in zip(
+                    self.facilitator.members.order_by("pk"), [[self.workshop.pk], []]
+                )
+            ],
+        )
+
+    def test_requires_facilitator(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+        self.client.force_login(Delegate.objects.first().user)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_cached_until_registrations_change(self):
+        self.client.force_login(self.facilitator.user)
+
+        def registrations():
+            response = self.client.get(self.url)
+            self.assertEqual(response.status_code, 200)
+            return {
+                workshop["workshop"][0]["pk"]: workshop["registrations"]
+                for workshop in response.json()["workshops"]
+            }
+
+        before = registrations()
+        with self.assertNumQueries(3):
+            # session, user and facilitator only
+            self.assertEqual(registrations(), before)
+
+        delegate = Delegate.objects.exclude(registration__workshop=self.workshop).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            events.set_registrations(delegate, [self.workshop])
+
+        self.assertEqual(registrations()[self.workshop.pk], before[self.workshop.pk] + 1)
+
+    def test_cleared_for_the_members_facilitator(self):
+        self.client.force_login(self.facilitator.user)
+
+        # a workshop of another facilitator
+        other = Workshop.objects.exclude(
+            facilitatorworkshop__facilitator=self.facilitator
+        ).exclude(session=self.workshop.session).first()
+
+        def grace():
+            members = self.client.get(self.url).json()["members"]
+            return next(member for member in members if member["name"] == "Grace")
+
+        self.assertEqual(grace()["workshops"], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(
+                reverse("registration:register_facilitator"),
+                {"facilitator_name": "Grace", "workshops": [other.pk]},
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(grace()["workshops"], [other.pk])
+
+
+class FacilitatorAccountSetUp(TestCase):
+    def test_unknown_token_is_not_hashed(self):
+        with mock.patch.object(passwords.HashingPool, "run") as run:
+            response = self.client.post(
+                reverse("registration:facilitators_set_up"),
+                json.dumps(
+                    {"token": "made-up", "email": "hash@example.com", "password": "Hashing-Pool-2"}
+                ),
+                content_type="application/json",
+            )
+
+        self.assertEqual(response.status_code, 409)
+        run.assert_not_called()
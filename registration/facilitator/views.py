@@ -8,20 +8,29 @@ from django.core import serializers as django_serializers
 from django.contrib.auth.models import User
 from django.core.validators import validate_email
 from django.contrib.auth import login, authenticate
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from django.contrib.auth.password_validation import validate_password
+from django.contrib.auth.hashers import make_password
 
+from monitoring import metrics
 from registration import serializers
+from registration.facilitator import dashboard as facilitator_dashboard
+from registration.passwords import HashingBusy, busy_response
 from registration.models import (
     AccountSetUp,
     Facilitator,
+    FacilitatorMember,
     FacilitatorRegistration,
     FacilitatorWorkshop,
     Workshop,
     Registration
 )
 
+from fact_registration_backend.ratelimit import rate_limit
+
 
 def facilitators(request):
     """
@@ -83,12 +92,13 @@ def facilitators(request):
 
             try:
                 validate_password(new_password)
-                user.set_password(new_password)
             except:
                 return JsonResponse(
                     {"message": "Password is not strong enough"}, status=400
                 )
 
+            user.set_password(new_password)
+
         # update facilitator data
         facilitator = user.facilitator
 
@@ -200,6 +210,28 @@ def me(request):
         return JsonResponse({"message": "Method not allowed"}, 405)
 
 
+def dashboard(request):
+    """
+    GET: Current facilitator's workshops (location, registration count,
+    facilitators and assistants) and the workshops each of their members
+    is registered for, in a fixed number of queries
+    Cached per facilitator until registrations for their workshops change
+    Returns 403 if not authenticated
+    """
+    user = request.user
+
+    if request.method == "GET":
+        if not user.is_authenticated or not hasattr(user, "facilitator"):
+            return JsonResponse({"message": "No facilitator logged in"}, status=403)
+
+        return HttpResponse(
+            facilitator_dashboard.cached_dashboard(user.facilitator),
+            content_type="application/json",
+        )
+    else:
+        return JsonResponse({"message": "Method not allowed"}, status=405)
+
+
 def facilitator_account_set_up(request):
     """
     POST: Complete facilitator account setup
@@ -239,23 +271,29 @@ def facilitator_account_set_up(request):
 
         AccountSetUp.objects.filter(expiration__lt=timezone.now()).delete()
 
-        try:
-            setup = AccountSetUp.objects.get(token=token)
-            username = setup.username
-            setup.delete()
+        setup = AccountSetUp.objects.filter(token=token).first()
+        user = User.objects.filter(username=setup.username).first() if setup else None
 
-            user = User.objects.get(username=username)
-            user.set_password(password)
-            user.email = email
-            user.save()
-        except:
+        if user is None:
             return JsonResponse({"message": "Invalid set up token"}, status=409)
 
+        # hash last, only for a valid token, and keep the token when the
+        # hashing pool is busy so the set up can be retried
+        try:
+            user.password = make_password(password)
+        except HashingBusy:
+            return busy_response()
+
+        setup.delete()
+        user.email = email
+        user.save()
+
         return JsonResponse({"message": "success"})
     else:
         return JsonResponse({"message": "method not allowed"}, status=405)
 
 
+@rate_limit("login", field="username")
 def login_facilitator(request):
     """
     POST: Authenticate facilitator
@@ -298,15 +336,10 @@ def login_facilitator(request):
         return JsonResponse({"message": "Method not allowed"}, status=405)
 
 
-def create_facilitator_account(department_name):
+def facilitator_username(department_name):
     """
-    Create a new facilitator account for a department.
-    Args:
-        department_name: Name of the department
-    Returns:
-        tuple: (username, token) for account setup
+    Username for a department account (first 9 letters of provided name + 4 random numbers).
     """
-    # create username (first 9 letters of provided name + 4 random numbers)
     normalized_string = unicodedata.normalize("NFKD", department_name)
     ascii_string = normalized_string.encode("ascii", "ignore").decode("ascii")
     cleaned_string = re.sub(r"[^a-zA-Z]", "", ascii_string)
@@ -318,32 +351,76 @@ def create_facilitator_account(department_name):
     for i in range(4):
         username += secrets.choice(digits)
 
-    user = User(username=username, first_name=department_name)
-    alphabet = string.ascii_letters + string.digits
-    password = "".join(secrets.choice(alphabet) for i in range(8))
-    user.set_password(password)
-    user.save()
+    return username
 
+
+def build_account_set_up(user):
+    """
+    Unsaved set up token for a saved user, valid for 7 days.
+    """
     token_generator = PasswordResetTokenGenerator()
     token = token_generator.make_token(user)
     expiration = timezone.now() + timezone.timedelta(days=7)
 
-    reset = AccountSetUp(
-        username=username,
+    return AccountSetUp(
+        username=user.username,
         token=token,
         expiration=expiration,
     )
+
+
+def create_facilitator_account(department_name):
+    """
+    Create a new facilitator account for a department.
+    The password is unusable until it is chosen through the set up link.
+    Args:
+        department_name: Name of the department
+    Returns:
+        tuple: (username, token) for account setup
+    """
+    user = User(username=facilitator_username(department_name), first_name=department_name)
+    user.set_unusable_password()
+    user.save()
+
+    reset = build_account_set_up(user)
     reset.save()
 
-    return (user, token, expiration)
+    return (user, reset.token, reset.expiration)
+
+
+def is_facilitator(user):
+    return user.is_authenticated and hasattr(user, "facilitator")
+
+
+def member_for(request, facilitator_name):
+    """
+    The member registering. A logged in facilitator registers one of its
+    own members (None if it has no member by that name, members only come
+    from the facilitators list, see sync_members). Otherwise the name is
+    matched across facilitators, and a name nobody or several facilitators
+    list registers unlinked, by name only, as it always could.
+    Returns:
+        FacilitatorMember or None
+    """
+    if is_facilitator(request.user):
+        return FacilitatorMember.objects.filter(
+            facilitator=request.user.facilitator, name=facilitator_name
+        ).first()
+
+    members = list(FacilitatorMember.objects.filter(name=facilitator_name)[:2])
+    return members[0] if len(members) == 1 else None
 
 
 def register_facilitator(request):
     """
-    PUT: Register new facilitator account
+    PUT: Register a facilitator member for workshops, replacing their
+    previous registrations
     Required fields:
-        - department_name: Department name
-    Returns 400 for invalid data
+        - facilitator_name: Member name, one of the logged in facilitator's
+          when there is one
+        - workshops: List of workshop IDs
+    Returns 400 for invalid data or a name the logged in facilitator doesn't
+    list, 409 if a workshop is full (the previous registrations are kept)
     """
     if request.method == "PUT":
         data = json.loads(request.body)
@@ -356,15 +433,19 @@ def register_facilitator(request):
                 {"message": "Must provide facilitator name and workshop"}, status=400
             )
 
-        # if facilitator_name not in [
-        #     name.strip() for name in facilitator.facilitators.split(",")
-        # ]:
-        #     return JsonResponse(
-        #         {
-        #             "message": f"Could not find facilitator with the name '{facilitator_name}'"
-        #         },
-        #         status=404,
-        #     )
+        facilitator_name = facilitator_name.strip()
+        member = member_for(request, facilitator_name)
+
+        if member is None and is_facilitator(request.user):
+            return JsonResponse(
+                {"message": f"{facilitator_name} is not one of your facilitators"},
+                status=400,
+            )
+
+        # registrations made before members existed are only linked by name
+        own = Q(member=None, facilitator_name=facilitator_name)
+        if member:
+            own |= Q(member=member)
 
         sessions = set()
         for workshop in workshops:
@@ -387,39 +468,47 @@ def register_facilitator(request):
 
                 sessions.add(workshop_obj.session)
 
-        # clear workshops
-        FacilitatorRegistration.objects.filter(
-            facilitator_name=facilitator_name
-        ).delete()
-
         registrations = []
 
-        for workshop in workshops:
-            if workshop:
-                workshop_obj = Workshop.objects.get(pk=int(workshop))
-
-                # workshop cap
-                capacity = (
-                    Registration.objects.filter(workshop_id=workshop)
-                    .count()
-                    + FacilitatorRegistration.objects.filter(
-                        workshop_id=workshop
+        # a full workshop keeps the previous registrations
+        with transaction.atomic():
+            # clear workshops
+            previous = FacilitatorRegistration.objects.filter(own)
+            facilitator_dashboard.invalidate_workshops(
+                list(previous.values_list("workshop_id", flat=True))
+                + [int(workshop) for workshop in workshops if workshop],
+                [member.facilitator_id] if member else [],
+            )
+            previous.delete()
+
+            for workshop in workshops:
+                if workshop:
+                    workshop_obj = Workshop.objects.get(pk=int(workshop))
+
+                    # workshop cap
+                    capacity = (
+                        Registration.objects.filter(workshop_id=workshop)
+                        .count()
+                        + FacilitatorRegistration.objects.filter(
+                            workshop_id=workshop
+                        )
+                        .exclude(own)
+                        .count()
                     )
-                    .exclude(facilitator_name=facilitator_name)
-                    .count()
-                )
 
-                if capacity >= workshop_obj.location.capacity:
-                    return JsonResponse(
-                        {"message": f"{workshop_obj.title} is full"}, status=409
+                    if capacity >= workshop_obj.location.capacity:
+                        transaction.set_rollback(True)
+                        metrics.record_workshop_full(workshop_obj)
+                        return JsonResponse(
+                            {"message": f"{workshop_obj.title} is full"}, status=409
+                        )
+
+                    registration = FacilitatorRegistration(
+                        member=member, facilitator_name=facilitator_name, workshop_id=workshop
                     )
-                
-                registration = FacilitatorRegistration(
-                    facilitator_name=facilitator_name, workshop_id=workshop
-                )
-                registration.save()
+                    registration.save()
 
-                registrations.append(registration)
+                    registrations.append(registration)
 
         data = django_serializers.serialize("json", registrations)
         return HttpResponse(data, content_type="application/json")
@@ -0,0 +1,304 @@
+import math
+
+import numpy as np
+from django.db.models import Count, F
+from django.utils import timezone
+
+from registration.models import Delegate, RegistrationEvent, Workshop
+from registration.popularity import zipf_weights
+
+# smoothing added to every workshop's share, so a workshop nobody picked
+# recently still gets a little of the demand
+SHARE_PRIOR = 0.5
+
+SIGNS = {
+    RegistrationEvent.REGISTER: 1,
+    RegistrationEvent.UNREGISTER: -1,
+    RegistrationEvent.SWAP: 1,
+}
+
+
+def ew_rate(times, now, half_life, window):
+    """
+    Exponentially weighted rate of events per hour: recent events count
+    most, an event half_life hours old counts half. For a steady rate this
+    is the rate itself.
+    Args:
+        times: Event times, hours (array)
+        now: Current time, hours
+        half_life: Hours
+        window: Hours of history in times
+    """
+    tau = half_life / math.log(2)
+    ages = now - np.asarray(times, dtype=float)
+    ages = ages[(ages >= 0) & (ages <= window)]
+
+    # only window hours were seen, scale up for the part of the decay cut off
+    return np.exp(-ages / tau).sum() / (tau * (1 - math.exp(-window / tau)))
+
+
+def project(
+    arrivals,
+    event_times,
+    event_workshops,
+    event_signs,
+    sessions,
+    taken,
+    capacity,
+    now,
+    until,
+    half_life=6.0,
+    window=48.0,
+):
+    """
+    Seat demand per workshop: delegates keep signing up at their recent
+    (exponentially weighted) rate and every new delegate takes a seat in
+    each session, split between the session's workshops in proportion to
+    their recent net registrations.
+    Args:
+        arrivals: Delegate sign up times, hours
+        event_times, event_workshops, event_signs: Registration changes,
+            hours, index into the workshop arrays, +1 or -1
+        sessions, taken, capacity: Per workshop arrays
+        now, until: Hours, forecast from now until registration closes
+        half_life: Hours, how fast old activity stops counting
+        window: Hours of history to use
+    Returns:
+        dict: Per workshop arrays rate (seats/hour), demand (seats taken at
+        until), hours_to_full (inf when it won't fill)
+    """
+    sessions = np.asarray(sessions)
+    taken = np.asarray(taken, dtype=float)
+    capacity = np.asarray(capacity, dtype=float)
+    event_times = np.asarray(event_times, dtype=float)
+    tau = half_life / math.log(2)
+
+    arrival_rate = ew_rate(arrivals, now, half_life, window)
+
+    # weighted net registrations per workshop
+    ages = now - event_times
+    recent = (ages >= 0) & (ages <= window)
+    weights = np.exp(-ages[recent] / tau) * np.asarray(event_signs)[recent]
+    net = np.zeros(len(sessions))
+    np.add.at(net, np.asarray(event_workshops, dtype=int)[recent], weights)
+    net = np.clip(net, 0, None) + SHARE_PRIOR
+
+    # share within the session
+    session_ids, session_index = np.unique(sessions, return_inverse=True)
+    totals = np.zeros(len(session_ids))
+    np.add.at(totals, session_index, net)
+    share = net / totals[session_index]
+
+    rate = arrival_rate * share
+    demand = taken + rate * max(0.0, until - now)
+
+    remaining = np.clip(capacity - taken, 0, None)
+    with np.errstate(divide="ignore"):
+        hours_to_full = np.where(
+            remaining == 0, 0.0, np.where(rate > 0, remaining / rate, np.inf)
+        )
+
+    return {"rate": rate, "demand": demand, "hours_to_full": hours_to_full}
+
+
+def hours(moments):
+    return np.array([moment.timestamp() / 3600 for moment in moments], dtype=float)
+
+
+def forecast(now=None, until=None, half_life=6.0, window=48.0):
+    """
+    Forecast every workshop from the sign ups and registration events of
+    the last window hours, in three queries.
+    Args:
+        now: Defaults to the current time
+        until: When registration closes, defaults to 24 hours from now
+    Returns:
+        list: Per workshop dicts, soonest to fill first. capacity, overflow
+        and full_at are None for workshops without a location
+    """
+    now = now or timezone.now()
+    until = until or now + timezone.timedelta(hours=24)
+    since = now - timezone.timedelta(hours=window)
+
+    workshops = list(
+        Workshop.objects.select_related("location")
+        .annotate(
+            registered=F("workshopseats__registered"),
+            facilitators=Count("facilitatorregistration"),
+        )
+        .order_by("id")
+    )
+    if not workshops:
+        return []
+
+    index = {workshop.pk: i for i, workshop in enumerate(workshops)}
+
+    arrivals = Delegate.objects.filter(date_created__gt=since).values_list(
+        "date_created", flat=True
+    )
+
+    times, workshop_index, signs = [], [], []
+    for created_at, kind, workshop_id, from_workshop_id in RegistrationEvent.objects.filter(
+        created_at__gt=since
+    ).values_list("created_at", "kind", "workshop_id", "from_workshop_id"):
+        if workshop_id in index:
+            times.append(created_at)
+            workshop_index.append(index[workshop_id])
+            signs.append(SIGNS[kind])
+        if from_workshop_id in index:
+            times.append(created_at)
+            workshop_index.append(index[from_workshop_id])
+            signs.append(-1)
+
+    taken = [(workshop.registered or 0) + workshop.facilitators for workshop in workshops]
+    # a workshop without a location has no room to fill yet, its demand is
+    # still forecast for the location matcher
+    capacity = [workshop.location.capacity if workshop.location else None for workshop in workshops]
+
+    result = project(
+        hours(arrivals),
+        hours(times),
+        workshop_index,
+        signs,
+        [workshop.session for workshop in workshops],
+        taken,
+        [math.inf if seats is None else seats for seats in capacity],
+        now.timestamp() / 3600,
+        until.timestamp() / 3600,
+        half_life,
+        window,
+    )
+
+    rows = []
+    for i, workshop in enumerate(workshops):
+        to_full = result["hours_to_full"][i]
+        rows.append(
+            {
+                "id": workshop.pk,
+                "title": workshop.title,
+                "session": workshop.session,
+                "taken": taken[i],
+                "capacity": capacity[i],
+                "rate_per_hour": round(float(result["rate"][i]), 3),
+                "demand": round(float(result["demand"][i]), 1),
+                "overflow": (
+                    round(max(0.0, float(result["demand"][i]) - capacity[i]), 1)
+                    if capacity[i] is not None
+                    else None
+                ),
+                "full_at": (
+                    now + timezone.timedelta(hours=float(to_full))
+                    if np.isfinite(to_full)
+                    else None
+                ),
+            }
+        )
+
+    rows.sort(key=lambda row: (row["full_at"] is None, row["full_at"] or now, -row["demand"]))
+    return rows
+
+
+def demand_by_workshop(**kwargs):
+    """
+    {workshop id: forecast seats taken}, for the location matcher.
+    """
+    return {row["id"]: row["demand"] for row in forecast(**kwargs)}
+
+
+def synthetic_history(rng, workshops=12, sessions=3, hours=72, peak=40, skew=1.0):
+    """
+    A registration period for backtesting: delegates arrive as a Poisson
+    process whose rate rises to peak per hour and tails off, and each picks a
+    workshop per session by Zipf popularity (no capacity limit).
+    Returns:
+        dict: arrivals, event_times, event_workshops, sessions
+    """
+    t = np.arange(hours)
+    # rate per hour, a ramp up to the peak at a third of the period then decay
+    rate = peak * np.minimum(t / (hours / 3), np.exp(-(t - hours / 3) / (hours / 2)))
+    counts = rng.poisson(rate)
+    arrivals = np.repeat(t, counts) + rng.random(counts.sum())
+
+    session_of = np.repeat(np.arange(1, sessions + 1), workshops)
+    times, picks = [], []
+    for session in range(sessions):
+        weights = np.array(zipf_weights(workshops, skew))
+        weights = rng.permutation(weights / weights.sum())
+        choice = rng.choice(workshops, size=len(arrivals), p=weights)
+        # a delegate registers a few minutes after signing up
+        times.append(arrivals + rng.exponential(0.1, len(arrivals)))
+        picks.append(choice + session * workshops)
+
+    return {
+        "arrivals": arrivals,
+        "event_times": np.concatenate(times),
+        "event_workshops": np.concatenate(picks),
+        "sessions": session_of,
+    }
+
+
+def backtest(seed=0, runs=20, cutoff=0.5, half_life=6.0, **history):
+    """
+    Forecast synthetic registration periods from their first cutoff share
+    and compare with what happened.
+    Returns:
+        dict: Mean absolute error of the final demand per workshop, relative
+        to the mean final demand, and of the time at which workshops
+        crossed their median final demand, in hours
+    """
+    rng = np.random.default_rng(seed)
+    demand_errors, demand_scale, fill_errors = [], [], []
+
+    for _ in range(runs):
+        data = synthetic_history(rng, **history)
+        end = max(data["arrivals"].max(), data["event_times"].max())
+        now = end * cutoff
+        count = len(data["sessions"])
+
+        seen = data["event_times"] <= now
+        taken = np.bincount(data["event_workshops"][seen], minlength=count)
+        final = np.bincount(data["event_workshops"], minlength=count)
+
+        # a room the size of the median final demand, to time the fill
+        capacity = np.full(count, np.median(final))
+
+        result = project(
+            data["arrivals"][data["arrivals"] <= now],
+            data["event_times"][seen],
+            data["event_workshops"][seen],
+            np.ones(seen.sum()),
+            data["sessions"],
+            taken,
+            capacity,
+            now,
+            end,
+            half_life,
+        )
+
+        demand_errors.append(np.abs(result["demand"] - final).mean())
+        demand_scale.append(final.mean())
+
+        # when each workshop actually filled its room
+        order = np.argsort(data["event_times"])
+        filled_at = np.full(count, np.inf)
+        running = np.zeros(count)
+        for time, workshop in zip(
+            data["event_times"][order], data["event_workshops"][order]
+        ):
+            running[workshop] += 1
+            if running[workshop] >= capacity[workshop] and np.isinf(filled_at[workshop]):
+                filled_at[workshop] = time
+
+        predicted = now + result["hours_to_full"]
+        both = np.isfinite(filled_at) & np.isfinite(predicted) & (filled_at > now)
+        if both.any():
+            fill_errors.append(np.abs(predicted[both] - filled_at[both]).mean())
+
+    return {
+        "runs": runs,
+        "demand_mae": round(float(np.mean(demand_errors)), 2),
+        "demand_relative_error": round(float(np.sum(demand_errors) / np.sum(demand_scale)), 3),
+        "fill_time_mae_hours": (
+            round(float(np.mean(fill_errors)), 2) if fill_errors else None
+        ),
+    }
@@ -1,8 +1,13 @@
+import io
 import json
-from django.test import Client, TestCase
+import pandas as pd
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from registration.models import Location
+from registration.models import Location, Workshop
+from registration.testing import BulkUploadMixin, csv_upload, excel_upload, location_df
 
 
 class LocationAPITestCase(TestCase):
@@ -80,4 +85,186 @@ class LocationAPITestCase(TestCase):
     def test_delete_location_id_not_found(self):
         invalid_url = reverse('registration:location_id', kwargs={'id': 999})
         response = self.client.delete(invalid_url)
-        self.assertEqual(response.status_code, 200)
\ No newline at end of file
+        self.assertEqual(response.status_code, 200)
+
+
+class LocationsBulkPOST(BulkUploadMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("registration:locations_bulk")
+
+    def test_creates_locations(self):
+        df = location_df(30)
+
+        response = self.client.post(self.url, {"locations": excel_upload(df)})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Location.objects.count(), 30)
+        self.assertEqual(Location.objects.filter(moveable_seats=True).count(), 15)
+
+    def test_reports_every_bad_row(self):
+        df = location_df(10)
+        df.at[2, "capacity"] = None
+        df.at[5, "session"] = 7
+        df.at[8, "session"] = 0
+
+        response = self.client.post(self.url, {"locations": excel_upload(df)})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [(error["row"], error["column"]) for error in response.json()["errors"]],
+            [(4, "capacity"), (7, "session"), (10, "session")],
+        )
+        self.assertEqual(Location.objects.count(), 0)
+
+    def test_rejects_non_numeric_capacity(self):
+        df = location_df(5).astype({"capacity": object})
+        df.at[1, "capacity"] = "thirty"
+        df.at[3, "capacity"] = 12.5
+
+        for query in ["?dry_run=1", "", "?ingest=stream"]:
+            response = self.client.post(self.url + query, {"locations": excel_upload(df)})
+
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(
+                [(error["row"], error["column"]) for error in response.json()["errors"]],
+                [(3, "capacity"), (5, "capacity")],
+            )
+        self.assertEqual(Location.objects.count(), 0)
+
+    @override_settings(BULK_IMPORT_BATCH_SIZE=7)
+    def test_uses_configured_batch_size(self):
+        df = location_df(30)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {"locations": excel_upload(df)})
+
+        self.assertEqual(response.status_code, 200)
+        inserts = [q for q in queries.captured_queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 5)
+
+    def test_10k_rows(self):
+        self.assertBatchedUpload(self.url, "locations", location_df(10000), Location)
+
+    def test_merge_updates_in_place(self):
+        kept = Location.objects.create(
+            building="building 0", room_num="0", capacity=5, session=1
+        )
+        removed = Location.objects.create(
+            building="old building", room_num="9", capacity=5, session=1
+        )
+        workshop = Workshop.objects.create(
+            title="workshop", description="description", session=1, location=removed
+        )
+
+        response = self.client.post(
+            reverse("registration:locations_bulk") + "?mode=merge",
+            {"locations": excel_upload(location_df(3))},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        summary = response.json()
+        self.assertEqual(
+            (summary["created"], summary["updated"], summary["deleted"]), (2, 1, 1)
+        )
+        self.assertEqual(summary["unassigned_workshops"], 1)
+
+        kept.refresh_from_db()
+        self.assertEqual(kept.capacity, 20)
+        self.assertFalse(Location.objects.filter(pk=removed.pk).exists())
+
+        # the workshop survives losing its room
+        workshop.refresh_from_db()
+        self.assertIsNone(workshop.location)
+
+    def test_merge_rejects_duplicate_keys(self):
+        df = pd.concat([location_df(3), location_df(1)], ignore_index=True)
+        df.at[3, "capacity"] = 99
+
+        response = self.client.post(
+            reverse("registration:locations_bulk") + "?mode=merge",
+            {"locations": excel_upload(df)},
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["errors"][0]["row"], 5)
+        self.assertEqual(Location.objects.count(), 0)
+
+    def test_dry_run_reports_without_saving(self):
+        Workshop.objects.create(title="workshop", description="d", session=2)
+        Workshop.objects.create(title="other", description="d", session=2)
+        Workshop.objects.create(title="third", description="d", session=2)
+        df = location_df(6)
+        df.at[1, "capacity"] = None
+
+        response = self.client.post(
+            reverse("registration:locations_bulk") + "?dry_run=1",
+            {"locations": excel_upload(df)},
+        )
+
+        self.assertEqual(response.status_code, 400)
+        data = response.json()
+        self.assertTrue(data["dry_run"])
+        self.assertFalse(data["valid"])
+        self.assertEqual(data["rows"], 6)
+        self.assertEqual([error["row"] for error in data["errors"]], [3])
+        self.assertEqual(
+            [warning["message"] for warning in data["warnings"]],
+            ["Not enough locations for existing workshops in session 2"],
+        )
+        self.assertEqual(Location.objects.count(), 0)
+
+
+class LocationsStreamingIngest(BulkUploadMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("registration:locations_bulk")
+
+    def test_csv_upload(self):
+        for mode in ("stream", "frame"):
+            Location.objects.all().delete()
+
+            response = self.client.post(
+                self.url + f"?ingest={mode}", {"locations": csv_upload(location_df(30))}
+            )
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(Location.objects.count(), 30)
+            self.assertEqual(Location.objects.get(room_num="5").capacity, 25)
+
+    @override_settings(BULK_IMPORT_BATCH_SIZE=10)
+    def test_late_bad_row_rolls_back_every_batch(self):
+        df = location_df(50)
+        df.at[3, "session"] = 9
+        df.at[44, "capacity"] = None
+
+        response = self.client.post(
+            self.url + "?ingest=stream", {"locations": excel_upload(df)}
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [(error["row"], error["column"]) for error in response.json()["errors"]],
+            [(5, "session"), (46, "capacity")],
+        )
+        self.assertEqual(Location.objects.count(), 0)
+
+    def test_unreadable_file(self):
+        upload = io.BytesIO(b"not a spreadsheet")
+        upload.name = "upload.xlsx"
+
+        response = self.client.post(self.url + "?ingest=stream", {"locations": upload})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], "Error reading file")
+
+    @override_settings(BULK_IMPORT_BATCH_SIZE=10)
+    def test_drops_rows_repeated_across_batches(self):
+        df = pd.concat([location_df(15), location_df(15)], ignore_index=True)
+
+        response = self.client.post(
+            self.url + "?ingest=stream", {"locations": excel_upload(df)}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Location.objects.count(), 15)
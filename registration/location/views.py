@@ -1,12 +1,26 @@
 import json
 from django.http import HttpResponse, JsonResponse
 
-from registration.models import Location
+from registration.models import Location, Workshop
 from django.core.exceptions import ValidationError
 from django.core import serializers as django_serializers
+from django.db import transaction
+from django.db.models import Count
 from django.views.decorators.csrf import csrf_exempt
 
-import pandas as pd
+from registration.bulk import merge as bulk_merge
+from registration.bulk import pipeline as bulk
+
+LOCATION_COLUMNS = [
+    "building",
+    "room",
+    "capacity",
+    "session",
+    "moveable_seats",
+]
+
+# fields updated when merging an upload into existing locations
+LOCATION_MERGE_FIELDS = ["capacity", "moveable_seats"]
 
 
 def validate_location_data(data):
@@ -24,6 +38,110 @@ def validate_location_data(data):
     return True, None
 
 
+def validate_location_sheet(location_df, merge=False):
+    """
+    Validate every row of an uploaded location sheet.
+    Args:
+        location_df: Dataframe with LOCATION_COLUMNS
+        merge: Rows must also have unique building, room and session
+    Returns:
+        list: Per-row errors (empty if the sheet is valid)
+    """
+    errors = bulk.missing_value_errors(
+        location_df, LOCATION_COLUMNS, bulk.MISSING_VALUES_MESSAGE
+    )
+
+    # make sure all session 1 2 3
+    errors += bulk.invalid_value_errors(
+        location_df,
+        "session",
+        [1, 2, 3],
+        "Data contains invalid session values - make sure all sessions are 1, 2, or 3",
+    )
+
+    errors += bulk.whole_number_errors(
+        location_df, "capacity", "Capacity must be a whole number"
+    )
+
+    if merge:
+        errors += bulk.duplicate_row_errors(
+            location_df,
+            ["building", "room", "session"],
+            "Duplicate building, room and session",
+        )
+
+    return sorted(errors, key=lambda error: error["row"])
+
+
+def location_warnings(location_df):
+    """
+    Cross check an uploaded location sheet against the existing workshops.
+    Returns:
+        list: Sessions with fewer rooms than workshops
+    """
+    uploaded = location_df.groupby("session").size()
+    workshops = Workshop.objects.values("session").annotate(count=Count("id"))
+
+    return [
+        {
+            "row": None,
+            "column": "session",
+            "message": f"Not enough locations for existing workshops in session {workshop['session']}",
+        }
+        for workshop in workshops
+        if uploaded.get(workshop["session"], 0) < workshop["count"]
+    ]
+
+
+def build_locations(location_df):
+    """
+    Unsaved locations for every row of a validated location sheet.
+    """
+    location_df = location_df.assign(
+        building=bulk.text_or_none(location_df["building"]),
+        room=bulk.text_or_none(location_df["room"]),
+    )
+
+    return [
+        Location(
+            building=row.building,
+            room_num=row.room,
+            # float first, a text cell like "40.0" is a valid capacity too
+            capacity=int(float(row.capacity)),
+            session=int(row.session),
+            moveable_seats=row.moveable_seats == 1,
+        )
+        for row in location_df.itertuples()
+    ]
+
+
+def location_key(location):
+    return (location.building, location.room_num, int(location.session))
+
+
+def merge_locations(locations):
+    """
+    Upsert locations on (building, room, session). Locations missing from
+    the sheet are deleted, their workshops are unassigned rather than
+    deleted with them.
+    Returns:
+        dict: Diff summary
+    """
+    diff = bulk_merge.compute_diff(
+        Location.objects.all(), locations, location_key, LOCATION_MERGE_FIELDS
+    )
+
+    with transaction.atomic():
+        # Workshop.location cascades, so unassign before deleting
+        unassigned = Workshop.objects.filter(location__in=diff["delete"]).update(
+            location=None
+        )
+        summary = bulk_merge.apply_diff(Location, diff, LOCATION_MERGE_FIELDS)
+
+    summary["unassigned_workshops"] = unassigned
+    return summary
+
+
 def locations(request):
     """
     GET: List all locations
@@ -140,9 +258,13 @@ def locations_bulk(request):
     """
     POST: Bulk upload locations from Excel file (admin only)
     Required file format:
-        - Excel file with columns: building, room, capacity, session, moveable_seats
+        - Excel or CSV file with columns: building, room, capacity, session, moveable_seats
         - No empty cells
         - Sessions must be 1, 2, or 3
+    Optional query params:
+        - mode=merge: Upsert on building + room + session instead of requiring no locations
+        - dry_run=1: Validate the file and report every error without saving
+        - ingest=stream|frame: Insert in batches as the file is read, or read the whole file first
     Returns 403 for non-admin, 409 if locations exist, 400 for invalid data
     """
     if request.method == "POST":
@@ -152,8 +274,10 @@ def locations_bulk(request):
                 {"message": "Must be admin to make this request"}, status=403
             )
 
+        merge = bulk_merge.is_merge(request)
+
         # must have no locations
-        if len(Location.objects.all()) > 0:
+        if not merge and Location.objects.exists():
             return JsonResponse(
                 {"message": "Delete existing locations before attempting to upload"},
                 status=409,
@@ -162,63 +286,51 @@ def locations_bulk(request):
         if "locations" not in request.FILES:
             return JsonResponse({"message": "Must include file"}, status=400)
 
-        file = request.FILES["locations"]
-        location_df = None
-
-        try:
-            location_df = pd.read_excel(file)
-        except:
-            return JsonResponse({"message": "Error reading file"}, status=400)
-
-        location_df = location_df.drop_duplicates()
-        # when loading in df, pandas will add ".#" to duplicate columns
-        location_df.columns = [x.lower().split(".")[0] for x in location_df.columns]
-
-        # validate data
-        columns_set = set(location_df.columns)
+        if (
+            not merge
+            and not bulk.is_dry_run(request)
+            and bulk.is_streaming(request, "locations")
+        ):
+            _, error = bulk.stream_import(
+                request.FILES["locations"],
+                LOCATION_COLUMNS,
+                validate_location_sheet,
+                build_locations,
+                Location,
+            )
+            if error:
+                return JsonResponse(error, status=400)
 
-        if len(columns_set) != len(location_df.columns):
-            return JsonResponse({"message": "Duplicate column names"}, status=400)
+            data = django_serializers.serialize("json", Location.objects.all())
+            return HttpResponse(data, content_type="application/json")
 
-        expected_columns = [
-            "building",
-            "room",
-            "capacity",
-            "session",
-            "moveable_seats",
-        ]
+        location_df, error = bulk.load_sheet(
+            request.FILES["locations"], LOCATION_COLUMNS
+        )
+        if error:
+            return JsonResponse(error, status=400)
 
-        for i in range(len(expected_columns)):
-            if expected_columns[i] not in columns_set:
-                return JsonResponse(
-                    {"message": f"Missing column {expected_columns[i]}"}, status=400
-                )
+        errors = validate_location_sheet(location_df, merge=merge)
 
-        if location_df.isnull().values.any():
-            return JsonResponse(
-                {"message": "Missing values - make sure there are no empty cells"},
-                status=400,
+        if bulk.is_dry_run(request):
+            body, status = bulk.dry_run_report(
+                location_df, errors, location_warnings(location_df)
             )
+            return JsonResponse(body, status=status)
 
-        # make sure all session 1 2 3
-        if len(location_df) != len(location_df[location_df["session"].isin([1, 2, 3])]):
+        if errors:
             return JsonResponse(
-                {
-                    "message": "Data contains invalid session values - make sure all sessions are 1, 2, or 3"
-                },
-                status=400,
+                bulk.error_report(errors[0]["message"], errors), status=400
             )
 
+        locations = build_locations(location_df)
+
+        if merge:
+            summary = merge_locations(locations)
+            return JsonResponse({"message": "Merge complete", **summary})
+
         # create locations
-        for index, row in location_df.iterrows():
-            location = Location(
-                building=row["building"],
-                room_num=row["room"],
-                capacity=row["capacity"],
-                session=row["session"],
-                moveable_seats=row["moveable_seats"] == 1,
-            )
-            location.save()
+        bulk.bulk_insert(Location, locations)
 
         data = django_serializers.serialize("json", Location.objects.all())
         return HttpResponse(data, content_type="application/json")
@@ -0,0 +1,78 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from registration.forecast import backtest, forecast
+
+
+class Command(BaseCommand):
+    help = (
+        "Forecast when each workshop fills and how many seats it will need "
+        "by the time registration closes, from the recent sign up and "
+        "registration rates. matchworkshoplocations --forecast assigns rooms "
+        "from the same forecast."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--until",
+            help="When registration closes (ISO 8601), defaults to 24 hours from now",
+        )
+        parser.add_argument(
+            "--half-life",
+            type=float,
+            default=6.0,
+            help="Hours after which activity counts half",
+        )
+        parser.add_argument("--top", type=int, help="Only the first workshops")
+        parser.add_argument("--json", action="store_true", help="Print the raw forecast")
+        parser.add_argument(
+            "--backtest",
+            action="store_true",
+            help="Measure the forecast error on synthetic registration periods instead",
+        )
+
+    def handle(self, *args, **options):
+        if options["backtest"]:
+            self.stdout.write(
+                json.dumps(backtest(half_life=options["half_life"]), indent=4)
+            )
+            return
+
+        until = None
+        if options["until"]:
+            until = parse_datetime(options["until"])
+            if until is None:
+                raise CommandError(f"Invalid --until {options['until']}")
+            if timezone.is_naive(until):
+                until = timezone.make_aware(until)
+
+        rows = forecast(until=until, half_life=options["half_life"])[: options["top"]]
+
+        if options["json"]:
+            self.stdout.write(json.dumps(rows, indent=4, cls=DjangoJSONEncoder))
+            return
+
+        self.stdout.write(
+            f"{'workshop':<32}{'session':>8}{'taken':>7}{'capacity':>10}"
+            f"{'per hour':>10}{'demand':>8}  full at"
+        )
+        for row in rows:
+            full_at = (
+                f"{timezone.localtime(row['full_at']):%Y-%m-%d %H:%M}"
+                if row["full_at"]
+                else "-"
+            )
+            # no location yet
+            capacity = "-" if row["capacity"] is None else row["capacity"]
+            style = self.style.ERROR if row["overflow"] else str
+            self.stdout.write(
+                style(
+                    f"{row['title'][:31]:<32}{row['session']:>8}{row['taken']:>7}"
+                    f"{capacity:>10}{row['rate_per_hour']:>10}"
+                    f"{row['demand']:>8}  {full_at}"
+                )
+            )
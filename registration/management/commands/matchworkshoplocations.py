@@ -1,6 +1,4 @@
 import os
-import pandas as pd
-import environ
 
 from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth.models import User
@@ -15,11 +13,18 @@ from registration.models import (
     Workshop,
 )
 
-env = environ.Env()
-environ.Env.read_env()
+from fact_registration_backend.environment import env
+from fact_registration_backend.lazy import lazy_import
 
+# imported by workshop views for set_locations
+pd = lazy_import("pandas")
 
-def set_locations(self):
+
+def set_locations(self, demand=None):
+    """
+    Assign locations to workshops by registrations, or by the forecast
+    final registrations in demand ({workshop id: seats}) when given.
+    """
     # set all workshop locations as "unassigned"
     location_assignments = pd.DataFrame(columns=["workshop", "location"])
     location_assignments["workshop"] = [value["pk"] for value in Workshop.objects.all().values("pk")]
@@ -38,7 +43,9 @@ def set_locations(self):
 
         for idx, row in workshops.iterrows():
             registrations.append(
-                len(Registration.objects.filter(workshop_id=row["id"]))
+                demand[row["id"]]
+                if demand
+                else len(Registration.objects.filter(workshop_id=row["id"]))
             )
 
             facilitators.append(
@@ -145,7 +152,9 @@ def set_locations(self):
 
     for idx, row in workshops.iterrows():
         registrations.append(
-            len(Registration.objects.filter(workshop_id=row["id"]))
+            demand[row["id"]]
+            if demand
+            else len(Registration.objects.filter(workshop_id=row["id"]))
         )
 
     workshops["registrations"] = registrations
@@ -223,8 +232,21 @@ def set_locations(self):
 
 
 class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--forecast",
+            action="store_true",
+            help="Match rooms to forecast final registrations (see forecastcapacity)",
+        )
+
     def handle(self, *args, **options):
-        set_locations(self)
+        demand = None
+        if options["forecast"]:
+            from registration.forecast import demand_by_workshop
+
+            demand = demand_by_workshop()
+
+        set_locations(self, demand)
 
         # save file
         workshops = Workshop.objects.all().order_by("session").values()
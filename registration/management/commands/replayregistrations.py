@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from registration import events
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the seat counters and the per minute registration histogram "
+        "from the registration event log."
+    )
+
+    def handle(self, *args, **options):
+        count = events.replay()
+
+        self.stdout.write(self.style.SUCCESS(f"Replayed {count} registration events"))
@@ -0,0 +1,68 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from registration.models import Workshop
+from registration.seed import clear_event, seed_event, seeding_allowed
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a reproducible synthetic event (schools, workshops with "
+        "facilitators and assistants, agenda, delegates and registrations) "
+        "for benchmarks and exports. Defaults are about ten times a real event."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=2025)
+        parser.add_argument("--schools", type=int, default=400)
+        parser.add_argument("--workshops-per-session", type=int, default=80)
+        parser.add_argument("--capacity", type=int, default=300, help="Average room capacity")
+        parser.add_argument("--delegates", type=int, default=20000)
+        parser.add_argument("--assistants", type=int, default=2, help="Most per workshop")
+        parser.add_argument("--skew", type=float, default=1.0, help="Zipf exponent of workshop popularity")
+        parser.add_argument(
+            "--password", help="Password of every account, unusable passwords if not given"
+        )
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Delete the current event (delegates, facilitators, workshops, ...) first",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Run even though neither DEBUG nor DEVELOPMENT_MODE is on",
+        )
+
+    def handle(self, *args, **options):
+        if not (options["force"] or seeding_allowed()):
+            raise CommandError(
+                "Refusing to seed outside DEBUG or DEVELOPMENT_MODE, pass --force "
+                "if this really is a scratch database"
+            )
+
+        if options["reset"]:
+            clear_event()
+        elif Workshop.objects.exists():
+            raise CommandError(
+                "The database already has an event, pass --reset to replace it"
+            )
+
+        start = time.perf_counter()
+        counts = seed_event(
+            seed=options["seed"],
+            schools=options["schools"],
+            workshops_per_session=options["workshops_per_session"],
+            capacity=options["capacity"],
+            delegates=options["delegates"],
+            assistants=options["assistants"],
+            skew=options["skew"],
+            password=options["password"],
+        )
+
+        for name, count in counts.items():
+            self.stdout.write(f"{name}: {count}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Seeded in {time.perf_counter() - start:.1f}s")
+        )
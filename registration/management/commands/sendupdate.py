@@ -1,104 +1,92 @@
-import os
-import pandas
-import environ
+import datetime
 
-from django.core.management.base import BaseCommand, CommandError
-from django.contrib.auth.models import User
 from django.core.mail import EmailMessage
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
-from registration.models import Delegate, Registration, School, Workshop
-
-env = environ.Env()
-environ.Env.read_env()
-
-
-class Command(BaseCommand):
-    def handle(self, *args, **options):
-        all_data = {
-            "first_name": [],
-            "last_name": [],
-            "pronouns": [],
-            "year": [],
-            "school": [],
-            "email": [],
-            "session_1": [],
-            "session_2": [],
-            "session_3": [],
-        }
-
-        # create data frames
-        delegates = Delegate.objects.all().values()
-        delegate_df = pandas.DataFrame(data=delegates)
-
-        if len(delegate_df) > 0:
-            delegate_df.set_index("id", inplace=True)
-
-        users = User.objects.all().values()
-        user_df = pandas.DataFrame(data=users)
-
-        if len(user_df) > 0:
-            user_df.set_index("id", inplace=True)
-
-        schools = School.objects.all().values()
-        schools_df = pandas.DataFrame(data=schools)
-
-        if len(schools_df) > 0:
-            schools_df.set_index("id", inplace=True)
-
-        for idx, row in delegate_df.iterrows():
-            user_id = row["user_id"]
-            all_data["first_name"].append(user_df.loc[user_id, "first_name"])
-            all_data["last_name"].append(user_df.loc[user_id, "last_name"])
-            all_data["pronouns"].append(row["pronouns"])
-            all_data["year"].append(row["year"])
-
-            if not pandas.isna(row["school_id"]):
-                all_data["school"].append(schools_df.loc[row["school_id"], "name"])
-            elif row["other_school"]:
-                all_data["school"].append(row["other_school"])
-            else:
-                all_data["school"].append("")
+from registration.models import UpdateReport
+from registration.reports import delegate_report, to_excel
 
-            all_data["email"].append(user_df.loc[user_id, "email"])
+from fact_registration_backend.environment import env
 
-            registrations = Registration.objects.filter(delegate_id=idx).values()
+RECIPIENTS = ["fact.it@psauiuc.org"]
 
-            for registration in registrations:
-                workshop = Workshop.objects.get(pk=registration["workshop_id"])
 
-                # assumes workshops have session 1, 2, or 3
-                key = f"session_{workshop.session}"
-                all_data[key].append(workshop.title)
+class Command(BaseCommand):
+    help = (
+        "Email the delegate registration spreadsheet. With --changed only the "
+        "delegates created or changed since the last report are sent."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--changed",
+            action="store_true",
+            help="Only delegates changed since the last report sent",
+        )
+        parser.add_argument(
+            "--since",
+            help="Only delegates changed after this date or datetime (ISO 8601)",
+        )
+        parser.add_argument("--to", nargs="+", default=RECIPIENTS)
 
-        # save file
-        final_df = pandas.DataFrame(data=all_data)
+    def handle(self, *args, **options):
+        since = self.since(options)
 
-        base_path = "./registration/management/commands/data"
-        os.mkdir(base_path)
-        file_name = "delegate_data.xlsx"
-        path = f"{base_path}/{file_name}"
+        # taken before querying, so changes made while the report is built
+        # are in the next one
+        sent_at = timezone.now()
+        report = delegate_report(since)
 
-        final_df.to_excel(path, index=False)
+        if since is not None and len(report) == 0:
+            self.stdout.write(f"No delegate changes since {since.isoformat()}")
+            return
 
         # email
-        subject = "FACT 2024 Automated Registration Update"
-        message = "Registration spreadsheet attached"
-        from_email = env("EMAIL_HOST_USER")
-        recipient_list = ["fact.it@psauiuc.org"]
-
-        email = EmailMessage(subject, message, from_email, recipient_list)
-
-        with open(path, "rb") as file:
-            email.attach(
-                file_name,
-                file.read(),
-                "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        if since is None:
+            subject = "FACT 2024 Automated Registration Update"
+            message = "Registration spreadsheet attached"
+            file_name = "delegate_data.xlsx"
+        else:
+            subject = f"FACT 2024 Automated Registration Update ({len(report)} changed)"
+            message = (
+                "Delegates who signed up or changed their profile or workshops "
+                f"since {timezone.localtime(since):%Y-%m-%d %H:%M}, attached"
             )
+            file_name = f"delegate_changes_{timezone.localtime(since):%Y%m%d_%H%M}.xlsx"
 
+        from_email = env("EMAIL_HOST_USER")
+
+        email = EmailMessage(subject, message, from_email, options["to"])
+        email.attach(
+            file_name,
+            to_excel(report),
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
         email.send()
 
+        UpdateReport.objects.create(sent_at=sent_at, since=since, delegates=len(report))
+
         self.stdout.write(self.style.SUCCESS("Spreadsheet sent successfully"))
 
-        # clean up
-        os.remove(path)
-        os.rmdir(base_path)
+    def since(self, options):
+        if options["since"]:
+            since = parse_datetime(options["since"])
+            if since is None:
+                try:
+                    date = datetime.date.fromisoformat(options["since"])
+                except ValueError:
+                    raise CommandError(f"Invalid --since {options['since']}")
+                since = datetime.datetime.combine(date, datetime.time())
+
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+            return since
+
+        if options["changed"]:
+            last = UpdateReport.objects.order_by("-sent_at").first()
+            # nothing sent yet, start with everything
+            return last.sent_at if last else None
+
+        return None
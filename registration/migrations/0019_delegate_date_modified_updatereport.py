@@ -0,0 +1,27 @@
+# Generated by Django 4.2.15 on 2026-10-19 15:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registration', '0018_alter_accountsetup_token_alter_delegate_other_school_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UpdateReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sent_at', models.DateTimeField()),
+                ('since', models.DateTimeField(blank=True, null=True)),
+                ('delegates', models.IntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='delegate',
+            name='date_modified',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 4.2.15 on 2026-10-19 15:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from collections import Counter
+
+
+def log_existing_registrations(apps, schema_editor):
+    """
+    Start the log with a register event for every current registration,
+    dated when the delegate signed up, and build the counters from it.
+    """
+    Registration = apps.get_model("registration", "Registration")
+    RegistrationEvent = apps.get_model("registration", "RegistrationEvent")
+    RegistrationMinute = apps.get_model("registration", "RegistrationMinute")
+    WorkshopSeats = apps.get_model("registration", "WorkshopSeats")
+
+    events = [
+        RegistrationEvent(
+            kind="register",
+            delegate_id=delegate_id,
+            workshop_id=workshop_id,
+            session=session,
+            created_at=created_at,
+        )
+        for delegate_id, workshop_id, session, created_at in Registration.objects.order_by(
+            "delegate__date_created", "id"
+        ).values_list("delegate_id", "workshop_id", "workshop__session", "delegate__date_created")
+    ]
+    RegistrationEvent.objects.bulk_create(events, batch_size=2000)
+
+    seats = Counter(event.workshop_id for event in events)
+    WorkshopSeats.objects.bulk_create(
+        [WorkshopSeats(workshop_id=workshop, registered=n) for workshop, n in seats.items()],
+        batch_size=2000,
+    )
+
+    minutes = Counter(event.created_at.replace(second=0, microsecond=0) for event in events)
+    RegistrationMinute.objects.bulk_create(
+        [RegistrationMinute(minute=minute, registered=n) for minute, n in minutes.items()],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('registration', '0019_delegate_date_modified_updatereport'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistrationMinute',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('minute', models.DateTimeField(unique=True)),
+                ('registered', models.IntegerField(default=0)),
+                ('unregistered', models.IntegerField(default=0)),
+                ('swapped', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WorkshopSeats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('registered', models.IntegerField(default=0)),
+                ('workshop', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='registration.workshop')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RegistrationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('register', 'Register'), ('unregister', 'Unregister'), ('swap', 'Swap')], max_length=10)),
+                ('session', models.IntegerField()),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('actor', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('delegate', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='registration.delegate')),
+                ('from_workshop', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='registration.workshop')),
+                ('workshop', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='registration.workshop')),
+            ],
+        ),
+        migrations.RunPython(log_existing_registrations, migrations.RunPython.noop),
+    ]
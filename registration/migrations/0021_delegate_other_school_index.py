@@ -0,0 +1,18 @@
+# Generated by Django 4.2.15 on 2026-10-19 15:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registration', '0020_registrationevent'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='delegate',
+            name='other_school',
+            field=models.CharField(blank=True, db_index=True, max_length=150, null=True),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.15 on 2026-10-19 15:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def split_names(value):
+    """
+    Names in Facilitator.facilitators, a comma separated string or a list
+    of them, in order without duplicates.
+    """
+    values = value if isinstance(value, list) else [value or ""]
+    names = [name.strip() for value in values for name in str(value).split(",")]
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def create_members(apps, schema_editor):
+    """
+    A member for every name of every facilitator, and registrations linked
+    to the member with their name. A name several facilitators list can't
+    be told apart and its registrations stay unlinked, by name only.
+    """
+    Facilitator = apps.get_model("registration", "Facilitator")
+    FacilitatorMember = apps.get_model("registration", "FacilitatorMember")
+    FacilitatorRegistration = apps.get_model("registration", "FacilitatorRegistration")
+
+    FacilitatorMember.objects.bulk_create(
+        [
+            FacilitatorMember(facilitator_id=pk, name=name)
+            for pk, facilitators in Facilitator.objects.order_by("pk").values_list(
+                "pk", "facilitators"
+            )
+            for name in split_names(facilitators)
+        ],
+        batch_size=2000,
+    )
+
+    by_name = {}
+    for member in FacilitatorMember.objects.order_by("facilitator_id", "pk"):
+        # None marks a shared name
+        by_name[member.name] = None if member.name in by_name else member.pk
+
+    registrations = list(FacilitatorRegistration.objects.all())
+    for registration in registrations:
+        registration.member_id = by_name.get(registration.facilitator_name.strip())
+    FacilitatorRegistration.objects.bulk_update(registrations, ["member"], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registration', '0021_delegate_other_school_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacilitatorMember',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('facilitator', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='registration.facilitator')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='facilitatorregistration',
+            name='member',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='registration.facilitatormember'),
+        ),
+        migrations.AddConstraint(
+            model_name='facilitatormember',
+            constraint=models.UniqueConstraint(fields=('facilitator', 'name'), name='unique_facilitator_member'),
+        ),
+        migrations.RunPython(create_members, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.15 on 2026-10-19 16:33
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def snapshot_identities(apps, schema_editor):
+    """
+    Copy the email of the delegate and the username of the actor of every
+    event logged so far.
+    """
+    RegistrationEvent = apps.get_model("registration", "RegistrationEvent")
+    Delegate = apps.get_model("registration", "Delegate")
+    User = apps.get_model("auth", "User")
+
+    RegistrationEvent.objects.filter(delegate__isnull=False).update(
+        delegate_email=Subquery(
+            Delegate.objects.filter(pk=OuterRef("delegate_id")).values("user__email")[:1]
+        )
+    )
+    RegistrationEvent.objects.filter(actor__isnull=False).update(
+        actor_username=Subquery(
+            User.objects.filter(pk=OuterRef("actor_id")).values("username")[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registration', '0022_facilitatormember'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registrationevent',
+            name='actor_username',
+            field=models.CharField(blank=True, max_length=150),
+        ),
+        migrations.AddField(
+            model_name='registrationevent',
+            name='delegate_email',
+            field=models.CharField(blank=True, max_length=254),
+        ),
+        migrations.RunPython(snapshot_identities, migrations.RunPython.noop),
+    ]
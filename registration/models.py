@@ -101,6 +101,7 @@ class Delegate(models.Model):
         school: Associated school
         other_school: Custom school name if not in list
         date_created: Account creation timestamp
+        date_modified: Last change to the profile or registrations
     """
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     pronouns = models.CharField(max_length=30, default="")
@@ -108,8 +109,10 @@ class Delegate(models.Model):
     school = models.ForeignKey(
         School, default=None, null=True, on_delete=models.CASCADE
     )
-    other_school = models.CharField(max_length=150, null=True, blank=True)
+    # indexed, approving a new school moves every delegate who typed it
+    other_school = models.CharField(max_length=150, null=True, blank=True, db_index=True)
     date_created = models.DateTimeField(auto_now_add=True)
+    date_modified = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"{self.user.last_name}, {self.user.first_name} - {self.user.email}"
@@ -123,10 +126,38 @@ class Registration(models.Model):
     workshop = models.ForeignKey(Workshop, on_delete=models.CASCADE)
 
 
+class FacilitatorMember(models.Model):
+    """
+    One of the people of a facilitator (department) account, kept in sync
+    with the names in Facilitator.facilitators.
+    """
+    facilitator = models.ForeignKey(
+        Facilitator, on_delete=models.CASCADE, related_name="members"
+    )
+    name = models.CharField(max_length=200)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["facilitator", "name"], name="unique_facilitator_member"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.facilitator} - {self.name}"
+
+
 class FacilitatorRegistration(models.Model):
     """
     Links facilitators to workshops.
+    Fields:
+        member: Facilitator member attending, null for registrations made
+            before members existed whose name matched no member
+        facilitator_name: Name of the member when registered
     """
+    member = models.ForeignKey(
+        FacilitatorMember, null=True, blank=True, on_delete=models.CASCADE
+    )
     facilitator_name = models.CharField(max_length=200)
     workshop = models.ForeignKey(Workshop, on_delete=models.CASCADE)
 
@@ -167,3 +198,69 @@ class AccountSetUp(models.Model):
     username = models.CharField(max_length=30)
     token = models.CharField(max_length=150)
     expiration = models.DateTimeField()
+
+
+class UpdateReport(models.Model):
+    """
+    Registration spreadsheets emailed by sendupdate.
+    Fields:
+        sent_at: Delegates changed before this are in the report
+        since: Start of the changes included, null for a full report
+        delegates: Number of delegates in the report
+    """
+    sent_at = models.DateTimeField()
+    since = models.DateTimeField(null=True, blank=True)
+    delegates = models.IntegerField()
+
+
+class RegistrationEvent(models.Model):
+    """
+    Append-only log of delegate registration changes, written in the same
+    transaction as the change (see registration/events.py).
+    Fields:
+        kind: register, unregister or swap
+        delegate: Delegate whose registration changed
+        delegate_email: Email of the delegate, kept when the delegate is deleted
+        actor: User who made the change
+        actor_username: Username of the actor, kept when the user is deleted
+        workshop: Workshop registered for (or left, for unregister)
+        from_workshop: Workshop left, for swap
+        session: Session of the change
+        created_at: Time of the change
+    """
+    REGISTER = "register"
+    UNREGISTER = "unregister"
+    SWAP = "swap"
+    KINDS = [(REGISTER, "Register"), (UNREGISTER, "Unregister"), (SWAP, "Swap")]
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    delegate = models.ForeignKey(Delegate, null=True, on_delete=models.SET_NULL)
+    delegate_email = models.CharField(max_length=254, blank=True)
+    actor = models.ForeignKey(User, null=True, on_delete=models.SET_NULL)
+    actor_username = models.CharField(max_length=150, blank=True)
+    workshop = models.ForeignKey(
+        Workshop, null=True, on_delete=models.SET_NULL, related_name="+"
+    )
+    from_workshop = models.ForeignKey(
+        Workshop, null=True, on_delete=models.SET_NULL, related_name="+"
+    )
+    session = models.IntegerField()
+    created_at = models.DateTimeField(db_index=True)
+
+
+class WorkshopSeats(models.Model):
+    """
+    Delegates registered for a workshop, kept from the registration events.
+    """
+    workshop = models.OneToOneField(Workshop, on_delete=models.CASCADE)
+    registered = models.IntegerField(default=0)
+
+
+class RegistrationMinute(models.Model):
+    """
+    Registration events per minute, kept from the registration events.
+    """
+    minute = models.DateTimeField(unique=True)
+    registered = models.IntegerField(default=0)
+    unregistered = models.IntegerField(default=0)
+    swapped = models.IntegerField(default=0)
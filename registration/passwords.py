@@ -0,0 +1,139 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import JsonResponse
+from django.utils.deprecation import MiddlewareMixin
+
+from monitoring import metrics
+
+_lock = threading.Lock()
+_pool = None
+
+
+class HashingBusy(Exception):
+    """
+    Every hashing slot of this worker is taken, see HashingBusyMiddleware.
+    """
+
+
+class HashingPool:
+    """
+    Process pool for password hashing, so PBKDF2 runs on its own cores
+    instead of the request threads. At most max_pending hashes are running
+    or waiting per web worker, more are turned away with HashingBusy
+    rather than piling up behind each other (None for no limit).
+    With 0 workers, the default, hashing runs in the request thread, still
+    capped.
+    """
+
+    def __init__(self, workers, max_pending=None):
+        self.workers = workers
+        self.slots = None
+        if max_pending is not None:
+            self.slots = threading.BoundedSemaphore(max_pending)
+        self.executor = None
+        if workers:
+            # spawn, forking a threaded web worker is not safe
+            self.executor = ProcessPoolExecutor(
+                workers, mp_context=multiprocessing.get_context("spawn")
+            )
+
+    def run(self, function, *args):
+        if self.slots is not None and not self.slots.acquire(blocking=False):
+            metrics.record_password_hash_rejected()
+            raise HashingBusy()
+
+        start = time.perf_counter()
+        try:
+            if self.executor is None:
+                return function(*args)
+
+            try:
+                return self.executor.submit(function, *args).result()
+            except BrokenProcessPool:
+                # a pool process died, hash here and start a new pool next time
+                reset_pool()
+                return function(*args)
+        finally:
+            if self.slots is not None:
+                self.slots.release()
+            metrics.record_password_hash(time.perf_counter() - start)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def get_pool():
+    global _pool
+
+    with _lock:
+        if _pool is None:
+            _pool = HashingPool(
+                getattr(settings, "PASSWORD_HASHING_WORKERS", 0),
+                getattr(settings, "PASSWORD_HASHING_MAX_PENDING", None),
+            )
+        return _pool
+
+
+def reset_pool():
+    global _pool
+
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = None
+
+
+@receiver(setting_changed)
+def password_hashing_setting_changed(setting, **kwargs):
+    if setting.startswith("PASSWORD_HASHING_"):
+        reset_pool()
+
+
+def pbkdf2_encode(password, salt, iterations):
+    return PBKDF2PasswordHasher().encode(password, salt, iterations)
+
+
+class PooledPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    Django's PBKDF2 hasher (same algorithm name and hash format, so stored
+    passwords keep working) computed in the hashing pool. Every
+    set_password, authenticate and check_password goes through it.
+    """
+
+    def encode(self, password, salt, iterations=None):
+        return get_pool().run(
+            pbkdf2_encode, password, salt, iterations or self.iterations
+        )
+
+
+def busy_response():
+    """
+    503 with Retry-After, for a request that couldn't get a hashing slot.
+    """
+    response = JsonResponse(
+        {"message": "Too many sign ins right now, try again in a moment"},
+        status=503,
+    )
+    response["Retry-After"] = str(getattr(settings, "PASSWORD_HASHING_RETRY_AFTER", 2))
+    return response
+
+
+class HashingBusyMiddleware(MiddlewareMixin):
+    """
+    Answer 503 with Retry-After when a view couldn't get a hashing slot.
+    """
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, HashingBusy):
+            return None
+
+        return busy_response()
@@ -0,0 +1,5 @@
+def zipf_weights(count, skew):
+    """
+    Relative popularity of count items ranked 1..count (Zipf's law).
+    """
+    return [1 / rank**skew for rank in range(1, count + 1)]
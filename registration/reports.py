@@ -0,0 +1,91 @@
+import io
+
+from registration.models import Delegate, Registration
+
+from fact_registration_backend.lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+COLUMNS = [
+    "first_name",
+    "last_name",
+    "pronouns",
+    "year",
+    "school",
+    "email",
+    "session_1",
+    "session_2",
+    "session_3",
+]
+
+
+def delegate_report(since=None):
+    """
+    One row per delegate with their workshop in each session, built from two
+    joined queries (delegates, registrations) and a pivot.
+    Args:
+        since: Only delegates created or changed after this datetime
+    Returns:
+        DataFrame: COLUMNS, ordered by sign up
+    """
+    delegates = Delegate.objects.order_by("id")
+    registrations = Registration.objects.all()
+
+    if since is not None:
+        delegates = delegates.filter(date_modified__gt=since)
+        registrations = registrations.filter(delegate__date_modified__gt=since)
+
+    delegate_df = pd.DataFrame.from_records(
+        delegates.values_list(
+            "id",
+            "user__first_name",
+            "user__last_name",
+            "pronouns",
+            "year",
+            "school__name",
+            "other_school",
+            "user__email",
+        ),
+        columns=[
+            "id",
+            "first_name",
+            "last_name",
+            "pronouns",
+            "year",
+            "school_name",
+            "other_school",
+            "email",
+        ],
+    )
+
+    if len(delegate_df) == 0:
+        return pd.DataFrame(columns=COLUMNS)
+
+    registration_df = pd.DataFrame.from_records(
+        registrations.values_list("delegate_id", "workshop__session", "workshop__title"),
+        columns=["id", "session", "title"],
+    )
+
+    # assumes workshops have session 1, 2, or 3
+    sessions = registration_df.pivot_table(
+        index="id", columns="session", values="title", aggfunc="first"
+    ).reindex(columns=[1, 2, 3])
+    sessions.columns = ["session_1", "session_2", "session_3"]
+
+    report = delegate_df.join(sessions, on="id")
+    report["school"] = report["school_name"].fillna(report["other_school"]).fillna("")
+    report[["session_1", "session_2", "session_3"]] = report[
+        ["session_1", "session_2", "session_3"]
+    ].fillna("")
+
+    return report[COLUMNS].reset_index(drop=True)
+
+
+def to_excel(report):
+    """
+    The report as xlsx bytes, for an email attachment.
+    """
+    buffer = io.BytesIO()
+    report.to_excel(buffer, index=False)
+
+    return buffer.getvalue()
@@ -0,0 +1,216 @@
+from collections import Counter
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count
+
+from registration.models import Delegate, NewSchool, School
+from registration.school.search import normalize, trigrams
+
+# least similarity for two submissions to be the same school
+CLUSTER_THRESHOLD = 0.6
+# least similarity for an existing school to be suggested
+MATCH_THRESHOLD = 0.5
+
+# words most names have in some spelling, ignored when comparing
+GENERIC_WORDS = {"the", "of", "high", "school", "highschool", "hs", "senior", "sr"}
+ABBREVIATIONS = {"st": "saint", "mt": "mount", "ft": "fort"}
+
+
+def cluster_key(name):
+    """
+    Normalized name without generic words and with common abbreviations
+    spelled out, "St. Joseph-Ogden HS" and "Saint Joseph Ogden High School"
+    have the same key.
+    """
+    words = [ABBREVIATIONS.get(word, word) for word in normalize(name).split()]
+    specific = [word for word in words if word not in GENERIC_WORDS]
+    # a name of only generic words is kept as it is
+    return " ".join(specific or words)
+
+
+def gram_matrix(names, vocabulary):
+    """
+    One row of trigram counts (0/1) per normalized name.
+    """
+    matrix = np.zeros((len(names), len(vocabulary)), dtype=np.float32)
+    for row, name in enumerate(names):
+        columns = [vocabulary[gram] for gram in trigrams(name) if gram in vocabulary]
+        matrix[row, columns] = 1
+    return matrix
+
+
+def similarity(left, right):
+    """
+    Dice coefficient between every row of left and every row of right,
+    2 * shared trigrams / (trigrams of one + trigrams of the other).
+    """
+    sizes = left.sum(axis=1)[:, None] + right.sum(axis=1)[None, :]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.nan_to_num(2 * (left @ right.T) / sizes)
+
+
+def components(linked):
+    """
+    Connected components of a symmetric boolean matrix, by union-find.
+    Returns:
+        list: Lists of row indices
+    """
+    parent = list(range(len(linked)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in zip(*np.nonzero(np.triu(linked, k=1))):
+        parent[find(i)] = find(j)
+
+    groups = {}
+    for i in range(len(linked)):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+
+def cluster_names(names, schools, threshold=CLUSTER_THRESHOLD, match_threshold=MATCH_THRESHOLD):
+    """
+    Group spellings of the same school and suggest an existing school for
+    each group. Names with the same key are always together, others
+    are linked when their trigram similarity reaches threshold (single
+    link, so A~B and B~C puts A and C together).
+    Args:
+        names: {submitted name: submissions}
+        schools: (pk, name) of the existing schools
+    Returns:
+        list: Clusters, most submissions first
+    """
+    by_key = {}
+    for name, count in names.items():
+        by_key.setdefault(cluster_key(name), Counter())[name] += count
+    keys = [name_key for name_key in by_key if name_key]
+
+    clusters = [
+        # names without letters or digits can't be compared, each is its own
+        # cluster so it still comes up for review
+        cluster_entry(Counter({name: count}), None)
+        for name, count in by_key.get("", Counter()).items()
+    ]
+
+    if keys:
+        clusters += similar_clusters(keys, by_key, schools, threshold, match_threshold)
+
+    clusters.sort(key=lambda cluster: (-cluster["submissions"], cluster["suggested_name"]))
+    return clusters
+
+
+def similar_clusters(keys, by_key, schools, threshold, match_threshold):
+    """
+    cluster_names for the names with a key.
+    """
+    school_keys = [cluster_key(name) for _, name in schools]
+    vocabulary = {
+        gram: column
+        for column, gram in enumerate(
+            sorted({gram for name_key in keys for gram in trigrams(name_key)})
+        )
+    }
+    grams = gram_matrix(keys, vocabulary)
+
+    groups = components(similarity(grams, grams) >= threshold)
+
+    # existing schools scored on the submitted spellings' trigrams only
+    matches = (
+        similarity(grams, gram_matrix(school_keys, vocabulary))
+        if schools
+        else np.zeros((len(keys), 0))
+    )
+
+    clusters = []
+    for group in groups:
+        spellings = Counter()
+        for i in group:
+            spellings.update(by_key[keys[i]])
+
+        suggested_school = None
+        if len(schools):
+            # submissions weigh the score, the common spelling counts most
+            weights = np.array([sum(by_key[keys[i]].values()) for i in group], dtype=float)
+            scores = weights @ matches[group] / weights.sum()
+            best = int(scores.argmax())
+            if scores[best] >= match_threshold:
+                suggested_school = {
+                    "id": schools[best][0],
+                    "name": schools[best][1],
+                    "similarity": round(float(scores[best]), 3),
+                }
+
+        clusters.append(cluster_entry(spellings, suggested_school))
+
+    return clusters
+
+
+def cluster_entry(spellings, suggested_school):
+    return {
+        "names": [
+            {"name": name, "submissions": count}
+            for name, count in spellings.most_common()
+        ],
+        "submissions": sum(spellings.values()),
+        "suggested_name": (
+            suggested_school["name"]
+            if suggested_school
+            else spellings.most_common(1)[0][0]
+        ),
+        "suggested_school": suggested_school,
+    }
+
+
+def pending_clusters(threshold=CLUSTER_THRESHOLD):
+    """
+    cluster_names over the pending NewSchool submissions, in two queries.
+    """
+    names = dict(
+        NewSchool.objects.values("name").annotate(count=Count("id")).values_list("name", "count")
+    )
+    return cluster_names(names, list(School.objects.values_list("pk", "name")), threshold)
+
+
+def approve(clusters):
+    """
+    Approve clusters in one transaction: per cluster, find or create the
+    school, move every delegate who typed one of the names to it in one
+    UPDATE and drop the submissions.
+    Args:
+        clusters: {"names", "school" (existing pk) or "approved_name"}
+    Returns:
+        list: {"school", "name", "created", "delegates"} per cluster
+    """
+    results = []
+
+    with transaction.atomic():
+        for cluster in clusters:
+            if cluster.get("school") is not None:
+                school = School.objects.get(pk=cluster["school"])
+            else:
+                school = School.objects.filter(name=cluster["approved_name"]).first()
+            created = school is None
+
+            if created:
+                school = School.objects.create(name=cluster["approved_name"])
+
+            delegates = Delegate.objects.filter(other_school__in=cluster["names"]).update(
+                other_school=None, school_id=school.pk
+            )
+            NewSchool.objects.filter(name__in=cluster["names"]).delete()
+
+            results.append(
+                {
+                    "school": school.pk,
+                    "name": school.name,
+                    "created": created,
+                    "delegates": delegates,
+                }
+            )
+
+    return results
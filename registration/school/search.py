@@ -0,0 +1,162 @@
+import bisect
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+
+from registration import cache as response_cache
+from registration.models import School
+
+# least share of the query's trigrams a misspelled match must have
+MIN_SIMILARITY = 0.5
+
+
+def normalize(text):
+    """
+    Lowercase ASCII words: accents dropped, punctuation turned into spaces.
+    """
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text.lower()).split())
+
+
+def trigrams(text):
+    """
+    Trigrams of each word, padded so the start of a word counts most.
+    """
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class SchoolIndex:
+    """
+    School names held in memory for autocomplete. Every query word must
+    start a word of the name; when that finds fewer than limit schools,
+    names sharing enough trigrams with the query fill the rest, so typos
+    still match. Never changed after it is built, searches don't lock.
+    Args:
+        rows: (pk, name) for every school
+    """
+
+    def __init__(self, rows):
+        self.pks = [pk for pk, _ in rows]
+        self.names = [name for _, name in rows]
+        self.normalized = [normalize(name) for name in self.names]
+        # shorter names first, then alphabetical
+        order = sorted(range(len(rows)), key=lambda i: (len(self.names[i]), self.names[i]))
+        self.rank = [0] * len(rows)
+        for position, i in enumerate(order):
+            self.rank[i] = position
+
+        # sorted (word, school) pairs, the words with a prefix are a range
+        pairs = sorted(
+            {(word, i) for i, name in enumerate(self.normalized) for word in name.split()}
+        )
+        self.words = [word for word, _ in pairs]
+        self.owners = [i for _, i in pairs]
+
+        self.grams = [trigrams(name) for name in self.normalized]
+        self.postings = {}
+        for i, grams in enumerate(self.grams):
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(i)
+
+    def prefix_matches(self, words):
+        matches = None
+        for word in words:
+            start = bisect.bisect_left(self.words, word)
+            # first word sorting after every word that starts with word
+            end = bisect.bisect_left(
+                self.words, word[:-1] + chr(ord(word[-1]) + 1), start
+            )
+            found = set(self.owners[start:end])
+            matches = found if matches is None else matches & found
+            if not matches:
+                return set()
+        return matches
+
+    def similar(self, query, exclude, limit):
+        grams = trigrams(query)
+        shared = Counter(
+            i for gram in grams for i in self.postings.get(gram, []) if i not in exclude
+        )
+
+        least = MIN_SIMILARITY * len(grams)
+        return [
+            i
+            for _, _, i in heapq.nsmallest(
+                limit,
+                (
+                    (-count, self.rank[i], i)
+                    for i, count in shared.items()
+                    if count >= least
+                ),
+            )
+        ]
+
+    def search(self, q, limit=10):
+        """
+        Top limit schools for a query, names starting with the query first,
+        then shorter names, then misspellings by trigrams in common.
+        Returns:
+            list: (pk, name)
+        """
+        query = normalize(q)
+        if not query:
+            return []
+
+        results = heapq.nsmallest(
+            limit,
+            self.prefix_matches(query.split()),
+            key=lambda i: (not self.normalized[i].startswith(query), self.rank[i]),
+        )
+
+        if len(results) < limit:
+            results += self.similar(query, set(results), limit - len(results))
+
+        return [(self.pks[i], self.names[i]) for i in results]
+
+
+lock = threading.Lock()
+# (version, built at, SchoolIndex) of this process
+current = (None, 0, SchoolIndex([]))
+
+
+def get_index():
+    """
+    This process's index, rebuilt first if the school data changed since
+    (see cache.version) or it is older than RESPONSE_CACHE_TIMEOUTS["schools"]
+    seconds, which bounds how stale a change made by another process can be
+    when the response cache isn't shared.
+    """
+    global current
+
+    version = response_cache.version("schools")
+
+    def fresh():
+        built_version, built_at, _ = current
+        return (
+            built_version == version
+            and time.monotonic() - built_at < response_cache.timeout("schools")
+        )
+
+    if not fresh():
+        with lock:
+            # built by another thread while this one waited
+            if not fresh():
+                current = (
+                    version,
+                    time.monotonic(),
+                    SchoolIndex(list(School.objects.values_list("pk", "name"))),
+                )
+
+    return current[2]
+
+
+def search(q, limit=10):
+    return get_index().search(q, limit)
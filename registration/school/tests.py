@@ -4,10 +4,20 @@ import pandas as pd
 from django.test import Client, TestCase
 from django.urls import reverse
 from django.contrib.auth.models import User, Group
+from registration.bulk import pipeline
+from registration.cache import response_cache
 from registration.models import School, NewSchool, Delegate
+from registration.school import clusters, search, views
+from registration.testing import (
+    AsyncViewMixin,
+    BulkUploadMixin,
+    excel_upload,
+    seed_small_event,
+)
 
 class SchoolViewTests(TestCase):
     def setUp(self):
+        response_cache().clear()
         self.client = Client()
         self.admin_user = User.objects.create_user(username='admin', password='password')
         self.admin_group = Group.objects.create(name='FACTAdmin')
@@ -121,3 +131,286 @@ class SchoolViewTests(TestCase):
         response = self.client.get(self.schools_bulk_url)
         self.assertEqual(response.status_code, 405)
         self.assertIn('Method not allowed', response.json().get('message', ''))
+
+
+class SchoolSearchTests(TestCase):
+    def setUp(self):
+        # the index is rebuilt when the cache is cleared, the schools of the
+        # previous test were rolled back without clearing it
+        response_cache().clear()
+        self.client = Client()
+        for name in [
+            'Urbana High School',
+            'University Laboratory High School',
+            'Champaign Central High School',
+            'Saint Thomas More',
+            'Académie Sainte-Marie',
+        ]:
+            School.objects.create(name=name)
+        self.url = reverse('registration:schools_search')
+
+    def names(self, q, **params):
+        response = self.client.get(self.url, {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [school['fields']['name'] for school in response.json()]
+
+    def test_prefix_of_any_word(self):
+        self.assertEqual(
+            self.names('high'),
+            [
+                'Urbana High School',
+                'Champaign Central High School',
+                'University Laboratory High School',
+            ],
+        )
+        self.assertEqual(self.names('u'), ['Urbana High School', 'University Laboratory High School'])
+        self.assertEqual(self.names('cent cham'), ['Champaign Central High School'])
+
+    def test_normalizes(self):
+        self.assertEqual(self.names('academie ste'), ['Académie Sainte-Marie'])
+        self.assertEqual(self.names('  SAINT  '), ['Saint Thomas More', 'Académie Sainte-Marie'])
+
+    def test_misspellings(self):
+        self.assertEqual(self.names('urbna')[0], 'Urbana High School')
+        self.assertEqual(self.names('champagne')[0], 'Champaign Central High School')
+
+    def test_limit(self):
+        self.assertEqual(len(self.names('high school', limit=1)), 1)
+        response = self.client.get(self.url, {'q': 'high', 'limit': 100})
+        self.assertEqual(response.status_code, 400)
+
+    def test_empty_query(self):
+        self.assertEqual(self.names(''), [])
+
+    def test_rebuilt_when_schools_change(self):
+        self.assertEqual(self.names('mahomet'), [])
+
+        # served from memory until the schools change
+        with self.assertNumQueries(0):
+            search.search('urbana')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            School.objects.create(name='Mahomet-Seymour High School')
+
+        self.assertEqual(self.names('mahomet'), ['Mahomet-Seymour High School'])
+
+
+
+class NewSchoolClusterTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.admin_user = User.objects.create_user(username='admin', password='password')
+        self.admin_user.groups.add(Group.objects.create(name='FACTAdmin'))
+        self.urbana = School.objects.create(name='Urbana High School')
+
+        typed = [
+            'Urbana High School',
+            'urbana high',
+            'Urbanna Highschool',
+            'St. Joseph-Ogden',
+            'Saint Joseph Ogden High School',
+            'Saint Joseph Ogden High School',
+        ]
+        for i, name in enumerate(typed):
+            user = User.objects.create_user(username=f'delegate-{i}', password='password')
+            Delegate.objects.create(user=user, other_school=name)
+            NewSchool.objects.create(name=name)
+
+        self.clusters_url = reverse('registration:schools_new_clusters')
+        self.batch_url = reverse('registration:schools_new_batch')
+
+    def test_clusters(self):
+        self.client.force_login(self.admin_user)
+
+        with self.assertNumQueries(2):
+            clusters.pending_clusters()
+
+        response = self.client.get(self.clusters_url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+
+        # equal submissions, by suggested name
+        self.assertEqual(len(data), 2)
+        joseph, urbana = data
+        self.assertEqual(
+            {name['name'] for name in urbana['names']},
+            {'Urbana High School', 'urbana high', 'Urbanna Highschool'},
+        )
+        self.assertEqual(urbana['suggested_school']['id'], self.urbana.pk)
+        self.assertEqual(joseph['submissions'], 3)
+        self.assertIsNone(joseph['suggested_school'])
+        self.assertEqual(joseph['suggested_name'], 'Saint Joseph Ogden High School')
+
+    def test_unkeyed_names_are_kept(self):
+        data = clusters.cluster_names({'???': 2, '-': 1, 'Urbana': 1}, [])
+
+        self.assertEqual(
+            [cluster['suggested_name'] for cluster in data], ['???', '-', 'Urbana']
+        )
+        self.assertEqual(data[0]['names'], [{'name': '???', 'submissions': 2}])
+        self.assertIsNone(data[0]['suggested_school'])
+
+    def test_clusters_non_admin(self):
+        response = self.client.get(self.clusters_url)
+        self.assertEqual(response.status_code, 403)
+
+    def test_batch_approve(self):
+        self.client.force_login(self.admin_user)
+        data = {
+            'clusters': [
+                {
+                    'names': ['Urbana High School', 'urbana high', 'Urbanna Highschool'],
+                    'school': self.urbana.pk,
+                },
+                {
+                    'names': ['St. Joseph-Ogden', 'Saint Joseph Ogden High School'],
+                    'approved_name': 'St. Joseph-Ogden High School',
+                },
+            ]
+        }
+        response = self.client.post(self.batch_url, json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+        results = response.json()['clusters']
+        self.assertEqual([result['delegates'] for result in results], [3, 3])
+        self.assertEqual([result['created'] for result in results], [False, True])
+        self.assertEqual(Delegate.objects.filter(school=self.urbana).count(), 3)
+        self.assertEqual(
+            Delegate.objects.filter(school__name='St. Joseph-Ogden High School').count(), 3
+        )
+        self.assertFalse(Delegate.objects.filter(other_school__isnull=False).exists())
+        self.assertFalse(NewSchool.objects.exists())
+
+    def test_batch_rejects_unknown_school(self):
+        self.client.force_login(self.admin_user)
+        data = {
+            'clusters': [
+                {'names': ['urbana high'], 'school': self.urbana.pk},
+                {'names': ['St. Joseph-Ogden'], 'school': self.urbana.pk + 100},
+            ]
+        }
+        response = self.client.post(self.batch_url, json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        # nothing applied
+        self.assertEqual(NewSchool.objects.count(), 6)
+
+    def test_batch_school_ids(self):
+        self.client.force_login(self.admin_user)
+
+        for school in [[self.urbana.pk], {'id': self.urbana.pk}, True, 'urbana', 1.5]:
+            data = {'clusters': [{'names': ['urbana high'], 'school': school}]}
+            response = self.client.post(self.batch_url, json.dumps(data), content_type='application/json')
+            self.assertEqual(response.status_code, 400, school)
+        self.assertEqual(NewSchool.objects.count(), 6)
+
+        # an id sent as a string
+        data = {'clusters': [{'names': ['urbana high'], 'school': str(self.urbana.pk)}]}
+        response = self.client.post(self.batch_url, json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['clusters'][0]['school'], self.urbana.pk)
+
+    def test_batch_requires_names(self):
+        self.client.force_login(self.admin_user)
+        data = {'clusters': [{'approved_name': 'Somewhere'}]}
+        response = self.client.post(self.batch_url, json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_rejects_long_name(self):
+        self.client.force_login(self.admin_user)
+        data = {'clusters': [{'names': ['urbana high'], 'approved_name': 'U' * 151}]}
+        response = self.client.post(self.batch_url, json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(School.objects.count(), 1)
+
+    def test_batch_non_admin(self):
+        response = self.client.post(self.batch_url, '{}', content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+
+class SchoolsBulkPOST(BulkUploadMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('registration:schools_bulk')
+
+    def test_creates_schools(self):
+        df = pd.DataFrame({'name': ['school a', 'school b', 'school a']})
+
+        response = self.client.post(self.url, {'schools': excel_upload(df)})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted(School.objects.values_list('name', flat=True)),
+            ['school a', 'school b'],
+        )
+
+    def test_rejects_empty_names(self):
+        df = pd.DataFrame({'name': ['school a', None, 'school c'], 'city': ['x', 'y', 'z']})
+
+        response = self.client.post(self.url, {'schools': excel_upload(df)})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][0]['row'], 3)
+        self.assertEqual(School.objects.count(), 0)
+
+    def test_10k_rows(self):
+        df = pd.DataFrame({'name': [f'school {i}' for i in range(10000)]})
+
+        self.assertBatchedUpload(self.url, 'schools', df, School)
+
+    def test_merge_keeps_schools_in_use(self):
+        in_use = School.objects.create(name='in use')
+        School.objects.create(name='unused')
+        School.objects.create(name='school a')
+        Delegate.objects.create(
+            user=User.objects.create(username='delegate'), school=in_use
+        )
+
+        response = self.client.post(
+            reverse('registration:schools_bulk') + '?mode=merge',
+            {'schools': excel_upload(pd.DataFrame({'name': ['school a', 'school b']}))},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        summary = response.json()
+        self.assertEqual(
+            (summary['created'], summary['deleted'], summary['unchanged']), (1, 1, 1)
+        )
+        self.assertEqual(summary['kept'], ['in use'])
+        self.assertEqual(
+            sorted(School.objects.values_list('name', flat=True)),
+            ['in use', 'school a', 'school b'],
+        )
+
+    def test_dry_run(self):
+        response = self.client.post(
+            reverse('registration:schools_bulk') + '?dry_run=1',
+            {'schools': excel_upload(pd.DataFrame({'name': ['a', 'b']}))},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['valid'])
+        self.assertEqual(School.objects.count(), 0)
+
+
+class SchoolsResponseCache(TestCase):
+    def setUp(self):
+        response_cache().clear()
+
+    def test_bulk_insert_invalidates(self):
+        url = reverse('registration:schools')
+        self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pipeline.bulk_insert(School, [School(name='Bulk School')])
+
+        names = [school['fields']['name'] for school in json.loads(self.client.get(url).content)]
+        self.assertIn('Bulk School', names)
+
+
+class SchoolsAsync(AsyncViewMixin, TestCase):
+    def setUp(self):
+        response_cache().clear()
+        seed_small_event()
+
+    async def test_schools(self):
+        await self.assertSameResponse(views.schools, views.schools_async)
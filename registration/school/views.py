@@ -1,11 +1,96 @@
 import json
 from django.http import HttpResponse, JsonResponse
 from django.core import serializers as django_serializers
-import pandas as pd
+from django.db import transaction
 from django.views.decorators.csrf import csrf_exempt
 
+from registration import cache as response_cache
+from registration.bulk import merge as bulk_merge
+from registration.bulk import pipeline as bulk
+from registration.school import search as school_search
 from registration.models import Delegate, NewSchool, School
 
+SCHOOL_COLUMNS = ["name"]
+SCHOOL_NAME_LENGTH = School._meta.get_field("name").max_length
+
+
+def validate_school_sheet(school_df, merge=False):
+    """
+    Validate every row of an uploaded school sheet.
+    Args:
+        school_df: Dataframe with SCHOOL_COLUMNS
+        merge: School names must also be unique
+    Returns:
+        list: Per-row errors (empty if the sheet is valid)
+    """
+    errors = bulk.missing_value_errors(
+        school_df, SCHOOL_COLUMNS, bulk.MISSING_VALUES_MESSAGE
+    )
+
+    if merge:
+        errors += bulk.duplicate_row_errors(
+            school_df, ["name"], "Duplicate school name"
+        )
+
+    return sorted(errors, key=lambda error: error["row"])
+
+
+def school_warnings(school_df):
+    """
+    Schools missing from a merge upload that will be kept because
+    delegates are attached to them.
+    """
+    names = set(bulk.text_or_none(school_df["name"]).dropna())
+    in_use = (
+        School.objects.filter(delegate__isnull=False)
+        .exclude(name__in=names)
+        .values_list("name", flat=True)
+        .distinct()
+    )
+
+    return [
+        {
+            "row": None,
+            "column": "name",
+            "message": f"{name} is not in the file but has delegates and will be kept",
+        }
+        for name in in_use
+    ]
+
+
+def build_schools(school_df):
+    """
+    Unsaved schools for every row of a validated school sheet.
+    """
+    return [School(name=name) for name in bulk.text_or_none(school_df["name"])]
+
+
+def merge_schools(schools):
+    """
+    Upsert schools on name. Schools missing from the sheet are deleted
+    unless a delegate is attached to them.
+    Returns:
+        dict: Diff summary
+    """
+    diff = bulk_merge.compute_diff(
+        School.objects.all(), schools, lambda school: school.name, []
+    )
+
+    # Delegate.school cascades, never delete a school that is in use
+    in_use = set(
+        Delegate.objects.filter(school__in=diff["delete"]).values_list(
+            "school_id", flat=True
+        )
+    )
+    kept = [school.name for school in diff["delete"] if school.pk in in_use]
+    diff["delete"] = [school for school in diff["delete"] if school.pk not in in_use]
+
+    with transaction.atomic():
+        summary = bulk_merge.apply_diff(School, diff, [])
+
+    summary["kept"] = kept
+    return summary
+
 
 def schools(request):
     """
@@ -13,8 +98,12 @@ def schools(request):
     Returns 405 for non-GET methods
     """
     if request.method == "GET":
-        school_data = django_serializers.serialize(
-            "json", School.objects.all().order_by("name")
+        school_data = response_cache.cached(
+            "schools",
+            "schools",
+            lambda: django_serializers.serialize(
+                "json", School.objects.all().order_by("name")
+            ),
         )
 
         return HttpResponse(school_data, content_type="application/json")
@@ -22,6 +111,57 @@ def schools(request):
         return JsonResponse({"message": "Method not allowed"}, status=405)
 
 
+async def schools_async(request):
+    """
+    schools for ASGI, using the async ORM and the response cache.
+    """
+    if request.method != "GET":
+        return JsonResponse({"message": "Method not allowed"}, status=405)
+
+    async def build():
+        return django_serializers.serialize(
+            "json", [school async for school in School.objects.order_by("name")]
+        )
+
+    return HttpResponse(
+        await response_cache.acached("schools", "schools", build),
+        content_type="application/json",
+    )
+
+
+def schools_search(request):
+    """
+    GET: Schools whose name matches q, for autocomplete
+    Query params:
+        - q: Start of any of the words of the name, misspellings are matched
+          when there are few results
+        - limit: Most schools returned (default 10, at most 50)
+    Returns the matches best first, in the format of schools
+    """
+    if request.method == "GET":
+        try:
+            limit = int(request.GET.get("limit", 10))
+        except ValueError:
+            return JsonResponse({"message": "limit must be a number"}, status=400)
+
+        if not 1 <= limit <= 50:
+            return JsonResponse(
+                {"message": "limit must be between 1 and 50"}, status=400
+            )
+
+        matches = school_search.search(request.GET.get("q", ""), limit)
+
+        return JsonResponse(
+            [
+                {"model": "registration.school", "pk": pk, "fields": {"name": name}}
+                for pk, name in matches
+            ],
+            safe=False,
+        )
+    else:
+        return JsonResponse({"message": "Method not allowed"}, status=405)
+
+
 def new_schools(request):
     """
     GET: List all new school submissions
@@ -69,13 +209,137 @@ def new_schools(request):
         return JsonResponse({"message": "Method not allowed"}, status=405)
 
 
+def new_school_clusters(request):
+    """
+    GET: Pending new school submissions grouped by likely school (admin only)
+    Query params:
+        - threshold: Least name similarity (0-1) to group two names (default 0.6)
+    Returns clusters, most submissions first, each with its names and
+    submission counts, a suggested name and the existing school it most
+    likely is (or null)
+    """
+    if not request.user.groups.filter(name="FACTAdmin").exists():
+        return JsonResponse(
+            {"message": "Must be admin to make this request"}, status=403
+        )
+
+    if request.method == "GET":
+        # imported here so numpy is not loaded at boot
+        from registration.school import clusters
+
+        try:
+            threshold = float(request.GET.get("threshold", clusters.CLUSTER_THRESHOLD))
+        except ValueError:
+            return JsonResponse({"message": "threshold must be a number"}, status=400)
+
+        if not 0 < threshold <= 1:
+            return JsonResponse(
+                {"message": "threshold must be between 0 and 1"}, status=400
+            )
+
+        return JsonResponse(clusters.pending_clusters(threshold), safe=False)
+    else:
+        return JsonResponse({"message": "Method not allowed"}, status=405)
+
+
+def new_schools_batch(request):
+    """
+    POST: Approve clusters of new school submissions at once (admin only)
+    Required fields for POST:
+        - clusters: List of {names, school} to move the delegates who typed
+          any of names to an existing school, or {names, approved_name} to
+          a school with that name (created if needed). school is an id, a
+          string of digits is accepted
+    Every cluster is applied in one transaction, one UPDATE each
+    Returns 403 for non-admin, 400 for invalid data
+    """
+    if not request.user.groups.filter(name="FACTAdmin").exists():
+        return JsonResponse(
+            {"message": "Must be admin to make this request"}, status=403
+        )
+
+    if request.method == "POST":
+        from registration.school import clusters
+
+        try:
+            data = json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({"message": "Invalid JSON"}, status=400)
+
+        batch = data.get("clusters") if isinstance(data, dict) else None
+        if not isinstance(batch, list) or not batch:
+            return JsonResponse({"message": "Must provide clusters"}, status=400)
+
+        school_ids = set()
+        for cluster in batch:
+            names = cluster.get("names") if isinstance(cluster, dict) else None
+            if (
+                not isinstance(names, list)
+                or not names
+                or not all(isinstance(name, str) for name in names)
+            ):
+                return JsonResponse(
+                    {"message": "Every cluster must have a list of names"}, status=400
+                )
+
+            school = cluster.get("school")
+            if school is not None:
+                if isinstance(school, str) and school.isdecimal():
+                    school = int(school)
+                if not isinstance(school, int) or isinstance(school, bool):
+                    return JsonResponse(
+                        {"message": f"School {json.dumps(school)} is not a school id"},
+                        status=400,
+                    )
+
+                cluster["school"] = school
+                school_ids.add(school)
+                continue
+
+            approved_name = cluster.get("approved_name")
+            if not isinstance(approved_name, str) or not approved_name.strip():
+                return JsonResponse(
+                    {"message": "Every cluster must have a school or an approved name"},
+                    status=400,
+                )
+
+            cluster["approved_name"] = approved_name.strip()
+            if len(cluster["approved_name"]) > SCHOOL_NAME_LENGTH:
+                return JsonResponse(
+                    {
+                        "message": f"Approved name '{cluster['approved_name']}' is longer "
+                        f"than {SCHOOL_NAME_LENGTH} characters"
+                    },
+                    status=400,
+                )
+
+        missing = school_ids - set(
+            School.objects.filter(pk__in=school_ids).values_list("pk", flat=True)
+        )
+        if missing:
+            return JsonResponse(
+                {"message": f"Schools {sorted(missing)} do not exist"},
+                status=400,
+            )
+
+        return JsonResponse(
+            {"message": "success", "clusters": clusters.approve(batch)}, status=200
+        )
+    else:
+        return JsonResponse({"message": "Method not allowed"}, status=405)
+
+
 @csrf_exempt
 def schools_bulk(request):
     """
     POST: Bulk upload schools from Excel file (admin only)
     Required file format:
-        - Excel file with column: name
+        - Excel or CSV file with column: name
         - No empty cells
+    Optional query params:
+        - mode=merge: Upsert on school name instead of requiring no schools
+        - dry_run=1: Validate the file and report every error without saving
+        - ingest=stream|frame: Insert in batches as the file is read, or read the whole file first
     Returns 403 for non-admin, 409 if schools exist, 400 for invalid data
     """
     if request.method == "POST":
@@ -85,8 +349,10 @@ def schools_bulk(request):
                 {"message": "Must be admin to make this request"}, status=403
             )
 
+        merge = bulk_merge.is_merge(request)
+
         # must have no schools
-        if School.objects.all().count() > 0:
+        if not merge and School.objects.exists():
             return JsonResponse(
                 {"message": "Delete existing schools before attempting to upload"},
                 status=409,
@@ -95,42 +361,48 @@ def schools_bulk(request):
         if "schools" not in request.FILES:
             return JsonResponse({"message": "Must include file"}, status=400)
 
-        file = request.FILES["schools"]
-        school_df = None
-
-        try:
-            school_df = pd.read_excel(file)
-        except:
-            return JsonResponse({"message": "Error reading file"}, status=400)
+        if (
+            not merge
+            and not bulk.is_dry_run(request)
+            and bulk.is_streaming(request, "schools")
+        ):
+            _, error = bulk.stream_import(
+                request.FILES["schools"],
+                SCHOOL_COLUMNS,
+                validate_school_sheet,
+                build_schools,
+                School,
+            )
+            if error:
+                return JsonResponse(error, status=400)
 
-        school_df = school_df.drop_duplicates()
-        # when loading in df, pandas will add ".#" to duplicate columns
-        school_df.columns = [x.lower().split(".")[0] for x in school_df.columns]
+            data = django_serializers.serialize("json", School.objects.all())
+            return HttpResponse(data, content_type="application/json")
 
-        # validate data
-        columns_set = set(school_df.columns)
+        school_df, error = bulk.load_sheet(request.FILES["schools"], SCHOOL_COLUMNS)
+        if error:
+            return JsonResponse(error, status=400)
 
-        if len(columns_set) != len(school_df.columns):
-            return JsonResponse({"message": "Duplicate column names"}, status=400)
+        errors = validate_school_sheet(school_df, merge=merge)
 
-        expected_columns = ["name"]
+        if bulk.is_dry_run(request):
+            warnings = school_warnings(school_df) if merge else []
+            body, status = bulk.dry_run_report(school_df, errors, warnings)
+            return JsonResponse(body, status=status)
 
-        for i in range(len(expected_columns)):
-            if expected_columns[i] not in columns_set:
-                return JsonResponse(
-                    {"message": f"Missing column {expected_columns[i]}"}, status=400
-                )
-
-        if school_df.isnull().values.any():
+        if errors:
             return JsonResponse(
-                {"message": "Missing values - make sure there are no empty cells"},
-                status=400,
+                bulk.error_report(errors[0]["message"], errors), status=400
             )
 
+        schools = build_schools(school_df)
+
+        if merge:
+            summary = merge_schools(schools)
+            return JsonResponse({"message": "Merge complete", **summary})
+
         # create schools
-        for index, row in school_df.iterrows():
-            school = School(name=row["name"])
-            school.save()
+        bulk.bulk_insert(School, schools)
 
         data = django_serializers.serialize("json", School.objects.all())
         return HttpResponse(data, content_type="application/json")
@@ -0,0 +1,321 @@
+import datetime
+import random
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from fact_admin.models import AgendaItem
+from registration import events
+from registration.popularity import zipf_weights
+from registration.models import (
+    Delegate,
+    Facilitator,
+    FacilitatorAssistant,
+    FacilitatorWorkshop,
+    Location,
+    Registration,
+    RegistrationEvent,
+    RegistrationMinute,
+    School,
+    Workshop,
+)
+
+BATCH_SIZE = 2000
+
+FIRST_NAMES = [
+    "Alex", "Ana", "Ben", "Chloe", "Daniel", "Emma", "Farah", "Grace", "Hiro",
+    "Isaac", "Jada", "Kai", "Leah", "Mateo", "Nina", "Omar", "Priya", "Quinn",
+    "Rosa", "Sam", "Tariq", "Uma", "Victor", "Wei", "Yara", "Zoe",
+]
+LAST_NAMES = [
+    "Adams", "Brown", "Chen", "Davis", "Evans", "Garcia", "Hernandez", "Ito",
+    "Johnson", "Kim", "Lopez", "Martin", "Nguyen", "Okafor", "Patel", "Rivera",
+    "Smith", "Taylor", "Walker", "Young",
+]
+PRONOUNS = ["she/her", "he/him", "they/them"]
+YEARS = ["Freshman", "Sophomore", "Junior", "Senior"]
+
+# (start, end, title, session), times of the event day
+AGENDA = [
+    ("08:00", "09:00", "Check-in", None),
+    ("09:00", "09:45", "Opening keynote", None),
+    ("10:00", "10:50", "Workshop session", 1),
+    ("11:00", "11:50", "Workshop session", 2),
+    ("12:00", "13:00", "Lunch", None),
+    ("13:10", "14:00", "Workshop session", 3),
+    ("14:15", "15:15", "Networking session", None),
+    ("15:30", "16:00", "Closing ceremony", None),
+]
+
+
+def seed_event(
+    seed=2025,
+    schools=40,
+    workshops_per_session=12,
+    capacity=30,
+    delegates=0,
+    assistants=2,
+    skew=1.0,
+    password=None,
+):
+    """
+    Create a synthetic event with bulk_create: schools, a location and a
+    workshop with a facilitator and assistants for every slot of the three
+    sessions, the agenda, and delegates registered for a workshop in each
+    session, popular workshops first (Zipf curve over a random ranking).
+    The same arguments always create the same event.
+    Args:
+        seed: Random seed
+        schools: Number of schools
+        workshops_per_session: Workshops (and locations) in each session
+        capacity: Average room capacity
+        delegates: Number of delegates, registered while there are seats
+        assistants: Most assistants per workshop
+        skew: Zipf exponent of workshop popularity
+        password: Password of every delegate and facilitator account, None
+            for unusable passwords
+    Returns:
+        dict: Created counts
+    """
+    rng = random.Random(seed)
+
+    with transaction.atomic():
+        school_objs = School.objects.bulk_create(
+            [School(name=f"Synthetic School {i + 1}") for i in range(schools)]
+        )
+
+        locations = Location.objects.bulk_create(
+            [
+                Location(
+                    building=f"Hall {i % 8 + 1}",
+                    room_num=f"{session}{i + 1:02}",
+                    capacity=max(5, int(rng.gauss(capacity, capacity / 4))),
+                    session=session,
+                    moveable_seats=rng.random() < 0.5,
+                )
+                for session in range(1, 4)
+                for i in range(workshops_per_session)
+            ]
+        )
+
+        workshops = Workshop.objects.bulk_create(
+            [
+                Workshop(
+                    title=f"Workshop {location.session}.{i % workshops_per_session + 1}",
+                    description="Synthetic workshop",
+                    session=location.session,
+                    location=location,
+                    moveable_seats=location.moveable_seats,
+                )
+                for i, location in enumerate(locations)
+            ]
+        )
+
+        # hashing once keeps tens of thousands of accounts fast
+        password = make_password(password)
+
+        counts = {
+            "schools": len(school_objs),
+            "locations": len(locations),
+            "workshops": len(workshops),
+            **seed_staff(rng, workshops, assistants, password),
+            "agenda_items": seed_agenda(),
+            **seed_delegates(rng, school_objs, workshops, delegates, skew, password),
+        }
+
+    return counts
+
+
+def seed_staff(rng, workshops, assistants, password):
+    """
+    A facilitator account per workshop and up to assistants assistants each.
+    """
+    users = User.objects.bulk_create(
+        [
+            User(
+                username=f"synthetic.facilitator{i + 1}",
+                email=f"synthetic.facilitator{i + 1}@example.com",
+                password=password,
+            )
+            for i in range(len(workshops))
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    facilitators = Facilitator.objects.bulk_create(
+        [
+            Facilitator(
+                user=user,
+                fa_name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                fa_contact=user.email,
+                department_name=f"Department {i + 1}",
+                position="Professor",
+                image_url="https://example.com/facilitator.png",
+                bio="Synthetic facilitator",
+                attending_networking_session=rng.random() < 0.5,
+            )
+            for i, user in enumerate(users)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    FacilitatorWorkshop.objects.bulk_create(
+        [
+            FacilitatorWorkshop(facilitator=facilitator, workshop=workshop)
+            for facilitator, workshop in zip(facilitators, workshops)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    assistant_objs = FacilitatorAssistant.objects.bulk_create(
+        [
+            FacilitatorAssistant(
+                name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                contact=f"synthetic.assistant{workshop.pk}.{i + 1}@example.com",
+                workshop=workshop,
+            )
+            for workshop in workshops
+            for i in range(rng.randint(0, assistants))
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    return {"facilitators": len(facilitators), "assistants": len(assistant_objs)}
+
+
+def seed_agenda():
+    day = timezone.now().date() + datetime.timedelta(days=30)
+
+    def at(time):
+        hour, minute = time.split(":")
+        return timezone.make_aware(
+            datetime.datetime.combine(day, datetime.time(int(hour), int(minute)))
+        )
+
+    items = AgendaItem.objects.bulk_create(
+        [
+            AgendaItem(
+                title=title,
+                building="Hall 1" if session is None else None,
+                room_num="Auditorium" if session is None else None,
+                start_time=at(start),
+                end_time=at(end),
+                session_num=session,
+            )
+            for start, end, title, session in AGENDA
+        ]
+    )
+
+    return len(items)
+
+
+def seed_delegates(rng, schools, workshops, count, skew, password):
+    """
+    count delegate accounts. Delegates register for one workshop per session
+    while every session still has seats, drawing workshops by popularity and
+    redrawing among the rest when one fills up.
+    """
+    users = User.objects.bulk_create(
+        [
+            User(
+                username=f"synthetic.delegate{i + 1}@example.com",
+                email=f"synthetic.delegate{i + 1}@example.com",
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                password=password,
+            )
+            for i in range(count)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    delegates = Delegate.objects.bulk_create(
+        [
+            Delegate(
+                user=user,
+                pronouns=rng.choice(PRONOUNS),
+                year=rng.choice(YEARS),
+                school=rng.choice(schools) if schools else None,
+            )
+            for user in users
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    sessions = []
+    for session in range(1, 4):
+        ranked = [w for w in workshops if w.session == session]
+        rng.shuffle(ranked)
+        sessions.append(
+            {
+                "workshops": ranked,
+                "weights": zipf_weights(len(ranked), skew),
+                "seats": [w.location.capacity for w in ranked],
+            }
+        )
+
+    registered = min([count] + [sum(s["seats"]) for s in sessions])
+
+    registrations = []
+    for delegate in delegates[:registered]:
+        for session in sessions:
+            i = rng.choices(range(len(session["workshops"])), session["weights"])[0]
+            registrations.append(
+                Registration(delegate=delegate, workshop=session["workshops"][i])
+            )
+
+            session["seats"][i] -= 1
+            if session["seats"][i] == 0:
+                session["weights"][i] = 0
+
+    Registration.objects.bulk_create(registrations, batch_size=BATCH_SIZE)
+
+    # log them too, so the seat counters and histogram match
+    now = timezone.now()
+    events.log(
+        [
+            RegistrationEvent(
+                kind=RegistrationEvent.REGISTER,
+                delegate=registration.delegate,
+                workshop=registration.workshop,
+                session=registration.workshop.session,
+                created_at=now,
+            )
+            for registration in registrations
+        ]
+    )
+
+    return {"delegates": len(delegates), "registrations": len(registrations)}
+
+
+def seeding_allowed():
+    """
+    Whether synthetic events may be seeded (or the event cleared) here, only
+    on development databases.
+    """
+    return settings.DEBUG or settings.DEVELOPMENT_MODE
+
+
+def clear_event():
+    """
+    Delete the whole event: schools, locations, workshops, agenda, the
+    registration log, and the delegate and facilitator accounts with
+    everything that hangs off them.
+    Admin accounts are kept.
+    """
+    with transaction.atomic():
+        # before the accounts and workshops, whose deletes would log them
+        Registration.objects.all().delete()
+        RegistrationEvent.objects.all().delete()
+        RegistrationMinute.objects.all().delete()
+        User.objects.filter(
+            Q(delegate__isnull=False) | Q(facilitator__isnull=False)
+        ).delete()
+        Workshop.objects.all().delete()
+        Location.objects.all().delete()
+        School.objects.all().delete()
+        AgendaItem.objects.all().delete()
@@ -10,6 +10,7 @@ from registration.models import (
 )
 from django.contrib.auth.models import User
 from django.core import serializers
+from django.db.models import Count
 
 
 def serialize_workshop(workshop, include_fas=False):
@@ -17,8 +18,6 @@ def serialize_workshop(workshop, include_fas=False):
     Serializes workshop data including location, facilitators, and registration count.
     Optional: Include facilitator assistants.
     """
-    workshop_data = serializers.serialize("json", [workshop])
-    location_data = serializers.serialize("json", [workshop.location])
     registrations = Registration.objects.filter(workshop_id=workshop.pk)
     facilitator_registrations = FacilitatorRegistration.objects.filter(
         workshop_id=workshop.pk
@@ -26,26 +25,125 @@ def serialize_workshop(workshop, include_fas=False):
     facilitators = FacilitatorWorkshop.objects.filter(workshop_id=workshop.pk).values(
         "facilitator"
     )
-    facilitator_data = serializers.serialize(
-        "json", Facilitator.objects.filter(pk__in=facilitators)
+
+    assistants = None
+    if include_fas:
+        assistants = FacilitatorAssistant.objects.filter(workshop_id=workshop.pk)
+
+    return workshop_data(
+        workshop,
+        registrations.count() + facilitator_registrations.count(),
+        Facilitator.objects.filter(pk__in=facilitators),
+        assistants,
     )
 
+
+def workshop_data(workshop, registrations, facilitators, assistants=None):
+    """
+    serialize_workshop output from already loaded data.
+    Args:
+        registrations: Delegate and facilitator registration count
+        facilitators: Facilitators of the workshop
+        assistants: Facilitator assistants, left out if None
+    """
+    workshop_data = serializers.serialize("json", [workshop])
+    location_data = serializers.serialize("json", [workshop.location])
+    facilitator_data = serializers.serialize("json", facilitators)
+
     data = {
         "workshop": json.JSONDecoder().decode(workshop_data),
         "location": json.JSONDecoder().decode(location_data),
         "facilitators": json.JSONDecoder().decode(facilitator_data),
-        "registrations": registrations.count() + facilitator_registrations.count(),
+        "registrations": registrations,
     }
 
-    if include_fas:
-        fa_data = serializers.serialize(
-            "json", FacilitatorAssistant.objects.filter(workshop_id=workshop.pk)
-        )
+    if assistants is not None:
+        fa_data = serializers.serialize("json", assistants)
         data["facilitator_assistants"] = json.JSONDecoder().decode(fa_data)
 
     return data
 
 
+def with_counts(workshops):
+    return workshops.select_related("location").annotate(
+        delegate_count=Count("registration", distinct=True),
+        facilitator_count=Count("facilitatorregistration", distinct=True),
+    )
+
+
+def facilitator_links(ids):
+    return (
+        FacilitatorWorkshop.objects.filter(workshop_id__in=ids)
+        .select_related("facilitator")
+        .order_by("facilitator_id")
+    )
+
+
+def workshop_assistants(ids):
+    return FacilitatorAssistant.objects.filter(workshop_id__in=ids).order_by("pk")
+
+
+def workshops_data(workshops, links, assistants=None):
+    """
+    serialize_workshop for loaded workshops, shared by the sync and async
+    versions which only differ in how they run the queries.
+    Args:
+        workshops: Workshops from with_counts
+        links: FacilitatorWorkshops of the workshops, with their facilitator
+        assistants: Facilitator assistants of the workshops, left out if None
+    Returns:
+        dict: {workshop pk: serialized workshop}
+    """
+    facilitators = {}
+    for link in links:
+        by_pk = facilitators.setdefault(link.workshop_id, {})
+        by_pk[link.facilitator_id] = link.facilitator
+
+    by_workshop = {}
+    for assistant in assistants or []:
+        by_workshop.setdefault(assistant.workshop_id, []).append(assistant)
+
+    return {
+        workshop.pk: workshop_data(
+            workshop,
+            workshop.delegate_count + workshop.facilitator_count,
+            list(facilitators.get(workshop.pk, {}).values()),
+            by_workshop.get(workshop.pk, []) if assistants is not None else None,
+        )
+        for workshop in workshops
+    }
+
+
+def serialize_workshops(workshops, include_fas=False):
+    """
+    serialize_workshop for every workshop of a queryset, in three queries.
+    Returns:
+        dict: {workshop pk: serialized workshop}
+    """
+    workshops = list(with_counts(workshops))
+    ids = [workshop.pk for workshop in workshops]
+
+    return workshops_data(
+        workshops,
+        list(facilitator_links(ids)),
+        list(workshop_assistants(ids)) if include_fas else None,
+    )
+
+
+async def aserialize_workshops(workshops, include_fas=False):
+    """
+    serialize_workshops with the async ORM.
+    """
+    workshops = [workshop async for workshop in with_counts(workshops)]
+    ids = [workshop.pk for workshop in workshops]
+
+    return workshops_data(
+        workshops,
+        [link async for link in facilitator_links(ids)],
+        [assistant async for assistant in workshop_assistants(ids)] if include_fas else None,
+    )
+
+
 def serialize_user(user):
     """
     Serializes user data including delegate profile and workshop registrations.
@@ -75,13 +173,9 @@ def serialize_facilitator(facilitator):
         "json", FacilitatorWorkshop.objects.filter(facilitator=facilitator)
     )
 
-    registrations = FacilitatorRegistration.objects.none()
-    for name in facilitator.facilitators.split(","):
-        registrations = registrations | FacilitatorRegistration.objects.filter(
-            facilitator_name=name.strip()
-        )
-
-    registrations = serializers.serialize("json", registrations)
+    registrations = serializers.serialize(
+        "json", FacilitatorRegistration.objects.filter(member__facilitator=facilitator)
+    )
 
     # get a list of workshops that the facilitator is facilitating
     data = {
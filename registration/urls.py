@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 
 from .delegate import views as delegate_views
@@ -6,17 +7,33 @@ from .location import views as location_views
 from .school import views as school_views
 from .workshop import views as workshop_views
 
+# async read views for ASGI servers, see ASYNC_READ_VIEWS
+ASYNC = settings.ASYNC_READ_VIEWS
+
 app_name = "registration"
 urlpatterns = [
     path("workshops/", workshop_views.workshops, name="workshop"),
-    path("workshops/<int:id>/", workshop_views.workshop_id, name="workshop_id"),
-    path("workshops/all/", workshop_views.workshops_all, name="workshops_all"),
+    path(
+        "workshops/<int:id>/",
+        workshop_views.workshop_id_async if ASYNC else workshop_views.workshop_id,
+        name="workshop_id",
+    ),
+    path(
+        "workshops/all/",
+        workshop_views.workshops_all_async if ASYNC else workshop_views.workshops_all,
+        name="workshops_all",
+    ),
     path("workshops/bulk/", workshop_views.workshops_bulk, name="workshops_bulk"),
     path("locations/bulk/", location_views.locations_bulk, name="locations_bulk"),
     path("locations/", location_views.locations, name="location"),
     path("locations/<int:id>/", location_views.location_id, name="location_id"),
     path("facilitators/", facilitator_views.facilitators, name="facilitators"),
     path("facilitators/me/", facilitator_views.me, name="facilitators_me"),
+    path(
+        "facilitators/me/dashboard/",
+        facilitator_views.dashboard,
+        name="facilitators_dashboard",
+    ),
     path(
         "facilitators/login/",
         facilitator_views.login_facilitator,
@@ -36,9 +53,20 @@ urlpatterns = [
     path("delegates/", delegate_views.delegates, name="delegates"),
     path("delegates/create-account", delegate_views.create_delegate, name="delegates_create"),
     path("delegates/login/", delegate_views.login_delegate, name="delegates_login"),
-    path("schools/", school_views.schools, name="schools"),
+    path(
+        "schools/",
+        school_views.schools_async if ASYNC else school_views.schools,
+        name="schools",
+    ),
+    path("schools/search/", school_views.schools_search, name="schools_search"),
     path("schools/bulk/", school_views.schools_bulk, name="schools_bulk"),
     path("schools/new/", school_views.new_schools, name="schools_new"),
+    path(
+        "schools/new/clusters/",
+        school_views.new_school_clusters,
+        name="schools_new_clusters",
+    ),
+    path("schools/new/batch/", school_views.new_schools_batch, name="schools_new_batch"),
     path("users/logout/", delegate_views.logout_user, name="logout"),
     path(
         "users/request-reset-password/",
@@ -1,18 +1,45 @@
 import json
 import os
 import random
+import time as timer
 import pandas as pd
+from unittest import mock
 
+from asgiref.sync import async_to_sync
+from django.core import mail
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.http import Http404
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth.models import User, Group
-from registration.models import Delegate, Location, Registration, Workshop
+from registration import cache as response_cache
+from registration import serializers
+from registration.models import (
+    AccountSetUp,
+    Delegate,
+    Facilitator,
+    FacilitatorRegistration,
+    FacilitatorWorkshop,
+    Location,
+    Registration,
+    Workshop,
+)
+from registration.testing import (
+    AsyncViewMixin,
+    BulkUploadMixin,
+    excel_upload,
+    seed_small_event,
+    workshop_df,
+)
+from registration.workshop import views as workshop_views
 
 from registration.models import Location, Workshop
 
 class WorkshopAPITestCase(TestCase):
     def setUp(self):
+        response_cache.response_cache().clear()
         self.client = Client()
         self.location = Location.objects.create(
             room_num="Test Room", building="Test Building", capacity=100
@@ -424,3 +451,307 @@ class WorkshopPOSTBulk(TestCase):
                 facilitators=row["facilitators"],
                 session=row["SessIOn"]
             ).exists())
+
+
+class WorkshopsBulkPOST(BulkUploadMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("registration:workshops_bulk")
+
+        for session in range(1, 4):
+            for room in range(2):
+                Location.objects.create(
+                    building="building",
+                    room_num=f"{session}{room}",
+                    capacity=50,
+                    session=session,
+                    moveable_seats=True,
+                )
+
+    @mock.patch.dict(os.environ, {"EMAIL_HOST_USER": "fact@example.com"})
+    def test_creates_workshops_and_facilitators(self):
+        response = self.client.post(self.url, {"workshops": excel_upload(workshop_df())})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Workshop.objects.count(), 3)
+        self.assertEqual(Facilitator.objects.count(), 3)
+        self.assertEqual(FacilitatorWorkshop.objects.count(), 4)
+        self.assertTrue(
+            Facilitator.objects.get(department_name="dept a").attending_networking_session
+        )
+        self.assertEqual(Facilitator.objects.get(department_name="dept b").position, "lead")
+        self.assertEqual(
+            set(
+                Facilitator.objects.get(department_name="dept a").members.values_list(
+                    "name", flat=True
+                )
+            ),
+            {"a", "b"},
+        )
+        self.assertEqual(Workshop.objects.get(title="advanced").preferred_cap, 30)
+        self.assertEqual(Workshop.objects.filter(location=None).count(), 0)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_reports_bad_rows(self):
+        df = workshop_df()
+        df.at[1, "session"] = 5
+        df.at[2, "bio"] = None
+
+        response = self.client.post(self.url, {"workshops": excel_upload(df)})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [(error["row"], error["column"]) for error in response.json()["errors"]],
+            [(3, "session"), (4, "bio")],
+        )
+        self.assertEqual(Workshop.objects.count(), 0)
+
+
+class WorkshopsBulkModes(BulkUploadMixin, TestCase):
+    @mock.patch.dict(os.environ, {"EMAIL_HOST_USER": "fact@example.com"})
+    def test_merge(self):
+        facilitator = Facilitator.objects.create(
+            user=User.objects.create(username="dept"),
+            department_name="dept",
+            facilitators="a, b",
+        )
+        updated = Workshop.objects.create(title="updated", description="old", session=1)
+        registered = Workshop.objects.create(title="registered", description="d", session=2)
+        removed = Workshop.objects.create(title="removed", description="d", session=2)
+        for workshop in [updated, registered, removed]:
+            FacilitatorWorkshop.objects.create(facilitator=facilitator, workshop=workshop)
+        FacilitatorRegistration.objects.create(
+            facilitator_name="a", workshop=registered
+        )
+        for session in [1, 2, 2]:
+            Location.objects.create(building="building", capacity=10, session=session)
+
+        df = pd.DataFrame(
+            {
+                "title": ["updated", "new"],
+                "session": [1, 2],
+                "description": ["new description", "description"],
+                "department_name": ["dept", "new dept"],
+                "facilitators": ["a, b", "c"],
+                "image_url": ["https://example.com/a.png"] * 2,
+                "bio": ["bio"] * 2,
+                "networking_session": [0, 1],
+                "position": [None, None],
+                "preferred_cap": [None, 30],
+                "moveable_seats": [0, 1],
+            }
+        )
+
+        response = self.client.post(
+            reverse("registration:workshops_bulk") + "?mode=merge",
+            {"workshops": excel_upload(df)},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        summary = response.json()
+        self.assertEqual(
+            (summary["created"], summary["updated"], summary["deleted"]), (1, 1, 1)
+        )
+        self.assertEqual(summary["kept"], [str(registered)])
+
+        self.assertEqual(Workshop.objects.get(pk=updated.pk).description, "new description")
+        self.assertFalse(Workshop.objects.filter(pk=removed.pk).exists())
+
+        new = Workshop.objects.get(title="new")
+        self.assertEqual(new.preferred_cap, 30)
+        self.assertTrue(
+            FacilitatorWorkshop.objects.filter(
+                workshop=new, facilitator__department_name="new dept"
+            ).exists()
+        )
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_merge_creating_nothing(self):
+        facilitator = Facilitator.objects.create(
+            user=User.objects.create(username="dept"), department_name="dept"
+        )
+        workshop = Workshop.objects.create(title="intro", description="old", session=1)
+        FacilitatorWorkshop.objects.create(facilitator=facilitator, workshop=workshop)
+        Location.objects.create(building="building", capacity=10, session=1)
+
+        df = workshop_df().iloc[:1]
+        df.at[0, "department_name"] = "dept"
+
+        for sheet in [df, df.iloc[:0]]:
+            response = self.client.post(
+                reverse("registration:workshops_bulk") + "?mode=merge",
+                {"workshops": excel_upload(sheet)},
+            )
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["created"], 0)
+
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_dry_run_5k_rows(self):
+        rows = 5000
+        df = pd.concat([workshop_df()] * (rows // 4), ignore_index=True)
+        df["title"] = [f"workshop {i}" for i in range(rows)]
+        df.at[10, "session"] = 4
+        df.at[4000, "description"] = None
+
+        Location.objects.create(building="building", capacity=10, session=1)
+        upload = excel_upload(df)
+
+        start = timer.perf_counter()
+        response = self.client.post(
+            reverse("registration:workshops_bulk") + "?dry_run=1",
+            {"workshops": upload},
+        )
+        elapsed = timer.perf_counter() - start
+
+        self.assertEqual(response.status_code, 400)
+        data = response.json()
+        self.assertEqual(data["rows"], rows)
+        self.assertEqual(
+            [(error["row"], error["column"]) for error in data["errors"]],
+            [
+                (12, "session"),
+                (4002, "description"),
+                (None, "session"),
+                (None, "session"),
+                (None, "session"),
+            ],
+        )
+        self.assertEqual(Workshop.objects.count(), 0)
+        self.assertEqual(Facilitator.objects.count(), 0)
+        self.assertLess(elapsed, 1)
+
+
+class FacilitatorProvisioning(TestCase):
+    def test_accounts_use_set_up_tokens(self):
+        facilitators, urls = workshop_views.provision_facilitators(workshop_df())
+
+        self.assertEqual(sorted(facilitators), ["dept a", "dept b", "dept c"])
+        self.assertEqual(len(urls), 3)
+
+        for department, username, url in urls:
+            user = User.objects.get(username=username)
+            self.assertEqual(user.first_name, department)
+            self.assertFalse(user.has_usable_password())
+            self.assertTrue(
+                url.endswith(AccountSetUp.objects.get(username=username).token)
+            )
+
+    def test_reuses_existing_facilitators(self):
+        user = User.objects.create(username="depta1234")
+        existing = Facilitator.objects.create(
+            user=user, department_name="dept a", image_url="https://example.com", bio="bio"
+        )
+
+        facilitators, urls = workshop_views.provision_facilitators(workshop_df())
+
+        self.assertEqual(facilitators["dept a"], existing)
+        self.assertEqual(sorted(url[0] for url in urls), ["dept b", "dept c"])
+        existing.refresh_from_db()
+        self.assertTrue(existing.attending_networking_session)
+
+    def test_200_workshops_in_a_few_queries(self):
+        rows = 200
+        df = pd.concat([workshop_df()] * (rows // 4), ignore_index=True)
+        df["title"] = [f"workshop {i}" for i in range(rows)]
+        df["department_name"] = [f"dept {i // 2}" for i in range(rows)]
+
+        with CaptureQueriesContext(connection) as queries:
+            urls = workshop_views.provision_workshops(df)
+
+        self.assertEqual(len(urls), rows // 2)
+        self.assertEqual(Workshop.objects.count(), rows)
+        self.assertEqual(FacilitatorWorkshop.objects.count(), rows)
+        self.assertEqual(AccountSetUp.objects.count(), rows // 2)
+        self.assertLess(len(queries), 20)
+
+
+class WorkshopsResponseCache(TestCase):
+    def setUp(self):
+        response_cache.response_cache().clear()
+        seed_small_event()
+        self.client = Client()
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_hit_skips_the_database(self):
+        url = reverse("registration:workshops_all")
+
+        first = self.get(url)
+        second = self.get(url)
+
+        self.assertGreater(first.query_stats["queries"], 0)
+        self.assertEqual(second.query_stats["queries"], 0)
+        self.assertEqual(first.content, second.content)
+
+    def test_saving_a_cached_model_invalidates(self):
+        url = reverse("registration:workshops_all")
+        self.get(url)
+
+        workshop = Workshop.objects.first()
+        workshop.title = "Renamed"
+        with self.captureOnCommitCallbacks(execute=True):
+            workshop.save()
+
+        data = json.loads(self.get(url).content)
+        self.assertEqual(data[str(workshop.pk)]["workshop"][0]["fields"]["title"], "Renamed")
+
+    def test_workshop_404_is_not_cached(self):
+        url = reverse("registration:workshop_id", kwargs={"id": 999})
+
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class WorkshopsAsync(AsyncViewMixin, TestCase):
+    def setUp(self):
+        response_cache.response_cache().clear()
+        seed_small_event()
+
+    async def test_catalog(self):
+        await self.assertSameResponse(
+            workshop_views.workshops_all, workshop_views.workshops_all_async
+        )
+
+    async def test_workshop_id(self):
+        workshop = await Workshop.objects.afirst()
+        facilitator = await Facilitator.objects.select_related("user").afirst()
+
+        await self.assertSameResponse(
+            workshop_views.workshop_id, workshop_views.workshop_id_async, workshop.pk
+        )
+        # facilitators also see the assistants
+        await self.assertSameResponse(
+            workshop_views.workshop_id,
+            workshop_views.workshop_id_async,
+            workshop.pk,
+            user=facilitator.user,
+        )
+
+    async def test_workshop_id_not_found(self):
+        with self.assertRaises(Http404):
+            await workshop_views.workshop_id_async(self.view_request(), 999)
+
+    def test_catalog_is_two_queries(self):
+        # workshops with locations and seat counts, then facilitator links
+        with self.assertNumQueries(2):
+            async_to_sync(workshop_views.workshops_all_async)(self.view_request())
+
+        response_cache.response_cache().clear()
+        with self.assertNumQueries(2):
+            workshop_views.workshops_all(self.view_request())
+
+    def test_batched_matches_per_workshop(self):
+        workshops = Workshop.objects.all()
+
+        self.assertEqual(
+            serializers.serialize_workshops(workshops, include_fas=True),
+            {
+                workshop.pk: serializers.serialize_workshop(workshop, include_fas=True)
+                for workshop in workshops
+            },
+        )
@@ -1,28 +1,57 @@
 import json
 import os
-import pandas as pd
 
-from django.http import HttpResponse, JsonResponse
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404
 
+from registration import cache as response_cache
 from registration import serializers
-from registration.facilitator.views import create_facilitator_account
+from registration.bulk import merge as bulk_merge
+from registration.bulk import pipeline as bulk
+from registration.facilitator.members import sync_members
+from registration.facilitator.views import build_account_set_up, facilitator_username
 from registration.models import (
+    AccountSetUp,
     Facilitator,
+    FacilitatorRegistration,
     FacilitatorWorkshop,
     Location,
+    Registration,
     Workshop,
 )
 from ..management.commands.matchworkshoplocations import set_locations
 
+from django.contrib.auth.models import User
 from django.core import serializers as django_serializers
 from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import Count
 from django.views.decorators.csrf import csrf_exempt
 
-import environ
+from fact_registration_backend.environment import env
+from fact_registration_backend.lazy import lazy_import
 
-env = environ.Env()
-environ.Env.read_env()
+pd = lazy_import("pandas")
+
+WORKSHOP_COLUMNS = [
+    "title",
+    "session",
+    "description",
+    "department_name",
+    "facilitators",
+    "image_url",
+    "bio",
+    "networking_session",
+    "position",
+    "preferred_cap",
+    "moveable_seats",
+]
+
+OPTIONAL_WORKSHOP_COLUMNS = ["position", "preferred_cap"]
+
+# fields updated when merging an upload into existing workshops
+WORKSHOP_MERGE_FIELDS = ["description", "preferred_cap", "moveable_seats"]
 
 
 def workshops(request):
@@ -73,6 +102,340 @@ def workshops(request):
         return JsonResponse({"message": "Method not allowed"}, status=400)
 
 
+def validate_workshop_sheet(workshop_df):
+    """
+    Validate every row of an uploaded workshop sheet.
+    Args:
+        workshop_df: Dataframe with WORKSHOP_COLUMNS
+    Returns:
+        list: Per-row errors (empty if the sheet is valid)
+    """
+    required_columns = [
+        column for column in WORKSHOP_COLUMNS if column not in OPTIONAL_WORKSHOP_COLUMNS
+    ]
+
+    errors = bulk.missing_value_errors(
+        workshop_df, required_columns, bulk.MISSING_VALUES_MESSAGE
+    )
+
+    invalid_sessions = workshop_df["session"].notnull() & ~workshop_df["session"].isin(
+        [1, 2, 3]
+    )
+    for idx in workshop_df.index[invalid_sessions]:
+        errors.append(
+            bulk.row_error(
+                idx,
+                "session",
+                f"{workshop_df.at[idx, 'session']} is not a valid session number",
+            )
+        )
+
+    return sorted(errors, key=lambda error: error["row"])
+
+
+def location_shortage_errors(workshop_df):
+    """
+    Cross check an uploaded workshop sheet against the locations table.
+    Every session needs at least one location per workshop title.
+    Returns:
+        list: One error per session without enough locations
+    """
+    # need to account for duplicate workshop names because of career panels
+    workshop_count = workshop_df.groupby("session")["title"].nunique()
+    location_count = dict(
+        Location.objects.values_list("session").annotate(count=Count("id"))
+    )
+
+    return [
+        {
+            "row": None,
+            "column": "session",
+            "message": f"Not enough locations for given workshops in session {i}",
+        }
+        for i in range(1, 4)
+        if workshop_count.get(i, 0) > location_count.get(i, 0)
+    ]
+
+
+def preferred_cap(value):
+    """
+    Preferred caps are optional, anything that is not a number is ignored.
+    """
+    try:
+        return int(value)
+    except:
+        return None
+
+
+def build_workshop(row):
+    """
+    Unsaved workshop for a row of the workshop sheet.
+    """
+    return Workshop(
+        title=row.title,
+        description=row.description,
+        session=int(row.session),
+        moveable_seats=bool(row.moveable_seats),
+        preferred_cap=preferred_cap(row.preferred_cap),
+    )
+
+
+def workshop_key(workshop):
+    return (workshop.title, int(workshop.session))
+
+
+def unique_usernames(department_names):
+    """
+    One new facilitator username per department, regenerating any that
+    clash with each other or with existing users.
+    """
+    usernames = [facilitator_username(name) for name in department_names]
+
+    while True:
+        taken = set(
+            User.objects.filter(username__in=usernames).values_list("username", flat=True)
+        )
+        seen = set()
+        clashes = False
+
+        for i, username in enumerate(usernames):
+            if username in taken or username in seen:
+                usernames[i] = facilitator_username(department_names[i])
+                clashes = True
+            seen.add(usernames[i])
+
+        if not clashes:
+            return usernames
+
+
+def build_facilitator(row, user, attending_networking_session):
+    """
+    Unsaved facilitator for the first row of a department in the workshop sheet.
+    """
+    facilitator = Facilitator(
+        user=user,
+        department_name=row.department_name,
+        facilitators=row.facilitators,
+        image_url=row.image_url,
+        bio=row.bio,
+        attending_networking_session=attending_networking_session,
+    )
+
+    if not pd.isna(row.position) and row.position:
+        facilitator.position = row.position
+
+    return facilitator
+
+
+def provision_facilitators(workshop_df):
+    """
+    Find or create the facilitator for every department in a workshop sheet.
+    Departments are deduplicated in memory and new accounts are bulk created
+    with an unusable password and a set up token, so this is a handful of
+    queries however many rows the sheet has. Call inside a transaction.
+    Returns:
+        tuple: (facilitators by department name, facilitator_account_urls)
+            facilitator_account_urls are (department, username, set up url)
+    """
+    batch_size = bulk.get_batch_size()
+
+    # department names for workshop 3 (career panels) may appear in the individual facilitator names of another workshop
+    departments = workshop_df.drop_duplicates("department_name")
+    networking = set(
+        workshop_df.loc[workshop_df["networking_session"] == 1, "department_name"]
+    )
+
+    facilitators = {}
+    for facilitator in Facilitator.objects.filter(
+        department_name__in=list(departments["department_name"])
+    ).order_by("-pk"):
+        facilitators[facilitator.department_name] = facilitator
+
+    # existing facilitators marked as attending networking session in this sheet
+    attending = [
+        facilitator
+        for name, facilitator in facilitators.items()
+        if name in networking and not facilitator.attending_networking_session
+    ]
+    for facilitator in attending:
+        facilitator.attending_networking_session = True
+    Facilitator.objects.bulk_update(
+        attending, ["attending_networking_session"], batch_size=batch_size
+    )
+
+    new_rows = [
+        row for row in departments.itertuples() if row.department_name not in facilitators
+    ]
+    if not new_rows:
+        return facilitators, []
+
+    names = [row.department_name for row in new_rows]
+    users = [
+        User(username=username, first_name=name)
+        for username, name in zip(unique_usernames(names), names)
+    ]
+    for user in users:
+        user.set_unusable_password()
+    User.objects.bulk_create(users, batch_size=batch_size)
+
+    new_facilitators = Facilitator.objects.bulk_create(
+        [
+            build_facilitator(row, user, row.department_name in networking)
+            for row, user in zip(new_rows, users)
+        ],
+        batch_size=batch_size,
+    )
+    facilitators.update(
+        {facilitator.department_name: facilitator for facilitator in new_facilitators}
+    )
+    sync_members(new_facilitators)
+
+    set_ups = AccountSetUp.objects.bulk_create(
+        [build_account_set_up(user) for user in users], batch_size=batch_size
+    )
+
+    facilitator_account_urls = [
+        (name, set_up.username, f"{os.getenv('ACCOUNT_SET_UP_URL')}/{set_up.token}")
+        for name, set_up in zip(names, set_ups)
+    ]
+
+    return facilitators, facilitator_account_urls
+
+
+def provision_workshops(workshop_df):
+    """
+    Create every workshop, facilitator account and facilitator link of a
+    validated workshop sheet in one transaction.
+    Returns:
+        list: facilitator_account_urls for the new accounts
+    """
+    batch_size = bulk.get_batch_size()
+
+    with transaction.atomic():
+        response_cache.invalidate()
+
+        facilitators, facilitator_account_urls = provision_facilitators(workshop_df)
+
+        # session 1 and 2 have one workshop per row
+        rows = []
+        workshops = []
+        for row in workshop_df[workshop_df["session"].isin([1, 2])].itertuples():
+            workshop = build_workshop(row)
+            rows.append((row, workshop))
+            workshops.append(workshop)
+
+        # session 3 (career panels), if title already created reuse it
+        by_title = {}
+        for workshop in workshops:
+            by_title.setdefault(workshop.title, workshop)
+
+        for row in workshop_df[workshop_df["session"] == 3].itertuples():
+            workshop = by_title.get(row.title)
+            if workshop is None:
+                workshop = build_workshop(row)
+                by_title[row.title] = workshop
+                workshops.append(workshop)
+            rows.append((row, workshop))
+
+        Workshop.objects.bulk_create(workshops, batch_size=batch_size)
+
+        FacilitatorWorkshop.objects.bulk_create(
+            [
+                FacilitatorWorkshop(
+                    facilitator=facilitators[row.department_name], workshop=workshop
+                )
+                for row, workshop in rows
+            ],
+            batch_size=batch_size,
+        )
+
+    return facilitator_account_urls
+
+
+def email_facilitator_accounts(facilitator_account_urls):
+    """
+    Email the new facilitator account links to FACT IT.
+    """
+    subject = "FACT Facilitator Accounts"
+    body = "Facilitator accounts created"
+
+    for facilitator in facilitator_account_urls:
+        body += f"\nFacilitator: {facilitator[0]}, Username: {facilitator[1]}, Account Link: {facilitator[2]}"
+
+    from_email = env("EMAIL_HOST_USER")
+    to_email = ["fact.it@psauiuc.org"]
+
+    send_mail(subject, body, from_email, to_email)
+
+
+def merge_workshops(workshop_df):
+    """
+    Upsert workshops on (title, session). Workshops missing from the sheet
+    are deleted unless someone is registered for them. New workshops are
+    linked to their facilitators but not given a location.
+    Returns:
+        tuple: (summary, facilitator_account_urls)
+    """
+    # career panels list one row per department under the same title
+    incoming = [
+        build_workshop(row)
+        for row in workshop_df.drop_duplicates(["title", "session"]).itertuples()
+    ]
+
+    diff = bulk_merge.compute_diff(
+        Workshop.objects.all(), incoming, workshop_key, WORKSHOP_MERGE_FIELDS
+    )
+
+    # deleting a workshop would cascade to its registrations
+    registered = set(
+        Registration.objects.filter(workshop__in=diff["delete"]).values_list(
+            "workshop_id", flat=True
+        )
+    ) | set(
+        FacilitatorRegistration.objects.filter(workshop__in=diff["delete"]).values_list(
+            "workshop_id", flat=True
+        )
+    )
+    kept = [workshop for workshop in diff["delete"] if workshop.pk in registered]
+    diff["delete"] = [
+        workshop for workshop in diff["delete"] if workshop.pk not in registered
+    ]
+
+    with transaction.atomic():
+        summary = bulk_merge.apply_diff(Workshop, diff, WORKSHOP_MERGE_FIELDS)
+
+        created = {workshop_key(workshop): workshop for workshop in diff["create"]}
+        facilitator_account_urls = []
+
+        if created:
+            # loc, a plain list would select columns when it is empty
+            new_rows = workshop_df.loc[
+                [
+                    (title, int(session)) in created
+                    for title, session in zip(workshop_df["title"], workshop_df["session"])
+                ]
+            ]
+
+            facilitators, facilitator_account_urls = provision_facilitators(new_rows)
+
+            links = {
+                (facilitators[row.department_name], created[(row.title, int(row.session))])
+                for row in new_rows.itertuples()
+            }
+            FacilitatorWorkshop.objects.bulk_create(
+                [
+                    FacilitatorWorkshop(facilitator=facilitator, workshop=workshop)
+                    for facilitator, workshop in links
+                ],
+                batch_size=bulk.get_batch_size(),
+            )
+
+    summary["kept"] = [str(workshop) for workshop in kept]
+    summary["unassigned_workshops"] = Workshop.objects.filter(location=None).count()
+
+    return summary, facilitator_account_urls
+
+
 @csrf_exempt
 def workshops_bulk(request):
     """
@@ -83,6 +446,9 @@ def workshops_bulk(request):
           preferred_cap (optional), moveable_seats
         - No empty cells (except optional fields)
         - Sessions must be 1, 2, or 3
+    Optional query params:
+        - mode=merge: Upsert on title + session instead of requiring no workshops
+        - dry_run=1: Validate the file and report every error without saving
     Returns 403 for non-admin, 409 if workshops exist, 400 for invalid data
     """
     if request.method == "POST":
@@ -92,8 +458,10 @@ def workshops_bulk(request):
                 {"message": "Must be admin to make this request"}, status=403
             )
 
+        merge = bulk_merge.is_merge(request)
+
         # must have no workshops
-        if Workshop.objects.all().count() > 0 or Facilitator.objects.all().count() > 0:
+        if not merge and (Workshop.objects.exists() or Facilitator.objects.exists()):
             return JsonResponse(
                 {
                     "message": "Delete existing workshops and facilitators before attempting to upload"
@@ -104,196 +472,42 @@ def workshops_bulk(request):
         if "workshops" not in request.FILES:
             return JsonResponse({"message": "Must include file"}, status=400)
 
-        file = request.FILES["workshops"]
-        workshop_df = None
+        workshop_df, error = bulk.load_sheet(
+            request.FILES["workshops"], WORKSHOP_COLUMNS
+        )
+        if error:
+            return JsonResponse(error, status=400)
 
-        try:
-            workshop_df = pd.read_excel(file)
-        except:
-            return JsonResponse({"message": "Error reading file"}, status=400)
-
-        workshop_df = workshop_df.drop_duplicates()
-        # when loading in df, pandas will add ".#" to duplicate columns
-        workshop_df.columns = [x.lower().split(".")[0] for x in workshop_df.columns]
-
-        # validate data
-        columns_set = set(workshop_df.columns)
-
-        if len(columns_set) != len(workshop_df.columns):
-            return JsonResponse({"message": "Duplicate column names"}, status=400)
-
-        expected_columns = [
-            "title",
-            "session",
-            "description",
-            "department_name",
-            "facilitators",
-            "image_url",
-            "bio",
-            "networking_session",
-            "position",
-            "preferred_cap",
-            "moveable_seats",
-        ]
-
-        for i in range(len(expected_columns)):
-            if expected_columns[i] not in columns_set:
-                return JsonResponse(
-                    {"message": f"Missing column {expected_columns[i]}"}, status=400
-                )
+        errors = validate_workshop_sheet(workshop_df)
 
-        if (
-            workshop_df.drop(["position", "preferred_cap"], axis=1)
-            .isnull()
-            .values.any()
-        ):
-            return JsonResponse(
-                {"message": "Missing values - make sure there are no empty cells"},
-                status=400,
+        if bulk.is_dry_run(request):
+            body, status = bulk.dry_run_report(
+                workshop_df, errors + location_shortage_errors(workshop_df)
             )
+            return JsonResponse(body, status=status)
 
-        # check sessions and locations
-        workshop_count = {1: [], 2: [], 3: []}
-
-        valid_sessions = set([1, 2, 3])
-
-        for idx, rows in workshop_df.iterrows():
-            if rows["session"] not in valid_sessions:
-                return JsonResponse(
-                    {"message": f"{rows['session']} is not a valid session number"},
-                    status=400,
-                )
-
-            # need to account for duplicate workshop names because of career panels
-            if rows["title"] not in workshop_count[rows["session"]]:
-                workshop_count[rows["session"]].append(rows["title"])
-
-        for i in range(1, 4):
-            if len(workshop_count[i]) > Location.objects.filter(session=i).count():
-                return JsonResponse(
-                    {
-                        "message": f"Not enough locations for given workshops in session {i}"
-                    },
-                    status=409,
-                )
-
-        # save workshops, create facilitator accounts, session 1 and 2
-        facilitator_account_urls = []
-        for index, row in workshop_df[workshop_df["session"].isin([1, 2])].iterrows():
-            # facilitator (if does not exist)
-            # department names for workshop 3 (career panels) may appear in the individual facilitator names of another workshop
-            facilitator = Facilitator.objects.filter(
-                department_name=row["department_name"]
-            ).first()
-
-            if not facilitator:
-                user, token, expiration = create_facilitator_account(
-                    row["department_name"]
-                )
-                reset_url = f"{os.getenv('ACCOUNT_SET_UP_URL')}/{token}"
-
-                facilitator_account_urls.append(
-                    (row["department_name"], user.username, reset_url)
-                )
-
-                facilitator = Facilitator(
-                    user=user,
-                    department_name=row["department_name"],
-                    facilitators=row["facilitators"],
-                    image_url=row["image_url"],
-                    bio=row["bio"],
-                    attending_networking_session=row["networking_session"] == 1,
-                )
-
-                if row["position"]:
-                    facilitator.position = row["position"]
-
-                facilitator.save()
-
-            elif row["networking_session"] == 1:
-                # if facilitator is already created and this row is marked as attending networking session
-                facilitator.attending_networking_session = True
-                facilitator.save()
-
-            # workshop
-            workshop = Workshop(
-                title=row["title"],
-                description=row["description"],
-                session=row["session"],
-                moveable_seats=row["moveable_seats"],
+        if errors:
+            return JsonResponse(
+                bulk.error_report(errors[0]["message"], errors), status=400
             )
 
-            try:
-                cap = int(row["preferred_cap"])
-                workshop.preferred_cap = cap
-            except:
-                pass
-
-            workshop.save()
-
-            FacilitatorWorkshop.objects.create(
-                facilitator=facilitator, workshop=workshop
+        # check sessions and locations
+        errors = location_shortage_errors(workshop_df)
+        if errors:
+            return JsonResponse(
+                bulk.error_report(errors[0]["message"], errors), status=409
             )
 
-        # session 3 (career panels)
-        for index, row in workshop_df[workshop_df["session"] == 3].iterrows():
-            # if facilitator is a facilitator already, do not create account
-            facilitator = Facilitator.objects.filter(
-                department_name=row["department_name"]
-            ).first()
+        if merge:
+            summary, facilitator_account_urls = merge_workshops(workshop_df)
 
-            if not facilitator:
-                user, token, expiration = create_facilitator_account(
-                    row["department_name"]
-                )
+            if facilitator_account_urls:
+                email_facilitator_accounts(facilitator_account_urls)
 
-                reset_url = f"{env('ACCOUNT_SET_UP_URL')}/{token}"
+            return JsonResponse({"message": "Merge complete", **summary})
 
-                facilitator_account_urls.append(
-                    (row["department_name"], user.username, reset_url)
-                )
-
-                facilitator = Facilitator(
-                    user=user,
-                    department_name=row["department_name"],
-                    facilitators=row["facilitators"],
-                    image_url=row["image_url"],
-                    bio=row["bio"],
-                    attending_networking_session=row["networking_session"] == 1,
-                )
-
-                if row["position"]:
-                    facilitator.position = row["position"]
-
-                facilitator.save()
-
-            elif row["networking_session"] == 1:
-                # if facilitator is already created and this row is marked as attending networking session
-                facilitator.attending_networking_session = True
-                facilitator.save()
-
-            # if title already created ignore
-            workshop = Workshop.objects.filter(title=row["title"]).first()
-            if not workshop:
-                # workshop
-                workshop = Workshop(
-                    title=row["title"],
-                    description=row["description"],
-                    session=row["session"],
-                    moveable_seats=row["moveable_seats"],
-                )
-
-                try:
-                    cap = int(row["preferred_cap"])
-                    workshop.preferred_cap = cap
-                except:
-                    pass
-
-                workshop.save()
-
-            FacilitatorWorkshop.objects.create(
-                facilitator=facilitator, workshop=workshop
-            )
+        # save workshops, create facilitator accounts
+        facilitator_account_urls = provision_workshops(workshop_df)
 
         # set locations
         set_locations(1)
@@ -301,16 +515,7 @@ def workshops_bulk(request):
         set_locations(3)
 
         # email facilitator password links
-        subject = "FACT Facilitator Accounts"
-        body = "Facilitator accounts created"
-
-        for facilitator in facilitator_account_urls:
-            body += f"\nFacilitator: {facilitator[0]}, Username: {facilitator[1]}, Account Link: {facilitator[2]}"
-
-        from_email = env("EMAIL_HOST_USER")
-        to_email = ["fact.it@psauiuc.org"]
-
-        send_mail(subject, body, from_email, to_email)
+        email_facilitator_accounts(facilitator_account_urls)
 
         data = django_serializers.serialize("json", Workshop.objects.all())
 
@@ -331,17 +536,27 @@ def workshop_id(request, id):
         - location: Location ID (optional)
     Returns 404 if not found, 400 for invalid data
     """
-    workshop = get_object_or_404(Workshop, pk=id)
-
     if request.method == "GET":
         include_fas = False
         if hasattr(request.user, "facilitator"):
             include_fas = True
+
+        def build():
+            workshop = get_object_or_404(Workshop, pk=id)
+            return json.dumps(
+                serializers.serialize_workshop(workshop, include_fas=include_fas)
+            )
+
         return HttpResponse(
-            json.dumps(serializers.serialize_workshop(workshop, include_fas=include_fas)),
+            response_cache.cached(
+                "workshop_id", f"workshop_id:{id}:{include_fas}", build
+            ),
             content_type="application/json",
         )
-    elif request.method == "PUT":
+
+    workshop = get_object_or_404(Workshop, pk=id)
+
+    if request.method == "PUT":
         try:
             # TODO integrity checks
             data = json.loads(request.body)
@@ -370,9 +585,60 @@ def workshops_all(request):
     Returns 405 for non-GET methods
     """
     if request.method == "GET":
-        data = {}
-        for workshop in Workshop.objects.all():
-            data.update({workshop.pk: serializers.serialize_workshop(workshop, include_fas=False)})
-        return HttpResponse(json.dumps(data), content_type="application/json")
+
+        def build():
+            return json.dumps(serializers.serialize_workshops(Workshop.objects.all()))
+
+        return HttpResponse(
+            response_cache.cached("workshops_all", "workshops_all", build),
+            content_type="application/json",
+        )
     else:
-        return JsonResponse({"message": "Method not allowed"}, status=405)
\ No newline at end of file
+        return JsonResponse({"message": "Method not allowed"}, status=405)
+
+
+async def workshop_id_async(request, id):
+    """
+    workshop_id for ASGI: GET is served from the response cache with the
+    async ORM, PUT and DELETE run the sync view in a thread.
+    """
+    if request.method != "GET":
+        return await sync_to_async(workshop_id)(request, id)
+
+    # the session and user are loaded synchronously
+    include_fas = await sync_to_async(hasattr)(request.user, "facilitator")
+
+    async def build():
+        workshops = await serializers.aserialize_workshops(
+            Workshop.objects.filter(pk=id), include_fas=include_fas
+        )
+        if id not in workshops:
+            raise Http404("No Workshop matches the given query.")
+
+        return json.dumps(workshops[id])
+
+    return HttpResponse(
+        await response_cache.acached(
+            "workshop_id", f"workshop_id:{id}:{include_fas}", build
+        ),
+        content_type="application/json",
+    )
+
+
+async def workshops_all_async(request):
+    """
+    workshops_all for ASGI, built with the async ORM in a fixed number of
+    queries and served from the response cache.
+    """
+    if request.method != "GET":
+        return JsonResponse({"message": "Method not allowed"}, status=405)
+
+    async def build():
+        return json.dumps(
+            await serializers.aserialize_workshops(Workshop.objects.all())
+        )
+
+    return HttpResponse(
+        await response_cache.acached("workshops_all", "workshops_all", build),
+        content_type="application/json",
+    )
\ No newline at end of file